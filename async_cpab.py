@@ -0,0 +1,335 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+from botocore.exceptions import ClientError
+
+from audit import AuditLog, format_event
+from blobs import BLOB_PREFIX, blob_key, decode_manifest, is_manifest
+from compression import METADATA_KEY, decompress
+from policy import PolicyEngine
+from records import RecordCatalog, initialize_csv, object_key
+from revocation import RevocationRegistry
+from shards import Shard, ShardSet
+from transfer import MB
+
+
+class AsyncIntegratedCloudSystem:
+    """Asyncio counterpart of IntegratedCloudSystem.
+
+    Every coroutine shares one aiobotocore client and its connection pool,
+    so in-flight requests are bounded by max_pool_connections rather than
+    an executor's thread count. Access checks read the in-memory record
+    index; only file reads and record writes are handed to a thread.
+
+    Objects are placed on shards and read back from the shard their row
+    names, as IntegratedCloudSystem does, with one client per endpoint.
+    Shards with their own client or backend are rejected: there is no
+    asyncio route to them.
+    """
+
+    def __init__(self, s3_bucket_name, csv_file='access_records.csv', record_store=None,
+                 endpoint_url=None, max_pool_connections=256, multipart_threshold=64 * MB,
+                 multipart_part_size=16 * MB, multipart_workers=8, refresh_interval=1.0,
+                 audit_path='audit_log.jsonl', audit_capacity=10000,
+                 revocation_path='revocations.jsonl', revocation_bloom_capacity=None,
+                 shards=None, cipher=None):
+        self.s3_bucket_name = s3_bucket_name
+        self.csv_file = csv_file
+        self.endpoint_url = endpoint_url
+        self.shards = ShardSet([
+            shard if isinstance(shard, Shard) else Shard(shard, endpoint_url=endpoint_url)
+            for shard in (shards or [s3_bucket_name])
+        ])
+        for shard in self.shards:
+            if shard.s3 is not None or shard.backend is not None:
+                raise ValueError(f"Shard {shard.name!r} has its own client or backend, "
+                                 "which AsyncIntegratedCloudSystem cannot reach")
+        self.s3_bucket_name = self.shards.primary.bucket
+        # The same cipher IntegratedCloudSystem is given, so either reads the other's objects
+        self.cipher = cipher
+        self.max_pool_connections = max_pool_connections
+        self.multipart_threshold = multipart_threshold
+        self.multipart_part_size = multipart_part_size
+        self.multipart_workers = multipart_workers
+        if record_store is None:
+            initialize_csv(csv_file)
+            record_store = RecordCatalog(csv_file)
+        self.records = record_store
+        self.refresh_interval = refresh_interval
+        self._last_refresh = None
+        self._clients = {}  # endpoint_url -> client
+        self._client_cms = []
+        self._client_lock = asyncio.Lock()
+        self._checked_buckets = set()
+        self.policies = PolicyEngine()
+        self.audit_log = AuditLog(audit_path, capacity=audit_capacity)
+        self.revocations = RevocationRegistry(revocation_path, revocation_bloom_capacity)
+        self.data_store = {}  # Maintained for backward compatibility
+
+    async def __aenter__(self):
+        for shard in self.shards:
+            await self._s3(shard)
+        await asyncio.to_thread(self.revocations.is_revoked, '')  # Load the journal off-loop
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        while self._client_cms:
+            await self._client_cms.pop().__aexit__(None, None, None)
+        self._clients = {}
+        self._checked_buckets = set()
+
+    async def _s3(self, shard=None):
+        """The shard's endpoint client, created (and its bucket checked) on first use"""
+        shard = shard or self.shards.primary
+        bucket = (shard.endpoint_url, shard.bucket)
+        client = self._clients.get(shard.endpoint_url)
+        if client is not None and bucket in self._checked_buckets:
+            return client
+        async with self._client_lock:
+            client = self._clients.get(shard.endpoint_url)
+            if client is None:
+                cm = get_session().create_client(
+                    's3',
+                    region_name='ap-south-1',
+                    endpoint_url=shard.endpoint_url,
+                    config=AioConfig(max_pool_connections=self.max_pool_connections)
+                )
+                client = self._clients[shard.endpoint_url] = await cm.__aenter__()
+                self._client_cms.append(cm)
+            if bucket not in self._checked_buckets:
+                await self._ensure_bucket_exists(client, shard.bucket)
+                self._checked_buckets.add(bucket)
+        return client
+
+    async def _ensure_bucket_exists(self, client, bucket):
+        try:
+            await client.head_bucket(Bucket=bucket)
+            print(f"Bucket '{bucket}' exists")
+        except ClientError as e:
+            if e.response['Error']['Code'] == '404':
+                await client.create_bucket(
+                    Bucket=bucket,
+                    CreateBucketConfiguration={'LocationConstraint': 'ap-south-1'}
+                )
+                print(f"Created bucket '{bucket}'")
+            else:
+                print(f"Bucket error: {e}")
+                raise
+
+    async def _locate(self, s3_key, location=None):
+        """The shard holding s3_key, as IntegratedCloudSystem._locate"""
+        if len(self.shards) == 1:
+            return self.shards.primary
+        if location is None and not s3_key.startswith(BLOB_PREFIX):
+            row = await asyncio.to_thread(self.records.row_for_key, s3_key)
+            if row is not None:
+                location = row.get('location')
+        if location is None:
+            return self.shards.place(s3_key)  # Blobs have no row; they sit where the ring puts them
+        return self.shards.locate(location)
+
+    async def _file_rows(self, owner, filename=None, version=None):
+        """Candidate rows for a request, as IntegratedCloudSystem._file_rows"""
+        if not isinstance(self.records, RecordCatalog):
+            if filename is None:
+                return await asyncio.to_thread(self.records.current_rows, owner)
+            if version is None:
+                row = await asyncio.to_thread(self.records.latest_row, owner, filename)
+            else:
+                row = await asyncio.to_thread(self.records.version_row, owner, filename, version)
+            return [row] if row is not None else []
+        # Pick up other writers at most once per interval, off the event loop
+        now = time.monotonic()
+        if self._last_refresh is None or now - self._last_refresh >= self.refresh_interval:
+            self._last_refresh = now
+            await asyncio.to_thread(self.records.refresh)
+        if filename is None:
+            return self.records.current_rows(owner, refresh=False)
+        if version is None:
+            row = self.records.latest_row(owner, filename, refresh=False)
+        else:
+            row = self.records.version_row(owner, filename, version, refresh=False)
+        return [row] if row is not None else []
+
+    async def upload_file(self, owner, file_path, allowed_roles):
+        try:
+            self.policies.compile(','.join(allowed_roles))  # Reject malformed policies up front
+            filename = os.path.basename(file_path)
+            version = await asyncio.to_thread(self.records.next_version, owner, filename)
+            s3_key = object_key(owner, filename, version)
+            shard = self.shards.place(s3_key)
+            if self.cipher is None:
+                await self._put_path(shard, s3_key, file_path)
+            else:
+                encrypted = await asyncio.to_thread(_encrypt_to_temp, self.cipher, file_path)
+                try:
+                    await self._put_path(shard, s3_key, encrypted)
+                finally:
+                    os.remove(encrypted)
+            await asyncio.to_thread(
+                self.records.append, owner, s3_key, ','.join(allowed_roles),
+                datetime.now().isoformat(), filename, version, shard.name
+            )
+            self.data_store[owner] = s3_key  # Maintain compatibility
+            self.audit_log.record('upload', actor=owner, owner=owner, key=s3_key)
+            return True
+        except Exception as e:
+            print(f"Upload failed: {e}")
+            return False
+
+    async def _put_path(self, shard, s3_key, file_path):
+        s3 = await self._s3(shard)
+        size = await asyncio.to_thread(os.path.getsize, file_path)
+        if size >= self.multipart_threshold:
+            await self._multipart_upload(s3, shard.bucket, file_path, s3_key, size)
+        else:
+            body = await asyncio.to_thread(_read_range, file_path, 0, size)
+            await s3.put_object(
+                Bucket=shard.bucket,
+                Key=s3_key,
+                Body=body,
+                ServerSideEncryption='AES256'
+            )
+
+    async def _multipart_upload(self, s3, bucket, file_path, s3_key, size):
+        part_size = self.multipart_part_size
+        response = await s3.create_multipart_upload(
+            Bucket=bucket, Key=s3_key, ServerSideEncryption='AES256'
+        )
+        upload_id = response['UploadId']
+        limit = asyncio.Semaphore(self.multipart_workers)
+
+        async def put_part(part_number):
+            async with limit:
+                data = await asyncio.to_thread(
+                    _read_range, file_path, (part_number - 1) * part_size, part_size
+                )
+                part = await s3.upload_part(
+                    Bucket=bucket, Key=s3_key, UploadId=upload_id,
+                    PartNumber=part_number, Body=data
+                )
+                return {'PartNumber': part_number, 'ETag': part['ETag']}
+
+        try:
+            parts = await asyncio.gather(
+                *(put_part(n) for n in range(1, -(-size // part_size) + 1))
+            )
+            await s3.complete_multipart_upload(
+                Bucket=bucket, Key=s3_key, UploadId=upload_id,
+                MultipartUpload={'Parts': list(parts)}
+            )
+        except Exception:
+            await s3.abort_multipart_upload(
+                Bucket=bucket, Key=s3_key, UploadId=upload_id
+            )
+            raise
+
+    async def _read_object(self, s3_key, location=None):
+        """An object's bytes, decrypted and decompressed, or reassembled if it is a chunk manifest"""
+        shard = await self._locate(s3_key, location)
+        s3 = await self._s3(shard)
+        response = await s3.get_object(Bucket=shard.bucket, Key=s3_key)
+        async with response['Body'] as body:
+            data = await body.read()
+        metadata = response.get('Metadata') or {}
+        if is_manifest(metadata):
+            manifest = decode_manifest(data)
+            limit = asyncio.Semaphore(self.multipart_workers)
+
+            async def get_chunk(digest, size):
+                async with limit:
+                    part = await self._read_object(blob_key(digest))
+                if len(part) != size or hashlib.sha256(part).hexdigest() != digest:
+                    raise ValueError(f"Chunk {digest} is corrupt")
+                return part
+
+            parts = await asyncio.gather(*(get_chunk(digest, size) for digest, size in manifest['chunks']))
+            data = b''.join(parts)
+            if len(data) != manifest['size']:
+                raise ValueError(f"{s3_key} is {len(data)} bytes, its manifest says {manifest['size']}")
+            return data
+        if self.cipher is not None:
+            data = await asyncio.to_thread(_decrypt, self.cipher, data)
+        codec = metadata.get(METADATA_KEY)
+        return decompress(data, codec) if codec else data
+
+    async def access_file(self, user, user_role, owner, filename=None, version=None):
+        """Retrieve a file from S3 if the user has access"""
+        start = time.perf_counter()
+        try:
+            if self.revocations.is_revoked(user, owner):
+                self.audit_log.record('access', actor=user, role=user_role, owner=owner,
+                                      outcome='revoked')
+                print(f"❌ Access revoked for {user}")
+                return None
+            for row in await self._file_rows(owner, filename, version):
+                # Compiling first interns the policy's roles, so the mask sees them
+                if self.policies.check(row['allowed_roles'], user_role):
+                    s3_key, location = row['s3_key'], row.get('location')
+                    break
+            else:
+                self.audit_log.record('access', actor=user, role=user_role, owner=owner,
+                                      outcome='denied')
+                print(f"❌ Access denied for {user} with role {user_role}")
+                return None
+
+            data = await self._read_object(s3_key, location)
+            self.audit_log.record('access', actor=user, role=user_role, owner=owner, key=s3_key,
+                                  outcome='granted', latency=time.perf_counter() - start)
+            print(f"✅ File '{s3_key}' accessed by {user}")
+            return data
+        except Exception as e:
+            print(f"Failed to access file: {e}")
+            return None
+
+    async def download_from_s3(self, s3_key):
+        """Download a file from S3"""
+        try:
+            data = await self._read_object(s3_key)
+            print(f"✅ File '{s3_key}' downloaded from S3.")
+            return data
+        except Exception as e:
+            print(f"❌ Failed to download file from S3: {e}")
+            return None
+
+    async def check_access_policy(self, user_key, policy):
+        """Maintain original ABE-like interface"""
+        return self.policies.check(policy, user_key['attributes'])
+
+    def get_audit_log(self, limit=None):
+        events = list(self.audit_log)
+        if limit is not None:
+            events = events[-limit:]
+        return [format_event(event) for event in events]
+
+
+def _encrypt_to_temp(cipher, file_path):
+    """Encrypt a file into a temp file, as IntegratedCloudSystem uploads it; returns its path"""
+    with open(file_path, 'rb') as src, tempfile.NamedTemporaryFile(delete=False) as dst:
+        try:
+            cipher.encrypt_stream(src, dst)
+        except BaseException:
+            dst.close()
+            os.remove(dst.name)
+            raise
+    return dst.name
+
+
+def _decrypt(cipher, data):
+    return b''.join(cipher.iter_decrypt(io.BytesIO(data)))
+
+
+def _read_range(file_path, offset, length):
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
@@ -0,0 +1,187 @@
+import atexit
+import json
+import os
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+
+
+def format_event(event):
+    """Render an event the way the old string audit log did"""
+    action = event.get('action')
+    if action == 'upload':
+        return f"Uploaded {event['key']} by {event['owner']}"
+    if action == 'access':
+        if event.get('outcome') == 'granted':
+            return f"File accessed by {event['actor']} with role {event['role']}"
+        return f"Access {event.get('outcome')} for {event['actor']} with role {event['role']}"
+    if action == 'revoke':
+        return f"User {event['actor']} revoked by {event.get('owner') or 'authority'}"
+    if action == 'restore':
+        return f"User {event['actor']} restored by {event.get('owner') or 'authority'}"
+    return event.get('message') or json.dumps(event)
+
+
+def _matches(event, filters):
+    since = filters.get('since')
+    if since is not None and event['timestamp'] < since:
+        return False
+    for field in ('actor', 'role', 'owner', 'key', 'action', 'outcome'):
+        wanted = filters.get(field)
+        if wanted is not None and event.get(field) != wanted:
+            return False
+    return True
+
+
+class AuditLog:
+    """Structured audit events in a bounded ring buffer, persisted to JSONL.
+
+    record() never blocks: events go into the ring buffer and onto a
+    bounded queue that a background thread drains in batches to a JSONL
+    file, rotating it by size. If the writer falls behind, events are
+    counted in dropped_events rather than stalling the caller.
+    """
+
+    def __init__(self, path='audit_log.jsonl', capacity=10000, max_bytes=10 * 1024 * 1024,
+                 backups=5, batch_size=500, flush_interval=1.0, queue_size=10000):
+        # Absolute, so the background writer isn't affected by a later chdir
+        self.path = os.path.abspath(path) if path is not None else None
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped_events = 0
+        self._events = deque(maxlen=capacity)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def record(self, action, actor=None, role=None, owner=None, key=None,
+               outcome='ok', latency=None, message=None):
+        event = {
+            'timestamp': datetime.now().isoformat(),
+            'action': action,
+            'actor': actor,
+            'role': role,
+            'owner': owner,
+            'key': key,
+            'outcome': outcome,
+            'latency_ms': round(latency * 1000, 3) if latency is not None else None,
+            'message': message
+        }
+        self._events.append(event)
+        if self.path is None:
+            return event
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped_events += 1
+        return event
+
+    def append(self, message):
+        """Legacy entry point for free-form messages"""
+        return self.record('note', message=message)
+
+    def __len__(self):
+        return len(self._events)
+
+    def __iter__(self):
+        return iter(list(self._events))
+
+    def query(self, offset=0, limit=100, **filters):
+        """A page of in-memory events, oldest first, matching the given fields.
+
+        Filters: actor, role, owner, key, action, outcome, since (ISO time).
+        """
+        page = []
+        skipped = 0
+        for event in list(self._events):
+            if not _matches(event, filters):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            page.append(event)
+            if len(page) >= limit:
+                break
+        return page
+
+    def iter_file(self, **filters):
+        """Stream matching events from the rotated files on disk, oldest first"""
+        if self.path is None:
+            return
+        self.flush()
+        paths = [f"{self.path}.{n}" for n in range(self.backups, 0, -1)] + [self.path]
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if _matches(event, filters):
+                        yield event
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except OSError as e:
+                print(f"❌ Audit write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        data = ''.join(json.dumps(event) + '\n' for event in batch).encode('utf-8')
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and size + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, 'ab') as f:
+            f.write(data)
+
+    def _rotate(self):
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def flush(self):
+        """Block until every queued event is on disk"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._writer is not None and self._writer.is_alive():
+            self._stopping.set()
+            self._writer.join(timeout=self.flush_interval + 5)
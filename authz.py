@@ -0,0 +1,106 @@
+import threading
+
+import numpy as np
+
+
+class RoleMatrix:
+    """Precomputed answers to "which key may this role read for this owner".
+
+    grant[o, c] holds the index into keys of the first record of owner o
+    that column c's attribute mask satisfies, or -1. Columns for single
+    roles are built up front; other attribute sets (e.g. "BCS,BCD") get a
+    column the first time they are asked about. A batch of requests is then
+    resolved with a couple of array lookups and one fancy-indexing gather.
+    Columns are only ever appended, under a lock, so one matrix can serve
+    concurrent batches.
+    """
+
+    def __init__(self, rows_by_owner, policies):
+        self.policies = policies
+        self._lock = threading.Lock()
+        self.owner_index = {}
+        self._owner_rows = []
+        self._key_index = {}
+        keys = []
+        for owner, rows in rows_by_owner.items():
+            self.owner_index[owner] = len(self._owner_rows)
+            compiled = []
+            for row in rows:
+                key_id = self._key_index.get(row['s3_key'])
+                if key_id is None:
+                    key_id = self._key_index[row['s3_key']] = len(keys)
+                    keys.append(row['s3_key'])
+                compiled.append((policies.compile(row['allowed_roles']), key_id))
+            self._owner_rows.append(compiled)
+        self.keys = np.array(keys + [None], dtype=object)  # keys[-1] is None for denials
+
+        # Compiling every policy has interned every role that matters
+        self.columns = {}
+        role_bits = [1 << role_id for role_id in sorted(self.policies.role_ids.values())]
+        self.grant = np.full((len(self._owner_rows), len(role_bits)), -1, dtype=np.int64)
+        single_grants = {}
+        for o, compiled in enumerate(self._owner_rows):
+            assigned = 0
+            for evaluator, key_id in compiled:
+                # Which single roles does this policy admit? Cached per policy.
+                admits = single_grants.get(evaluator)
+                if admits is None:
+                    admits = 0
+                    for bit in role_bits:
+                        if evaluator(bit):
+                            admits |= bit
+                    single_grants[evaluator] = admits
+                new = admits & ~assigned
+                assigned |= new
+                while new:
+                    bit = new & -new
+                    self.grant[o, bit.bit_length() - 1] = key_id
+                    new ^= bit
+        for bit in role_bits:
+            self.columns[bit] = bit.bit_length() - 1
+
+    def _column(self, mask):
+        column = self.columns.get(mask)
+        if column is None:
+            values = np.full((len(self._owner_rows), 1), -1, dtype=np.int64)
+            if mask:
+                for o, compiled in enumerate(self._owner_rows):
+                    for evaluator, key_id in compiled:
+                        if evaluator(mask):
+                            values[o, 0] = key_id
+                            break
+            with self._lock:
+                # Another batch may have added this mask's column meanwhile
+                column = self.columns.get(mask)
+                if column is None:
+                    self.grant = np.hstack([self.grant, values])
+                    column = self.columns[mask] = self.grant.shape[1] - 1
+        return column
+
+    def resolve(self, roles, owners):
+        """Return (granted bool array, s3_keys object array) for parallel arrays"""
+        roles = np.asarray(roles, dtype=object)
+        owners = np.asarray(owners, dtype=object)
+        if roles.shape != owners.shape:
+            raise ValueError("roles and owners must have the same length")
+        if roles.size == 0:
+            return np.zeros(0, dtype=bool), np.empty(0, dtype=object)
+
+        # Translate each distinct string once, then broadcast with the inverse index
+        unique_owners, owner_inverse = np.unique(owners.astype(str), return_inverse=True)
+        owner_ids = np.array(
+            [self.owner_index.get(owner.lower(), -1) for owner in unique_owners], dtype=np.int64
+        )[owner_inverse]
+        unique_roles, role_inverse = np.unique(roles.astype(str), return_inverse=True)
+        role_columns = np.array(
+            [self._column(self.policies.attribute_mask(role)) for role in unique_roles],
+            dtype=np.int64
+        )[role_inverse]
+
+        known = owner_ids >= 0
+        key_ids = np.full(owner_ids.shape, -1, dtype=np.int64)
+        grant = self.grant  # Holds every column resolved above
+        if grant.size:
+            key_ids[known] = grant[owner_ids[known], role_columns[known]]
+        granted = key_ids >= 0
+        return granted, self.keys[key_ids]
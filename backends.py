@@ -0,0 +1,354 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import uuid
+
+from botocore.exceptions import ClientError
+
+from presign import Presigner
+from transfer import MB, MultipartUploader, RangedDownloader, iter_body
+
+_MISSING = ('404', 'NoSuchKey', 'NotFound')
+_verified_buckets = set()
+_buckets_lock = threading.Lock()
+
+
+class ObjectNotFound(LookupError):
+    """Raised by a backend asked for a key it does not hold"""
+
+
+class StorageBackend:
+    """Where objects' bytes live.
+
+    Keys are S3-style strings with '/' separators. Each object carries a
+    small dict of string metadata (the codec, the chunk layout), and is
+    described by head() as {'size': ..., 'etag': ..., 'metadata': {...}}.
+    Reads of a missing key raise ObjectNotFound. bucket is what the cache
+    and blob index key this backend's objects by.
+    """
+
+    bucket = None
+    remote = True  # Whether reads cross a network, so caching them pays
+
+    def ensure(self):
+        """Create the bucket or directory if it does not exist yet"""
+
+    def put(self, key, data, metadata=None):
+        """Store an in-memory body; returns its ETag"""
+        raise NotImplementedError
+
+    def put_file(self, key, path, metadata=None):
+        """Store a file's contents; returns a multipart upload report, or None"""
+        raise NotImplementedError
+
+    def get(self, key, if_none_match=None):
+        """(data, head) for key, or None if its ETag is still if_none_match"""
+        raise NotImplementedError
+
+    def stream(self, key):
+        """(readable binary body, head) for key; the caller closes the body"""
+        raise NotImplementedError
+
+    def get_range(self, key, start, end):
+        """Bytes start up to (not including) end of key"""
+        raise NotImplementedError
+
+    def head(self, key):
+        """key's head dict, or None if there is no such key"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove key; removing a missing key is not an error"""
+        raise NotImplementedError
+
+    def list(self, prefix=''):
+        """Iterate over the keys starting with prefix, in sorted order"""
+        raise NotImplementedError
+
+    def download(self, key, dest, head=None):
+        """Write key's bytes to a writable binary object; returns bytes written"""
+        body, _ = self.stream(key)
+        written = 0
+        for chunk in iter_body(body):
+            dest.write(chunk)
+            written += len(chunk)
+        return written
+
+    def presigner(self, expires_in):
+        raise ValueError(f"{type(self).__name__} cannot presign URLs")
+
+
+def _is_missing(error):
+    return error.response['Error']['Code'] in _MISSING
+
+
+class S3Backend(StorageBackend):
+    """Objects in one S3 bucket, through a boto3 client (or local_s3.LocalS3).
+
+    Bodies are stored with SSE-S3. Files of threshold bytes or more go up
+    in parallel parts and come down in parallel ranges.
+    """
+
+    def __init__(self, s3, bucket, part_size=16 * MB, max_workers=8, threshold=64 * MB):
+        self.s3 = s3
+        self.bucket = bucket
+        self.threshold = threshold
+        self.uploader = MultipartUploader(s3, bucket, part_size=part_size, max_workers=max_workers)
+        self.downloader = RangedDownloader(s3, bucket, part_size=part_size,
+                                           max_workers=max_workers, threshold=threshold)
+
+    def ensure(self):
+        # Checked once per process per endpoint and bucket
+        verified_key = (getattr(self.s3.meta, 'endpoint_url', None), self.bucket)
+        if verified_key in _verified_buckets:
+            return
+        with _buckets_lock:
+            if verified_key in _verified_buckets:
+                return
+            try:
+                self.s3.head_bucket(Bucket=self.bucket)
+                print(f"Bucket '{self.bucket}' exists")
+            except ClientError as e:
+                if e.response['Error']['Code'] == '404':
+                    self.s3.create_bucket(
+                        Bucket=self.bucket,
+                        CreateBucketConfiguration={'LocationConstraint': 'ap-south-1'}
+                    )
+                    print(f"Created bucket '{self.bucket}'")
+                else:
+                    print(f"Bucket error: {e}")
+                    raise
+            _verified_buckets.add(verified_key)
+
+    @staticmethod
+    def _extra_args(metadata):
+        extra_args = {'ServerSideEncryption': 'AES256'}
+        if metadata:
+            extra_args['Metadata'] = metadata
+        return extra_args
+
+    @staticmethod
+    def _head(response):
+        return {
+            'size': response['ContentLength'],
+            'etag': response['ETag'],
+            'metadata': response.get('Metadata') or {}
+        }
+
+    def _get_object(self, key, **kwargs):
+        try:
+            return self.s3.get_object(Bucket=self.bucket, Key=key, **kwargs)
+        except ClientError as e:
+            if _is_missing(e):
+                raise ObjectNotFound(f"No such object: {key}") from e
+            raise
+
+    def put(self, key, data, metadata=None):
+        response = self.s3.put_object(Bucket=self.bucket, Key=key, Body=data,
+                                      **self._extra_args(metadata))
+        return response['ETag']
+
+    def put_file(self, key, path, metadata=None):
+        if os.path.getsize(path) >= self.threshold:
+            return self.uploader.upload(path, key, self._extra_args(metadata))
+        with open(path, 'rb') as f:
+            self.s3.put_object(Bucket=self.bucket, Key=key, Body=f, **self._extra_args(metadata))
+        return None
+
+    def get(self, key, if_none_match=None):
+        try:
+            response = self._get_object(key, **({'IfNoneMatch': if_none_match} if if_none_match else {}))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('304', 'NotModified'):
+                return None
+            raise
+        return response['Body'].read(), self._head(response)
+
+    def stream(self, key):
+        response = self._get_object(key)
+        return response['Body'], self._head(response)
+
+    def get_range(self, key, start, end):
+        if end <= start:
+            return b''
+        return self._get_object(key, Range=f"bytes={start}-{end - 1}")['Body'].read()
+
+    def head(self, key):
+        try:
+            return self._head(self.s3.head_object(Bucket=self.bucket, Key=key))
+        except ClientError as e:
+            if _is_missing(e):
+                return None
+            raise
+
+    def delete(self, key):
+        self.s3.delete_object(Bucket=self.bucket, Key=key)
+
+    def list(self, prefix=''):
+        kwargs = {'Bucket': self.bucket, 'Prefix': prefix}
+        while True:
+            response = self.s3.list_objects_v2(**kwargs)
+            for obj in response.get('Contents', []):
+                yield obj['Key']
+            if not response.get('IsTruncated'):
+                return
+            kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+    def download(self, key, dest, head=None):
+        if head is not None:
+            head = {'ContentLength': head['size'], 'ETag': head['etag']}
+        return self.downloader.download(key, dest, head)
+
+    def presigner(self, expires_in):
+        return Presigner(self.s3, self.bucket, expires_in)
+
+
+_MAGIC = b'CPOB'
+_HEADER = struct.Struct('>4sI')  # Magic, then the length of the JSON head that follows
+_INCOMING = '.incoming'  # Uploads in progress, renamed into place when complete
+# Object files end in this; key segments escape '%' as '%25', so no directory
+# name can end in it and a key never blocks another key's prefix (o/v2, o/v2/a)
+_OBJECT_SUFFIX = '%obj'
+
+
+def _escape(part):
+    return part.replace('%', '%25')
+
+
+def _unescape(part):
+    return part.replace('%25', '%')
+
+
+class LocalFSBackend(StorageBackend):
+    """Objects as files under a directory on local disk or NFS.
+
+    Each file is a short header (ETag and metadata as JSON) followed by
+    the body, so an object and its metadata are replaced together by one
+    atomic rename of a fully written temp file; readers see the old
+    object or the new one, never a partial write. get() and get_range()
+    return read-only memoryviews over the memory-mapped file, so a read
+    copies nothing until the caller does.
+    """
+
+    remote = False
+
+    def __init__(self, root, durable=True):
+        self.root = os.path.abspath(root)
+        self.bucket = self.root
+        self.durable = durable  # fsync each object before renaming it into place
+
+    def ensure(self):
+        os.makedirs(os.path.join(self.root, _INCOMING), exist_ok=True)
+
+    def _path(self, key):
+        parts = key.split('/')
+        if not key or any(part in ('', '.', '..') for part in parts) or parts[0] == _INCOMING:
+            raise ValueError(f"Invalid object key: {key!r}")
+        return os.path.join(self.root, *map(_escape, parts)) + _OBJECT_SUFFIX
+
+    def _write(self, key, metadata, write_body):
+        path = self._path(key)
+        etag = f'"{uuid.uuid4().hex}"'
+        head = json.dumps({'etag': etag, 'metadata': metadata or {}}).encode('utf-8')
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, _INCOMING))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, len(head)))
+                f.write(head)
+                write_body(f)
+                if self.durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return etag
+
+    def put(self, key, data, metadata=None):
+        return self._write(key, metadata, lambda f: f.write(data))
+
+    def put_file(self, key, path, metadata=None):
+        with open(path, 'rb') as src:
+            self._write(key, metadata, lambda f: shutil.copyfileobj(src, f, MB))
+        return None
+
+    def _open(self, key):
+        """The object's file positioned at its body, its body offset and its head"""
+        try:
+            f = open(self._path(key), 'rb')
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError) as e:
+            raise ObjectNotFound(f"No such object: {key}") from e
+        try:
+            magic, length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{key} is not an object file")
+            head = json.loads(f.read(length))
+            offset = _HEADER.size + length
+            head['size'] = os.fstat(f.fileno()).st_size - offset
+            return f, offset, head
+        except BaseException:
+            f.close()
+            raise
+
+    def _map(self, key):
+        f, offset, head = self._open(key)
+        with f:
+            # The mapping outlives the descriptor; views keep it alive
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return view[offset:offset + head['size']], head
+
+    def get(self, key, if_none_match=None):
+        view, head = self._map(key)
+        if if_none_match is not None and if_none_match == head['etag']:
+            return None
+        return view, head
+
+    def stream(self, key):
+        f, _, head = self._open(key)
+        return f, head
+
+    def get_range(self, key, start, end):
+        view, _ = self._map(key)
+        return view[start:end]
+
+    def head(self, key):
+        try:
+            f, _, head = self._open(key)
+        except ObjectNotFound:
+            return None
+        f.close()
+        return head
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix=''):
+        keys = []
+        for directory, subdirs, files in os.walk(self.root):
+            if directory == self.root and _INCOMING in subdirs:
+                subdirs.remove(_INCOMING)
+            relative = os.path.relpath(directory, self.root)
+            base = '' if relative == '.' else '/'.join(map(_unescape, relative.split(os.sep))) + '/'
+            for name in files:
+                if name.endswith(_OBJECT_SUFFIX):
+                    key = base + _unescape(name[:-len(_OBJECT_SUFFIX)])
+                    if key.startswith(prefix):
+                        keys.append(key)
+        return iter(sorted(keys))
+
+    def download(self, key, dest, head=None):
+        view, head = self._map(key)
+        dest.write(view)  # Straight from the page cache
+        return head['size']
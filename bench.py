@@ -0,0 +1,290 @@
+"""Benchmark the upload and access paths against a local S3 stand-in.
+
+    python bench.py --sizes 4096,1048576 --rows 1000,100000 --concurrency 1,8
+
+Each (size, rows, concurrency) combination gets a fresh catalog padded
+with `rows` filler records, then times upload_file, access_file,
+download_from_s3, presign_access and CloudUser.request_access, plus
+SecureCloudStorage encrypt/decrypt per size. Results are printed (or written with --out) as
+JSON with latency percentiles and throughput, so runs can be diffed,
+along with each run's get_metrics() phase breakdown. --delta adds, for
+each of --delta-sizes (multi-MB by default, as content-defined chunks
+are 256K-4M), the bytes sent re-uploading an appended, inserted-into and
+overwritten copy of a file in full versus as a delta upload. --shards
+spreads the cloud scenarios' objects over that many buckets, each its
+own stand-in, and --local stores them as files in the run's directory
+instead (presign_access is skipped, as local files cannot be presigned).
+By default S3 is the in-process local_s3.LocalS3; --endpoint-url runs
+the same workload against MinIO or a moto server instead.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from cpab import IntegratedCloudSystem, CloudUser
+from local_s3 import LocalS3
+from backends import LocalFSBackend
+from shards import Shard
+from transfer import MB
+
+ROLE = 'BCS'
+FILLER_ROLES = 'BCY,BCD'
+DELTA_EDITS = ('append', 'insert', 'overwrite')
+
+
+def _ints(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def summarize(latencies, seconds, nbytes):
+    """Percentiles (ms) and throughput for one timed run"""
+    ordered = sorted(latencies)
+    n = len(ordered)
+
+    def pct(p):
+        return round(ordered[min(n - 1, max(0, -(-p * n // 100) - 1))] * 1000, 3)
+
+    return {
+        'ops': n,
+        'p50_ms': pct(50),
+        'p90_ms': pct(90),
+        'p99_ms': pct(99),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'mean_ms': round(sum(ordered) / n * 1000, 3),
+        'ops_per_s': round(n / seconds, 2) if seconds else None,
+        'mb_per_s': round(nbytes / seconds / (1024 * 1024), 2) if seconds else None
+    }
+
+
+def timed(fn, items, concurrency):
+    """Call fn on every item from a pool; returns (latencies, wall seconds)"""
+    def one(item):
+        start = time.perf_counter()
+        if fn(item) is None:
+            raise RuntimeError(f"operation failed for {item!r}")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        latencies = [one(item) for item in items]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, items))
+    return latencies, time.perf_counter() - start
+
+
+def _shards(args):
+    """Shards for --shards, each a separate stand-in unless an endpoint is given"""
+    if args.shards <= 1:
+        return None
+    return [
+        Shard(f"{args.bucket}-{i}",
+              s3=LocalS3(latency=args.latency) if args.endpoint_url is None else None,
+              endpoint_url=args.endpoint_url)
+        for i in range(args.shards)
+    ]
+
+
+def bench_cloud(workdir, size, rows, concurrency, ops, args):
+    cloud = IntegratedCloudSystem(
+        args.bucket,
+        csv_file=os.path.join(workdir, 'access_records.csv'),
+        endpoint_url=args.endpoint_url,
+        audit_path=os.path.join(workdir, 'audit_log.jsonl'),
+        revocation_path=os.path.join(workdir, 'revocations.jsonl'),
+        key_index_path=os.path.join(workdir, 'key_index.jsonl'),
+        shards=_shards(args),
+        backend=LocalFSBackend(os.path.join(workdir, 'objects')) if args.local else None
+    )
+    if args.endpoint_url is None and args.shards <= 1 and not args.local:
+        cloud.s3 = LocalS3(latency=args.latency)
+
+    # Filler first, so lookups for the benchmarked owners sit behind every row
+    cloud.records.append_many(
+        (f"filler{i}", f"filler{i}/record.bin", FILLER_ROLES, datetime.now().isoformat())
+        for i in range(rows)
+    )
+    payload = os.path.join(workdir, 'payload.bin')
+    with open(payload, 'wb') as f:
+        f.write(os.urandom(size))
+
+    owners = [f"owner{i}" for i in range(ops)]
+    keys = [f"{owner}/payload.bin" for owner in owners]
+    users = [CloudUser(f"user{i}", ROLE, cloud) for i in range(ops)]
+    scenarios = [
+        ('upload_file', lambda owner: cloud.upload_file(owner, payload, [ROLE]) or None, owners),
+        ('access_file', lambda owner: cloud.access_file('reader', ROLE, owner), owners),
+        ('download_from_s3', cloud.download_from_s3, keys),
+        ('presign_access', lambda owner: cloud.presign_access('reader', ROLE, owner), owners),
+        ('request_access', lambda i: users[i].request_access(owners[i]), range(ops))
+    ]
+    if args.local:
+        scenarios = [scenario for scenario in scenarios if scenario[0] != 'presign_access']
+    results = []
+    for name, fn, items in scenarios:
+        latencies, seconds = timed(fn, list(items), concurrency)
+        result = {'op': name, 'size': size, 'rows': rows, 'concurrency': concurrency}
+        result.update(summarize(latencies, seconds, size * len(latencies)))
+        results.append(result)
+    cloud.audit_log.close()
+    # Where the time went, by phase (policy, s3.get, transfer, ...)
+    phases = {'size': size, 'rows': rows, 'concurrency': concurrency,
+              'metrics': cloud.get_metrics()}
+    return results, phases
+
+
+def _edit(data, edit):
+    """A slightly changed copy of data, as an owner's re-upload would be"""
+    middle = len(data) // 2
+    if edit == 'append':
+        return data + os.urandom(max(1, len(data) // 100))
+    if edit == 'insert':
+        return data[:middle] + os.urandom(16) + data[middle:]
+    return data[:middle] + os.urandom(1024) + data[middle + 1024:]  # overwrite
+
+
+def bench_delta(workdir, size, args):
+    """Bytes sent re-uploading an edited file: full upload versus delta"""
+    cloud = IntegratedCloudSystem(
+        args.bucket,
+        csv_file=os.path.join(workdir, 'access_records.csv'),
+        endpoint_url=args.endpoint_url,
+        audit_path=os.path.join(workdir, 'audit_log.jsonl'),
+        revocation_path=os.path.join(workdir, 'revocations.jsonl'),
+        key_index_path=os.path.join(workdir, 'key_index.jsonl'),
+        blob_index_path=os.path.join(workdir, 'blob_index.jsonl')
+    )
+    if args.endpoint_url is None:
+        cloud.s3 = LocalS3(latency=args.latency)
+    payload = os.path.join(workdir, 'payload.bin')
+    original = os.urandom(size)
+    results = []
+    for edit in DELTA_EDITS:
+        owner = f"delta-{edit}"
+        with open(payload, 'wb') as f:
+            f.write(original)
+        cloud.upload_file(owner, payload, [ROLE], delta=True)
+        with open(payload, 'wb') as f:
+            f.write(_edit(original, edit))
+        result = {'op': 'delta_upload', 'edit': edit, 'size': size}
+        for mode, delta in (('full', False), ('delta', True)):
+            sent = cloud.metrics.snapshot()['counters'].get('bytes_uploaded', 0)
+            start = time.perf_counter()
+            if not cloud.upload_file(owner, payload, [ROLE], delta=delta):
+                raise RuntimeError(f"{mode} upload failed for {edit}")
+            result[f'{mode}_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            result[f'{mode}_bytes'] = cloud.metrics.snapshot()['counters']['bytes_uploaded'] - sent
+        result['chunks'] = cloud.last_delta_report['chunks']
+        result['chunks_sent'] = cloud.last_delta_report['chunks_sent']
+        result['saved_pct'] = round(100 * (1 - result['delta_bytes'] / result['full_bytes']), 2)
+        results.append(result)
+    cloud.audit_log.close()
+    return results
+
+
+def bench_crypto(size, concurrency, ops):
+    # SecureCloudStorage lives with the desktop app in ok/
+    try:
+        from ok.encryption import SecureCloudStorage
+    except ImportError as e:
+        print(f"Skipping encryption benchmarks: {e}", file=sys.stderr)
+        return []
+    storage = SecureCloudStorage('bench-key')
+    plaintext = os.urandom(size)
+    sealed = io.BytesIO()
+    storage.encrypt_stream(io.BytesIO(plaintext), sealed)
+    sealed = sealed.getvalue()
+
+    def encrypt(_):
+        storage.encrypt_stream(io.BytesIO(plaintext), io.BytesIO())
+        return True
+
+    def decrypt(_):
+        storage.decrypt_stream(io.BytesIO(sealed), io.BytesIO())
+        return True
+
+    results = []
+    for name, fn in (('encrypt_stream', encrypt), ('decrypt_stream', decrypt)):
+        latencies, seconds = timed(fn, range(ops), concurrency)
+        result = {'op': name, 'size': size, 'rows': None, 'concurrency': concurrency}
+        result.update(summarize(latencies, seconds, size * len(latencies)))
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=_ints, default=[4096, 1024 * 1024],
+                        help='object sizes in bytes, comma-separated')
+    parser.add_argument('--rows', type=_ints, default=[1000, 100000],
+                        help='filler catalog rows, comma-separated')
+    parser.add_argument('--concurrency', type=_ints, default=[1, 8],
+                        help='worker threads, comma-separated')
+    parser.add_argument('--ops', type=int, default=200, help='operations per scenario')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='simulated seconds per S3 request (local stand-in only)')
+    parser.add_argument('--endpoint-url', default=None,
+                        help='run against this S3 endpoint instead of the local stand-in')
+    parser.add_argument('--bucket', default='cpab-bench')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='buckets to spread objects over by consistent hashing')
+    parser.add_argument('--local', action='store_true',
+                        help='store the cloud scenarios\' objects on local disk instead of S3')
+    parser.add_argument('--delta', action='store_true',
+                        help='also compare bytes sent by full and delta re-uploads')
+    parser.add_argument('--delta-sizes', type=_ints, default=[8 * MB, 64 * MB],
+                        help='file sizes in bytes for --delta, comma-separated')
+    parser.add_argument('--out', default=None, help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    phases = []
+    delta = []
+    # The access path prints per request; keep that out of the timings' output
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for size in args.sizes:
+            for rows in args.rows:
+                for concurrency in args.concurrency:
+                    with tempfile.TemporaryDirectory(prefix='cpab-bench-') as workdir:
+                        cloud_results, cloud_phases = bench_cloud(
+                            workdir, size, rows, concurrency, args.ops, args)
+                    results.extend(cloud_results)
+                    phases.append(cloud_phases)
+            for concurrency in args.concurrency:
+                results.extend(bench_crypto(size, concurrency, args.ops))
+        # Files smaller than a few chunks would be re-sent whole either way
+        for size in args.delta_sizes if args.delta else ():
+            with tempfile.TemporaryDirectory(prefix='cpab-bench-') as workdir:
+                delta.extend(bench_delta(workdir, size, args))
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': 'local_fs' if args.local else args.endpoint_url or 'local_s3',
+        'latency_s': args.latency,
+        'shards': args.shards,
+        'ops': args.ops,
+        'results': results,
+        'phases': phases
+    }
+    if args.delta:
+        report['delta'] = delta
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
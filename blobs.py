@@ -0,0 +1,97 @@
+import hashlib
+import json
+
+from journal import Journal
+from transfer import MB
+
+BLOB_PREFIX = 'blobs/sha256/'
+LAYOUT_KEY = 'layout'  # S3 user metadata marking an object as a chunk manifest
+MANIFEST_LAYOUT = 'chunks'
+
+
+def blob_key(digest):
+    """Content address for a sha256 hex digest"""
+    return f"{BLOB_PREFIX}{digest}"
+
+
+def file_digest(file_path, chunk_size=1 * MB):
+    """sha256 hex digest of a file, read in fixed-size chunks into one buffer"""
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def is_manifest(metadata):
+    return (metadata or {}).get(LAYOUT_KEY) == MANIFEST_LAYOUT
+
+
+def encode_manifest(chunks):
+    """Manifest body for a file stored as blobs: (sha256 hex digest, size) in order"""
+    chunks = [[digest, size] for digest, size in chunks]
+    return json.dumps({
+        'format': 1,
+        'size': sum(size for _, size in chunks),
+        'chunks': chunks
+    }, separators=(',', ':')).encode('utf-8')
+
+
+def decode_manifest(data):
+    manifest = json.loads(bytes(data))
+    if manifest.get('format') != 1:
+        raise ValueError(f"Unknown manifest format: {manifest.get('format')}")
+    return manifest
+
+
+class BlobIndex(Journal):
+    """Content-addressed blobs known to exist, so repeat uploads skip S3.
+
+    Lookups hit an in-memory set first. A miss falls back to one HEAD
+    request, and blobs found (or uploaded) are appended to a JSONL file
+    that is replayed on first use, so later processes skip even the HEAD.
+    A blob is only deleted when rebalance moves it off a shard, and it is
+    removed from the index first; every lookup picks up removals other
+    processes journaled, which is what keeps a cached "exists" safe.
+    """
+
+    def __init__(self, path='blob_index.jsonl'):
+        super().__init__(path)
+
+    def _reset(self):
+        self._known = set()
+
+    def _apply(self, entry):
+        if entry.get('op') == 'remove':
+            self._known.discard((entry['bucket'], entry['key']))
+        else:
+            self._known.add((entry['bucket'], entry['key']))
+
+    def add(self, bucket, s3_key, size=None):
+        self._ensure_loaded()
+        with self._lock:
+            if (bucket, s3_key) not in self._known:
+                self._append({'bucket': bucket, 'key': s3_key, 'size': size})
+
+    def remove(self, bucket, s3_key):
+        """Forget a blob about to be deleted from bucket"""
+        self._refresh()
+        with self._lock:
+            if (bucket, s3_key) in self._known:
+                self._append({'op': 'remove', 'bucket': bucket, 'key': s3_key})
+
+    def exists(self, backend, s3_key):
+        """True if the blob is in the backend, asking it only on an index miss"""
+        self._refresh()
+        if (backend.bucket, s3_key) in self._known:
+            return True
+        head = backend.head(s3_key)
+        if head is None:
+            return False
+        self.add(backend.bucket, s3_key, head['size'])
+        return True
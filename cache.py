@@ -0,0 +1,245 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from transfer import MB
+
+
+class _LRUTier:
+    """Byte-budgeted LRU index; subclasses decide where the bytes live"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()  # key -> metadata dict with 'size'
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        meta = self.entries.get(key)
+        if meta is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return meta
+
+    def _admit(self, key, meta):
+        self.pop(key)
+        if meta['size'] > self.max_bytes:
+            return False
+        self.entries[key] = meta
+        self.size += meta['size']
+        while self.size > self.max_bytes:
+            old_key, _ = next(iter(self.entries.items()))
+            self.pop(old_key)
+            self.evictions += 1
+        return True
+
+    def pop(self, key):
+        meta = self.entries.pop(key, None)
+        if meta is not None:
+            self.size -= meta['size']
+            self._discard(meta)
+        return meta
+
+    def _discard(self, meta):
+        pass
+
+    def touch(self, key, fetched_at):
+        if key in self.entries:
+            self.entries[key]['fetched_at'] = fetched_at
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes
+        }
+
+
+class MemoryTier(_LRUTier):
+    def get(self, key):
+        meta = self._lookup(key)
+        if meta is None:
+            return None
+        return meta['etag'], meta['data'], meta['fetched_at'], meta['metadata']
+
+    def put(self, key, etag, data, fetched_at, metadata=None):
+        self._admit(key, {'etag': etag, 'data': data, 'fetched_at': fetched_at,
+                          'metadata': metadata or {}, 'size': len(data)})
+
+
+class DiskTier(_LRUTier):
+    """Objects as files under a directory, with a JSON sidecar for the ETag and metadata.
+
+    Hits are served as read-only memoryviews over the memory-mapped file,
+    so nothing is copied until the caller does.
+    """
+
+    def __init__(self, max_bytes, directory):
+        super().__init__(max_bytes)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # Re-adopt entries left by an earlier process, oldest access first
+        found = []
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, name), 'r') as f:
+                    meta = json.load(f)
+                meta['size'] = os.path.getsize(meta['path'])
+                found.append((os.path.getatime(meta['path']), meta))
+            except (OSError, ValueError, KeyError):
+                continue
+        for _, meta in sorted(found, key=lambda item: item[0]):
+            self._admit(meta['key'], meta)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        meta = self._lookup(key)
+        if meta is None:
+            return None
+        try:
+            data = b''
+            with open(meta['path'], 'rb') as f:
+                if meta['size']:
+                    # A replaced or removed file stays mapped until the view is dropped
+                    data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            return meta['etag'], data, meta['fetched_at'], meta.get('metadata') or {}
+        except (OSError, ValueError):
+            self.pop(key)
+            return None
+
+    def write(self, key, etag, data, fetched_at, metadata=None):
+        """Write an object's files and return its entry for admit(), or None if it can't fit"""
+        if len(data) > self.max_bytes:
+            return None
+        # A fresh name per write, so a copy being read or replaced is never overwritten
+        path = f"{self._path(key)}-{os.urandom(8).hex()}"
+        meta = {'key': key, 'etag': etag, 'path': path, 'fetched_at': fetched_at,
+                'metadata': metadata or {}, 'size': len(data)}
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+        with open(f"{path}.json.tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+        return meta
+
+    def admit(self, key, meta):
+        """Index a written entry, dropping any older copy of key"""
+        if not self._admit(key, meta):
+            self._discard(meta)
+
+    def put(self, key, etag, data, fetched_at, metadata=None):
+        meta = self.write(key, etag, data, fetched_at, metadata)
+        if meta is not None:
+            self.admit(key, meta)
+
+    def touch(self, key, fetched_at):
+        super().touch(key, fetched_at)
+        meta = self.entries.get(key)
+        if meta is not None:
+            with open(f"{meta['path']}.json", 'w') as f:
+                json.dump(meta, f)
+
+    def _discard(self, meta):
+        for path in (meta['path'], f"{meta['path']}.json"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class ObjectCache:
+    """Read-through cache for storage backend objects with a memory tier and a disk tier.
+
+    Entries younger than ttl are served without contacting the backend.
+    Older ones are revalidated with a conditional GET on their ETag, which
+    costs a round trip but no transfer when the object is unchanged.
+    """
+
+    def __init__(self, memory_bytes=64 * MB, disk_bytes=1024 * MB,
+                 disk_dir='.object_cache', ttl=60.0):
+        self.memory = MemoryTier(memory_bytes)
+        self.disk = DiskTier(disk_bytes, disk_dir) if disk_bytes else None
+        self.ttl = ttl
+        self.revalidations = 0
+        self.refetches = 0
+        self._lock = threading.RLock()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is None and self.disk is not None:
+                entry = self.disk.get(key)
+                if entry is not None:
+                    self.memory.put(key, *entry)  # Promote
+            return entry
+
+    def _store(self, key, etag, data, fetched_at, metadata):
+        # The disk write happens outside the lock; only the index updates are serialized
+        written = None
+        if self.disk is not None:
+            written = self.disk.write(key, etag, data, fetched_at, metadata)
+        with self._lock:
+            self.memory.put(key, etag, data, fetched_at, metadata)
+            if written is not None:
+                self.disk.admit(key, written)
+
+    def get(self, backend, s3_key):
+        """Return the object's bytes, from cache when fresh"""
+        return self.fetch(backend, s3_key)[0]
+
+    def fetch(self, backend, s3_key):
+        """Like get, but return (bytes, the object's user metadata)"""
+        key = f"{backend.bucket}/{s3_key}"
+        entry = self._lookup(key)
+        now = time.time()
+        if entry is not None:
+            etag, data, fetched_at, metadata = entry
+            if now - fetched_at < self.ttl:
+                return data, metadata
+            result = backend.get(s3_key, if_none_match=etag)
+            if result is None:
+                with self._lock:
+                    self.revalidations += 1
+                    self.memory.touch(key, now)
+                    if self.disk is not None:
+                        self.disk.touch(key, now)
+                return data, metadata
+            with self._lock:
+                self.refetches += 1
+        else:
+            result = backend.get(s3_key)
+        data, head = result
+        self._store(key, head['etag'], data, now, head['metadata'])
+        return data, head['metadata']
+
+    def invalidate(self, bucket, s3_key):
+        key = f"{bucket}/{s3_key}"
+        with self._lock:
+            self.memory.pop(key)
+            if self.disk is not None:
+                self.disk.pop(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'memory': self.memory.stats(),
+                'disk': self.disk.stats() if self.disk is not None else None,
+                'revalidations': self.revalidations,
+                'refetches': self.refetches
+            }
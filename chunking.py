@@ -0,0 +1,86 @@
+import numpy as np
+
+from transfer import MB
+
+MIN_CHUNK = 256 * 1024
+AVG_CHUNK = 1 * MB
+MAX_CHUNK = 4 * MB
+WINDOW = 32  # Bytes that feed each rolling hash value
+HASH_BLOCK = 256 * 1024  # Bytes hashed per array pass; small enough to stay in cache
+
+# Fixed gear table, so every process cuts the same content at the same places
+_GEAR = np.random.default_rng(0x6765617200).integers(0, 2 ** 32, 256, dtype=np.uint32)
+
+
+def gear_hashes(data, history=b''):
+    """Gear rolling hash at every byte of data.
+
+    The hash at i is sum(GEAR[data[i - j]] << j for j < WINDOW) mod 2**32,
+    the same value the byte-at-a-time recurrence h = (h << 1) + GEAR[b]
+    reaches. It is built in log2(WINDOW) whole-array passes by doubling
+    the window, instead of a Python loop per byte. history holds the bytes
+    just before data, so hashes continue across reads.
+    """
+    history = history[-(WINDOW - 1):]
+    buf = np.frombuffer(bytes(history) + bytes(data), dtype=np.uint8)
+    h = _GEAR[buf]
+    span = 1
+    while span < WINDOW:
+        h[span:] += h[:-span] << np.uint32(span)  # The shifted operand is a copy
+        span *= 2
+    return h[len(history):]
+
+
+def _mask(bits):
+    # The top bits of a gear hash depend on the whole window
+    return np.uint32(((1 << bits) - 1) << (32 - bits))
+
+
+def iter_chunks(src, min_size=MIN_CHUNK, avg_size=AVG_CHUNK, max_size=MAX_CHUNK, read_size=4 * MB):
+    """Split a binary stream into content-defined chunks, yielding bytes.
+
+    A chunk ends where the rolling hash of the preceding WINDOW bytes
+    matches a mask, so boundaries move with the content: an insert or
+    append changes the chunks around it and leaves the rest identical.
+    Chunks are at least min_size (except the last) and at most max_size,
+    averaging about avg_size.
+    """
+    if not 0 < min_size <= avg_size <= max_size:
+        raise ValueError("Chunk sizes must satisfy 0 < min_size <= avg_size <= max_size")
+    mask = _mask(min(31, max(1, (avg_size - min_size).bit_length() - 1)))
+    buffer = b''
+    base = 0  # Stream offset of buffer[0]
+    start = 0  # Stream offset where the next chunk begins
+    hashed = 0  # Stream bytes read and hashed so far
+    history = b''
+    cuts = []  # Candidate chunk ends, as stream offsets, ascending
+    eof = False
+    while not eof:
+        block = src.read(read_size)
+        if block:
+            for offset in range(0, len(block), HASH_BLOCK):
+                piece = block[offset:offset + HASH_BLOCK]
+                hits = np.flatnonzero((gear_hashes(piece, history) & mask) == 0)
+                cuts.extend((hits + (hashed + offset + 1)).tolist())
+                history = (history + piece)[-(WINDOW - 1):]
+            buffer = buffer[start - base:] + block
+            base = start
+            hashed += len(block)
+        else:
+            eof = True
+        i = 0
+        while True:
+            while i < len(cuts) and cuts[i] < start + min_size:
+                i += 1
+            limit = min(start + max_size, hashed)
+            if i < len(cuts) and cuts[i] <= limit:
+                end = cuts[i]
+            elif hashed >= start + max_size:
+                end = start + max_size
+            elif eof and hashed > start:
+                end = hashed
+            else:
+                break
+            yield buffer[start - base:end - base]
+            start = end
+        del cuts[:i]
@@ -0,0 +1,124 @@
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zlib from the standard library is the fallback
+    zstandard = None
+
+from transfer import MB
+
+METADATA_KEY = 'codec'  # S3 user metadata naming the codec of a stored body
+SAMPLE_SIZE = 64 * 1024
+MIN_SIZE = 1024  # Headers and framing eat the saving on anything smaller
+MIN_SAVING = 0.1  # A sample must shrink by at least this much to bother
+
+# Leading bytes of formats that are already compressed (or encrypted)
+_COMPRESSED_MAGIC = (
+    b'\x1f\x8b',  # gzip
+    b'PK\x03\x04',  # zip, docx, jar
+    b'\x28\xb5\x2f\xfd',  # zstd
+    b'BZh',  # bzip2
+    b'\xfd7zXZ\x00',  # xz
+    b'7z\xbc\xaf\x27\x1c',  # 7z
+    b'Rar!',
+    b'\x89PNG',
+    b'\xff\xd8\xff',  # JPEG
+    b'GIF8',
+    b'OggS',
+    b'fLaC',
+    b'ID3',  # MP3
+    b'SCS2',  # SecureCloudStorage chunked ciphertext
+)
+
+
+def available_codecs():
+    return ('zstd', 'zlib') if zstandard is not None else ('zlib',)
+
+
+def default_codec():
+    return available_codecs()[0]
+
+
+def looks_compressed(sample):
+    if sample.startswith(_COMPRESSED_MAGIC):
+        return True
+    if sample[4:8] == b'ftyp':  # MP4, MOV, HEIC
+        return True
+    return sample[:4] == b'RIFF' and sample[8:12] in (b'WEBP', b'AVI ')
+
+
+def choose_codec(sample, size, codec=None):
+    """Codec to store data beginning with sample under, or None to store it raw.
+
+    Skips small bodies and known compressed formats by their magic bytes,
+    then trial-compresses the sample with fast zlib and skips data that
+    barely shrinks, so already-dense content costs one sample's worth of
+    CPU rather than a full pass.
+    """
+    if size < MIN_SIZE or looks_compressed(sample):
+        return None
+    sample = sample[:SAMPLE_SIZE]
+    if len(zlib.compress(sample, 1)) > len(sample) * (1 - MIN_SAVING):
+        return None
+    codec = codec or default_codec()
+    if codec not in available_codecs():
+        raise ValueError(f"Codec {codec!r} is not available")
+    return codec
+
+
+class _ZlibReader:
+    """File-like read() over src that returns zlib-compressed bytes"""
+
+    def __init__(self, src, level, chunk_size):
+        self.src = src
+        self.chunk_size = chunk_size
+        self._compressor = zlib.compressobj(level)
+        self._buffer = bytearray()
+        self._done = False
+
+    def read(self, size=-1):
+        while not self._done and (size < 0 or len(self._buffer) < size):
+            chunk = self.src.read(self.chunk_size)
+            if chunk:
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._done = True
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+def compressing_reader(src, codec, level=None, chunk_size=1 * MB):
+    """Wrap a binary stream so read() yields its compressed form"""
+    if codec == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return compressor.stream_reader(src, read_size=chunk_size)
+    if codec == 'zlib':
+        return _ZlibReader(src, 6 if level is None else level, chunk_size)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def iter_decompress(chunks, codec):
+    """Yield the decompressed bytes of an iterable of compressed chunks"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("Object is zstd-compressed but zstandard is not installed")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    elif codec == 'zlib':
+        decompressor = zlib.decompressobj()
+    else:
+        raise ValueError(f"Unknown codec: {codec}")
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def decompress(data, codec):
+    return b''.join(iter_decompress([data], codec))
@@ -1,151 +1,943 @@
-import csv
+import hashlib
+import hmac
+import io
+import json
 import os
-import boto3
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from botocore.exceptions import ClientError
+from audit import AuditLog, format_event
+from backends import ObjectNotFound, S3Backend
+from blobs import (BLOB_PREFIX, LAYOUT_KEY, MANIFEST_LAYOUT, BlobIndex, blob_key, decode_manifest,
+                   encode_manifest, file_digest, is_manifest)
+from compression import (METADATA_KEY, SAMPLE_SIZE, choose_codec, compressing_reader,
+                         decompress, iter_decompress)
+from fingerprints import KeyIndex
+from metrics import Metrics
+from policy import PolicyEngine
+from presign import DEFAULT_EXPIRY
+from records import RecordCatalog, initialize_csv, object_key
+from revocation import RevocationRegistry
+from shards import Shard, ShardSet
+from transfer import MB, iter_body
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+# What complete_upload records, so presign_upload's token covers all of it
+_SIGNED_UPLOAD_FIELDS = ('owner', 'filename', 'version', 's3_key', 'allowed_roles', 'location')
+
+
+def shared_s3_client(endpoint_url=None, max_pool_connections=50, region_name='ap-south-1'):
+    """Return this process's S3 client for the given configuration.
+
+    boto3 clients are thread-safe, so every IntegratedCloudSystem shares one
+    client and its connection pool instead of building and warming its own.
+    """
+    key = (region_name, endpoint_url, max_pool_connections)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                # Deferred: importing boto3 dominates a cold start
+                import boto3
+                from botocore.config import Config
+                client = boto3.client(
+                    's3',
+                    region_name=region_name,
+                    endpoint_url=endpoint_url,
+                    config=Config(max_pool_connections=max_pool_connections)
+                )
+                _clients[key] = client
+    return client
 
 
 class IntegratedCloudSystem:
-    def __init__(self, s3_bucket_name, csv_file='access_records.csv'):
-        self.s3 = boto3.client('s3', region_name='ap-south-1')
+    def __init__(self, s3_bucket_name, csv_file='access_records.csv', record_store=None,
+                 endpoint_url=None, multipart_threshold=64 * MB, multipart_part_size=16 * MB,
+                 multipart_workers=8, cache=None, max_pool_connections=50, cipher=None,
+                 audit_path='audit_log.jsonl', audit_capacity=10000,
+                 revocation_path='revocations.jsonl', revocation_bloom_capacity=None,
+                 key_index_path='key_index.jsonl', metrics=None, dedup=False,
+                 blob_index_path='blob_index.jsonl', compression=False,
+                 presign_expiry=DEFAULT_EXPIRY, delta=False, shards=None, backend=None,
+                 upload_secret=None):
+        # Nothing here talks to S3: the client and bucket check happen on first use
         self.s3_bucket_name = s3_bucket_name
         self.csv_file = csv_file
-        self._ensure_bucket_exists()
-        self._initialize_csv()
-        self.audit_log = []
+        # endpoint_url points the client at a local S3 stand-in (MinIO, moto server)
+        self.endpoint_url = endpoint_url
+        self.max_pool_connections = max_pool_connections
+        self.multipart_threshold = multipart_threshold
+        self.multipart_part_size = multipart_part_size
+        self.multipart_workers = multipart_workers
+        # Objects are spread over shards (Shard objects or bucket names) by
+        # consistent hashing, and each catalog row records where its object
+        # went. By default there is one shard: s3_bucket_name, stored in S3
+        # unless backend (a backends.StorageBackend) says otherwise.
+        if shards is None and backend is not None:
+            shards = [Shard(s3_bucket_name, backend=backend)]
+        self.shards = self._shard_set(shards)
+        self.s3_bucket_name = self.shards.primary.bucket
+        self.last_upload_report = None
+        self.last_delta_report = None
+        self.cache = cache  # Optional cache.ObjectCache for repeat reads
+        # Optional client-side encryption, e.g. ok.encryption.SecureCloudStorage:
+        # anything with encrypt_stream(src, dst) and iter_decrypt(src)
+        self.cipher = cipher
+        if record_store is None:
+            # The CSV stays the default; pass a SQLiteRecordStore for many writers
+            self._initialize_csv()
+            record_store = RecordCatalog(csv_file)
+        self.records = record_store
+        self.policies = PolicyEngine()
+        self._role_matrix = None
+        self._role_matrix_version = None
+        # Bounded in memory, flushed to audit_path in the background
+        self.audit_log = AuditLog(audit_path, capacity=audit_capacity)
         self.data_store = {}  # Maintained for backward compatibility
-        self.keys = {}  # For revocation functionality
+        self.key_index = KeyIndex(key_index_path)  # For leak tracing
+        self.revocations = RevocationRegistry(revocation_path, revocation_bloom_capacity)
+        # Phase timers and byte counters; pass a shared Metrics to aggregate systems
+        self.metrics = metrics if metrics is not None else Metrics()
+        # Dedup stores each distinct body once under blobs/sha256/<digest>; the
+        # catalog row then points at the blob, so reads need no special casing
+        self.dedup = dedup
+        self.blobs = BlobIndex(blob_index_path)
+        # True (zstd, else zlib) or a codec name: compress bodies that shrink
+        # before encrypting and uploading, naming the codec in object metadata
+        self.compression = compression
+        # Delta uploads store content-defined chunks as blobs plus a manifest
+        # under the file's key, so a re-upload sends only the chunks that changed
+        self.delta = delta
+        self.presign_expiry = presign_expiry  # Seconds presigned URLs stay valid
+        # Signs presign_upload's tickets; processes completing each other's uploads share it
+        self.upload_secret = upload_secret or os.urandom(32)
 
-    def _ensure_bucket_exists(self):
-        try:
-            self.s3.head_bucket(Bucket=self.s3_bucket_name)
-            print(f"Bucket '{self.s3_bucket_name}' exists")
-        except ClientError as e:
-            if e.response['Error']['Code'] == '404':
-                self.s3.create_bucket(
-                    Bucket=self.s3_bucket_name,
-                    CreateBucketConfiguration={'LocationConstraint': 'ap-south-1'}
-                )
-                print(f"Created bucket '{self.s3_bucket_name}'")
-            else:
-                print(f"Bucket error: {e}")
-                raise
+    def _shard_set(self, shards):
+        # Bucket names become shards on this system's endpoint
+        return ShardSet([
+            shard if isinstance(shard, Shard) else Shard(shard, endpoint_url=self.endpoint_url)
+            for shard in (shards or [self.s3_bucket_name])
+        ])
+
+    def _backend(self, shard):
+        backend = shard.backend
+        if backend is None:
+            if shard.s3 is None:
+                shard.s3 = shared_s3_client(shard.endpoint_url, self.max_pool_connections)
+            backend = shard.backend = S3Backend(
+                shard.s3, shard.bucket,
+                part_size=self.multipart_part_size,
+                max_workers=self.multipart_workers,
+                threshold=self.multipart_threshold
+            )
+        if not shard.ready:
+            backend.ensure()
+            shard.ready = True
+        return backend
+
+    @property
+    def backend(self):
+        return self._backend(self.shards.primary)
+
+    @property
+    def s3(self):
+        return self.backend.s3
+
+    @s3.setter
+    def s3(self, client):
+        primary = self.shards.primary
+        primary.s3 = client
+        primary.backend = None
+        primary.ready = False
+
+    @property
+    def uploader(self):
+        return self.backend.uploader
+
+    @property
+    def downloader(self):
+        return self.backend.downloader
+
+    @property
+    def presigner(self):
+        return self.backend.presigner(self.presign_expiry)
+
+    def _locate(self, s3_key):
+        """The shard holding s3_key, from its catalog row, so a read is one targeted GET"""
+        if len(self.shards) == 1:
+            return self.shards.primary
+        if s3_key.startswith(BLOB_PREFIX):
+            return self.shards.place(s3_key)  # Blobs have no row; they sit where the ring puts them
+        row = self.records.row_for_key(s3_key)
+        if row is None:
+            return self.shards.place(s3_key)
+        return self.shards.locate(row.get('location'))
 
     def _initialize_csv(self):
-        if not os.path.exists(self.csv_file):
-            with open(self.csv_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['admin', 's3_key', 'allowed_roles', 'upload_time'])
-                # Sample data as in your original
-                writer.writerow(['bob', 'Bob/test.txt', 'BCS,BCY,BCD', '2025-04-01T16:49:22.656298'])
-
-    def upload_file(self, owner, file_path, allowed_roles):
-        try:
+        initialize_csv(self.csv_file)
+
+    def _put_file(self, owner, file_path, dedup=None, delta=None, version=None):
+        """PUT a file as the next (or an already reserved) version of owner's basename.
+
+        Returns (s3_key, filename, version, location), location being the
+        name of the shard the object was placed on.
+        """
+        filename = os.path.basename(file_path)
+        if version is None:
+            version = self.records.next_version(owner, filename)
+        if self.delta if delta is None else delta:
+            s3_key = object_key(owner, filename, version)
+            self._put_chunked(s3_key, file_path)
+        elif self.dedup if dedup is None else dedup:
+            s3_key = self._put_blob(file_path)
+        else:
+            s3_key = object_key(owner, filename, version)
+            self._put_body(s3_key, file_path)
+        return s3_key, filename, version, self.shards.place(s3_key).name
+
+    def _put_blob(self, file_path):
+        """Store a file's content once under its sha256 address and return that key"""
+        with self.metrics.timer('hash'):
+            s3_key = blob_key(file_digest(file_path))
+        backend = self._backend(self.shards.place(s3_key))
+        if self.blobs.exists(backend, s3_key):
+            self.metrics.incr('dedup_hits')
+            self.metrics.incr('bytes_deduplicated', os.path.getsize(file_path))
+            print(f"✅ {os.path.basename(file_path)} already stored as {s3_key}")
+            return s3_key
+        self._put_body(s3_key, file_path)
+        self.blobs.add(backend.bucket, s3_key, os.path.getsize(file_path))
+        return s3_key
+
+    def _put_chunked(self, s3_key, file_path):
+        """Store a file as content-defined chunks plus a manifest at s3_key.
+
+        Chunks are content-addressed blobs, so only those the store does
+        not already hold are sent, from a bounded pool.
+        """
+        # NumPy is only needed for chunking
+        from chunking import iter_chunks
+        start = time.perf_counter()
+        entries = []
+        seen = set()
+        uploads = deque()
+        sent = []
+        with open(file_path, 'rb') as src, \
+                ThreadPoolExecutor(max_workers=self.multipart_workers) as pool:
+            for chunk in self.metrics.timed_iter('chunk', iter_chunks(src)):
+                with self.metrics.timer('hash'):
+                    digest = hashlib.sha256(chunk).hexdigest()
+                entries.append((digest, len(chunk)))
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                uploads.append(pool.submit(self._put_chunk, digest, chunk))
+                while len(uploads) > 2 * self.multipart_workers:  # Bounds chunks held in memory
+                    sent.append(uploads.popleft().result())
+            sent.extend(future.result() for future in uploads)
+        manifest = encode_manifest(entries)
+        backend = self._backend(self.shards.place(s3_key))
+        with self.metrics.timer('s3.put'):
+            backend.put(s3_key, manifest, {LAYOUT_KEY: MANIFEST_LAYOUT})
+        self.metrics.incr('bytes_uploaded', len(manifest))
+        if self.cache is not None:
+            self.cache.invalidate(backend.bucket, s3_key)
+        size = sum(n for _, n in entries)
+        new_bytes = sum(sent)
+        self.metrics.incr('delta_chunks', len(entries))
+        self.metrics.incr('delta_chunks_sent', sum(1 for n in sent if n))
+        self.metrics.incr('bytes_deduplicated', size - new_bytes)
+        self.last_delta_report = {
+            's3_key': s3_key,
+            'bytes': size,
+            'chunks': len(entries),
+            'chunks_sent': sum(1 for n in sent if n),
+            'bytes_sent': new_bytes,
+            'seconds': time.perf_counter() - start
+        }
+        print(f"✅ Uploaded {s3_key} as {len(entries)} chunks, "
+              f"sent {self.last_delta_report['chunks_sent']} ({new_bytes} of {size} bytes)")
+
+    def _put_chunk(self, digest, chunk):
+        """Upload one chunk unless its blob exists; returns the plaintext bytes sent"""
+        s3_key = blob_key(digest)
+        backend = self._backend(self.shards.place(s3_key))
+        if self.blobs.exists(backend, s3_key):
+            return 0
+        self._put_bytes(s3_key, chunk)
+        self.blobs.add(backend.bucket, s3_key, len(chunk))
+        return len(chunk)
+
+    def _put_bytes(self, s3_key, data):
+        """PUT an in-memory body, compressed and encrypted like _put_body"""
+        codec = self._choose_codec(data[:SAMPLE_SIZE], len(data))
+        if codec is not None or self.cipher is not None:
+            src = io.BytesIO(data)
+            if codec is not None:
+                src = compressing_reader(src, codec)
+            if self.cipher is None:
+                with self.metrics.timer('compress'):
+                    data = src.read()
+            else:
+                dst = io.BytesIO()
+                with self.metrics.timer('crypto'):
+                    self.cipher.encrypt_stream(src, dst)
+                data = dst.getvalue()
+        backend = self._backend(self.shards.place(s3_key))
+        with self.metrics.timer('s3.put'):
+            backend.put(s3_key, data, {METADATA_KEY: codec} if codec else None)
+        self.metrics.incr('bytes_uploaded', len(data))
+
+    def _choose_codec(self, sample, size):
+        if not self.compression:
+            return None
+        preferred = self.compression if isinstance(self.compression, str) else None
+        return choose_codec(sample, size, preferred)
+
+    def _put_body(self, s3_key, file_path):
+        shard = self.shards.place(s3_key)
+        codec = None
+        if self.compression:
             with open(file_path, 'rb') as f:
-                s3_key = f"{owner}/{os.path.basename(file_path)}"
-                self.s3.put_object(
-                    Bucket=self.s3_bucket_name,
-                    Key=s3_key,
-                    Body=f,
-                    ServerSideEncryption='AES256'
-                )
-                self._update_csv(owner, s3_key, allowed_roles)
-                self.data_store[owner] = s3_key  # Maintain compatibility
-                self.audit_log.append(f"Uploaded {s3_key} by {owner}")
-                return True
+                codec = self._choose_codec(f.read(SAMPLE_SIZE), os.path.getsize(file_path))
+        if codec is None and self.cipher is None:
+            self._put_path(shard, s3_key, file_path)
+        else:
+            # Compress, then encrypt, into a temp file chunk by chunk and upload that
+            with open(file_path, 'rb') as src, tempfile.NamedTemporaryFile(delete=False) as dst:
+                reader = src if codec is None else compressing_reader(src, codec)
+                if self.cipher is None:
+                    with self.metrics.timer('compress'):
+                        shutil.copyfileobj(reader, dst, MB)
+                else:
+                    with self.metrics.timer('crypto'):  # Includes compression, if any
+                        self.cipher.encrypt_stream(reader, dst)
+            try:
+                if codec is not None:
+                    saved = os.path.getsize(file_path) - os.path.getsize(dst.name)
+                    self.metrics.incr('bytes_saved_by_compression', saved)
+                self._put_path(shard, s3_key, dst.name, {METADATA_KEY: codec} if codec else None)
+            finally:
+                os.remove(dst.name)
+        if self.cache is not None:
+            self.cache.invalidate(self._backend(shard).bucket, s3_key)
+
+    def _put_path(self, shard, s3_key, file_path, metadata=None):
+        size = os.path.getsize(file_path)
+        with self.metrics.timer('s3.put'):
+            self._put_object(shard, s3_key, file_path, metadata)
+        self.metrics.incr('bytes_uploaded', size)
+
+    def _put_object(self, shard, s3_key, file_path, metadata=None):
+        # On S3, large files go up in parallel parts; a failed upload is aborted
+        report = self._backend(shard).put_file(s3_key, file_path, metadata)
+        if report is not None:
+            self.last_upload_report = report
+            slowest = max(report['parts'], key=lambda p: p['seconds'], default=None)
+            print(f"✅ Uploaded {s3_key} in {len(report['parts'])} parts in {report['seconds']:.2f}s"
+                  + (f", slowest part {slowest['part']} {slowest['seconds']:.2f}s" if slowest else ""))
+
+    def upload_file(self, owner, file_path, allowed_roles, dedup=None, delta=None):
+        """Upload a file as the owner's next version of it.
+
+        dedup (default: the system's setting) stores the content once under
+        its hash and records a reference to it when it is already stored.
+        delta (likewise) stores it as chunks and sends only the new ones.
+        """
+        start = time.perf_counter()
+        try:
+            self.policies.compile(','.join(allowed_roles))  # Reject malformed policies up front
+            s3_key, filename, version, location = self._put_file(owner, file_path, dedup, delta)
+            self._update_csv(owner, s3_key, allowed_roles, filename, version, location)
+            self.data_store[owner] = s3_key  # Maintain compatibility
+            self.audit_log.record('upload', actor=owner, owner=owner, key=s3_key)
+            self.metrics.observe('upload_file', time.perf_counter() - start)
+            return True
         except Exception as e:
+            self.metrics.incr('errors')
             print(f"Upload failed: {e}")
             return False
 
-    def _update_csv(self, owner, s3_key, allowed_roles):
-        with open(self.csv_file, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                owner.lower(),
-                s3_key,
-                ','.join(allowed_roles),
-                datetime.now().isoformat()
-            ])
-
-    def access_file(self, user, user_role, owner):
+    def upload_many(self, owner, paths, allowed_roles, concurrency=8, dedup=None, delta=None):
+        """Upload many files in parallel and commit their records in one write.
+
+        Returns one result dict per path, in input order.
+        """
+        start = time.perf_counter()
+        paths = list(paths)
+        try:
+            self.policies.compile(','.join(allowed_roles))
+            # One reservation for the batch rather than a write per file
+            versions = self.records.next_versions(owner, [os.path.basename(path) for path in paths])
+        except Exception as e:
+            print(f"Upload failed: {e}")
+            return []
+
+        def put(path, version):
+            t0 = time.perf_counter()
+            try:
+                s3_key, filename, version, location = self._put_file(owner, path, dedup, delta, version)
+                return {'path': path, 's3_key': s3_key, 'filename': filename, 'version': version,
+                        'location': location, 'ok': True, 'seconds': time.perf_counter() - t0,
+                        'error': None}
+            except Exception as e:
+                return {'path': path, 's3_key': None, 'filename': None, 'version': None,
+                        'location': None, 'ok': False, 'seconds': time.perf_counter() - t0,
+                        'error': str(e)}
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(put, paths, versions))
+
+        uploaded = [r['s3_key'] for r in results if r['ok']]
+        upload_time = datetime.now().isoformat()
+        roles = ','.join(allowed_roles)
+        self.records.append_many([
+            (owner, r['s3_key'], roles, upload_time, r['filename'], r['version'], r['location'])
+            for r in results if r['ok']
+        ])
+        if uploaded:
+            self.data_store[owner] = uploaded[-1]  # Maintain compatibility
+        for s3_key in uploaded:
+            self.audit_log.record('upload', actor=owner, owner=owner, key=s3_key)
+        print(f"✅ Uploaded {len(uploaded)}/{len(results)} files for {owner} "
+              f"in {time.perf_counter() - start:.2f}s")
+        for r in results:
+            if not r['ok']:
+                print(f"❌ Upload failed for {r['path']}: {r['error']}")
+        return results
+
+    def _update_csv(self, owner, s3_key, allowed_roles, filename=None, version=None, location=None):
+        self.records.append(owner, s3_key, ','.join(allowed_roles), datetime.now().isoformat(),
+                            filename, version, location)
+
+    def _file_rows(self, owner, filename=None, version=None):
+        """Candidate rows for a request: one version of one file, or each file's latest"""
+        if filename is None:
+            return self.records.current_rows(owner)
+        if version is None:
+            row = self.records.latest_row(owner, filename)
+        else:
+            row = self.records.version_row(owner, filename, version)
+        return [row] if row is not None else []
+
+    def _authorized_key(self, user, user_role, owner, filename=None, version=None):
+        """Return the S3 key the user's role may read for this owner, or None.
+
+        With a filename, only that file's latest version (or the given
+        version) is considered; without one, the newest upload whose
+        policy admits the role.
+        """
+        with self.metrics.timer('policy'):
+            revoked = self.revocations.is_revoked(user, owner)
+            if not revoked:
+                # Check if the user has access based on the indexed access records
+                for row in self._file_rows(owner, filename, version):
+                    # Compiling first interns the policy's roles, so the mask sees them
+                    if self.policies.check(row['allowed_roles'], user_role):
+                        return row['s3_key']  # Retrieve the correct S3 key
+        if revoked:
+            self.metrics.incr('access_revoked')
+            self.audit_log.record('access', actor=user, role=user_role, owner=owner, outcome='revoked')
+            print(f"❌ Access revoked for {user}")
+            return None
+        self.metrics.incr('access_denied')
+        self.audit_log.record('access', actor=user, role=user_role, owner=owner, outcome='denied')
+        print(f"❌ Access denied for {user} with role {user_role}")
+        return None
+
+    def authorize_many(self, users, roles, owners):
+        """Answer access_file's authorization question for many requests at once.
+
+        users, roles and owners are parallel sequences. The batch is resolved
+        against the whole record catalog as a NumPy role matrix, without
+        touching S3. Returns (granted, s3_keys) arrays aligned with the input;
+        s3_keys holds None where access is denied.
+        """
+        # NumPy is only needed for bulk checks
+        from authz import RoleMatrix
+        if not len(users) == len(roles) == len(owners):
+            raise ValueError("users, roles and owners must have the same length")
+        if self._role_matrix is None or self._role_matrix_version != (
+                self.records.version(), len(self.policies.role_ids)):
+            self._role_matrix = RoleMatrix(self.records.current_rows_by_owner(), self.policies)
+            # Building compiles every policy, which may intern new roles
+            self._role_matrix_version = (self.records.version(), len(self.policies.role_ids))
+        granted, s3_keys = self._role_matrix.resolve(roles, owners)
+
+        revoked = self.revocations.revoked_many(users, owners)
+        if revoked.any():
+            granted &= ~revoked
+            s3_keys[revoked] = None
+        return granted, s3_keys
+
+    def access_file(self, user, user_role, owner, filename=None, version=None):
         """Retrieve a file from S3 if the user has access"""
+        start = time.perf_counter()
         try:
-            # Check if the user has access based on the CSV file
-            with open(self.csv_file, 'r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if row['admin'].lower() == owner.lower():
-                        required_roles = row['allowed_roles'].split(',')
-                        if user_role in required_roles:
-                            s3_key = row['s3_key']  # Retrieve the correct S3 key
-                            break
-                else:
-                    print(f"❌ Access denied for {user} with role {user_role}")
-                    return None
+            s3_key = self._authorized_key(user, user_role, owner, filename, version)
+            if s3_key is None:
+                return None
 
             # Attempt to retrieve the file from S3
-            response = self.s3.get_object(Bucket=self.s3_bucket_name, Key=s3_key)
-            self.audit_log.append(f"File accessed by {user} with role {user_role}")
+            data = self._read_object(s3_key)
+            self._audit_access(user, user_role, owner, s3_key, start)
+            print(f"✅ File '{s3_key}' accessed by {user}")
+            return data
+        except Exception as e:
+            self.metrics.incr('errors')
+            print(f"Failed to access file: {e}")
+            return None
+
+    def _audit_access(self, user, user_role, owner, s3_key, start, operation='access_file'):
+        latency = time.perf_counter() - start
+        self.metrics.observe(operation, latency)
+        self.metrics.incr('access_granted')
+        self.audit_log.record('access', actor=user, role=user_role, owner=owner, key=s3_key,
+                              outcome='granted', latency=latency)
+
+    def _read_object(self, s3_key):
+        # A local backend's bodies come back as memoryviews over mapped files
+        backend = self._backend(self._locate(s3_key))
+        if self.cache is not None and backend.remote:
+            with self.metrics.timer('cache'):
+                data, metadata = self.cache.fetch(backend, s3_key)
+            if is_manifest(metadata):
+                return b''.join(self._iter_chunks(decode_manifest(data)))
+            if self.cipher is not None:
+                with self.metrics.timer('crypto'):
+                    data = b''.join(self.cipher.iter_decrypt(io.BytesIO(data)))
+            return self._decompress(data, metadata)
+        if self.cipher is not None:
+            return b''.join(self._iter_object(s3_key))
+        with self.metrics.timer('s3.get'):
+            data, head = backend.get(s3_key)
+        self.metrics.incr('bytes_downloaded', len(data))
+        if is_manifest(head['metadata']):
+            return b''.join(self._iter_chunks(decode_manifest(data)))
+        return self._decompress(data, head['metadata'])
+
+    def _decompress(self, data, metadata):
+        codec = (metadata or {}).get(METADATA_KEY)
+        if not codec:
+            return data
+        with self.metrics.timer('compress'):
+            return decompress(data, codec)
+
+    def _iter_object(self, s3_key, chunk_size=1 * MB):
+        # Streams are timed per chunk: with a cipher every chunk includes its
+        # decryption. The object's metadata says whether to decompress.
+        with self.metrics.timer('s3.get'):
+            body, head = self._backend(self._locate(s3_key)).stream(s3_key)
+        if is_manifest(head['metadata']):
+            with body:
+                return self._iter_chunks(decode_manifest(body.read()))
+        if self.cipher is None:
+            chunks = iter_body(body, chunk_size)
+        else:
+            chunks = self.cipher.iter_decrypt(body)
+        chunks = self.metrics.timed_iter('transfer', chunks, 'bytes_downloaded')
+        codec = head['metadata'].get(METADATA_KEY)
+        return iter_decompress(chunks, codec) if codec else chunks
+
+    def _iter_chunks(self, manifest):
+        """Yield a chunked file's bytes in order, fetching chunks in parallel ahead of the reader"""
+        with ThreadPoolExecutor(max_workers=self.multipart_workers) as pool:
+            fetches = deque()
+            for digest, size in manifest['chunks']:
+                fetches.append(pool.submit(self._get_chunk, digest, size))
+                if len(fetches) >= 2 * self.multipart_workers:
+                    yield fetches.popleft().result()
+            while fetches:
+                yield fetches.popleft().result()
+
+    def _get_chunk(self, digest, size):
+        data = self._read_object(blob_key(digest))
+        with self.metrics.timer('hash'):
+            if len(data) != size or hashlib.sha256(data).hexdigest() != digest:
+                raise ValueError(f"Chunk {digest} is corrupt")
+        return data
+
+    def _write_object(self, s3_key, dest):
+        if isinstance(dest, (str, os.PathLike)):
+            with open(dest, 'wb') as f:
+                return self._write_object(s3_key, f)
+        if self.cipher is None:
+            backend = self._backend(self._locate(s3_key))
+            with self.metrics.timer('s3.head'):
+                head = backend.head(s3_key)
+            if head is None:
+                raise ObjectNotFound(f"No such object: {s3_key}")
+            metadata = head['metadata']
+            if not metadata.get(METADATA_KEY) and not is_manifest(metadata):
+                with self.metrics.timer('transfer'):
+                    written = backend.download(s3_key, dest, head)
+                self.metrics.incr('bytes_downloaded', written)
+                return written
+        # Decryption and decompression are sequential, so these stream in one
+        # GET; chunked files stream from the manifest
+        written = 0
+        for chunk in self._iter_object(s3_key):
+            dest.write(chunk)
+            written += len(chunk)
+        return written
+
+    def stream_file(self, user, user_role, owner, chunk_size=1 * MB, filename=None, version=None):
+        """Like access_file, but return an iterator of chunks instead of the whole body"""
+        start = time.perf_counter()
+        try:
+            s3_key = self._authorized_key(user, user_role, owner, filename, version)
+            if s3_key is None:
+                return None
+            chunks = self._iter_object(s3_key, chunk_size)
+            self._audit_access(user, user_role, owner, s3_key, start, 'stream_file')
+            print(f"✅ File '{s3_key}' streamed to {user}")
+            return chunks
+        except Exception as e:
+            self.metrics.incr('errors')
+            print(f"Failed to access file: {e}")
+            return None
+
+    def access_file_to(self, user, user_role, owner, dest, filename=None, version=None):
+        """Like access_file, but write straight to a path or writable buffer.
+
+        Returns the number of bytes written, or None if access fails.
+        """
+        start = time.perf_counter()
+        try:
+            s3_key = self._authorized_key(user, user_role, owner, filename, version)
+            if s3_key is None:
+                return None
+            written = self._write_object(s3_key, dest)
+            self._audit_access(user, user_role, owner, s3_key, start, 'access_file_to')
             print(f"✅ File '{s3_key}' accessed by {user}")
-            return response['Body'].read()
+            return written
+        except Exception as e:
+            self.metrics.incr('errors')
+            print(f"Failed to access file: {e}")
+            return None
+
+    def presign_access(self, user, user_role, owner, filename=None, version=None, expires_in=None):
+        """Like access_file, but return a short-lived presigned GET URL instead of the bytes.
+
+        The same role check, revocation check and audit run here; the
+        client then downloads straight from S3, so this process does
+        constant work however large the object. Objects stored compressed
+        carry their codec in the x-amz-meta-codec response header, and
+        with a cipher the URL serves ciphertext for the client to decrypt.
+        Delta-uploaded files serve their chunk manifest.
+        Returns a dict with method, url, s3_key and expires_at, or None.
+        """
+        start = time.perf_counter()
+        try:
+            s3_key = self._authorized_key(user, user_role, owner, filename, version)
+            if s3_key is None:
+                return None
+            url = self.presign_download(s3_key, expires_in, filename)
+            self._audit_access(user, user_role, owner, s3_key, start, 'presign_access')
+            print(f"✅ URL for '{s3_key}' issued to {user}")
+            return url
         except Exception as e:
+            self.metrics.incr('errors')
             print(f"Failed to access file: {e}")
             return None
 
+    def presign_access_many(self, users, roles, owners, expires_in=None):
+        """presign_access for many requests at once, authorized by authorize_many.
+
+        Returns one URL dict (or None where access is denied) per request,
+        in input order, with no S3 request per URL.
+        """
+        start = time.perf_counter()
+        granted, s3_keys = self.authorize_many(users, roles, owners)
+        urls = []
+        for user, role, owner, ok, s3_key in zip(users, roles, owners, granted, s3_keys):
+            if not ok:
+                self.metrics.incr('access_denied')
+                self.audit_log.record('access', actor=user, role=role, owner=owner, outcome='denied')
+                urls.append(None)
+                continue
+            urls.append(self.presign_download(s3_key, expires_in))
+            self._audit_access(user, role, owner, s3_key, start, 'presign_access')
+        return urls
+
+    def presign_upload(self, owner, filename, allowed_roles, size=None, expires_in=None):
+        """Reserve the owner's next version of filename and return URLs to upload it to.
+
+        Objects of size multipart_threshold or more get a multipart upload
+        with one PUT URL per part; anything else one PUT URL. The client
+        uploads the bytes itself, then passes the returned dict (with
+        'etags' filled in as {part: ETag} for multipart) to complete_upload,
+        which records the file. Bodies go up as sent: no compression,
+        encryption or dedup happens on this path. The dict carries a token
+        signing its owner, key, version and policy, so a client can't
+        change what complete_upload records.
+        """
+        try:
+            self.policies.compile(','.join(allowed_roles))
+            version = self.records.next_version(owner, filename)
+            s3_key = object_key(owner, filename, version)
+            shard = self.shards.place(s3_key)
+            presigner = self._backend(shard).presigner(self.presign_expiry)
+            if size is not None and size >= self.multipart_threshold:
+                upload = presigner.multipart(s3_key, size, self.multipart_part_size, expires_in)
+            else:
+                upload = presigner.put(s3_key, expires_in)
+            upload.update({'owner': owner, 'filename': filename, 'version': version,
+                           'allowed_roles': list(allowed_roles), 'location': shard.name})
+            upload['token'] = self._upload_token(upload)
+            return upload
+        except Exception as e:
+            self.metrics.incr('errors')
+            print(f"Upload failed: {e}")
+            return None
+
+    def presign_upload_many(self, owner, filenames, allowed_roles, expires_in=None):
+        """Single-PUT upload URLs for many files, with no S3 request"""
+        return [self.presign_upload(owner, filename, allowed_roles, expires_in=expires_in)
+                for filename in filenames]
+
+    def _upload_token(self, upload):
+        signed = [upload[field] for field in _SIGNED_UPLOAD_FIELDS] + [upload.get('upload_id')]
+        payload = json.dumps(signed, separators=(',', ':')).encode('utf-8')
+        return hmac.new(self.upload_secret, payload, hashlib.sha256).hexdigest()
+
+    def complete_upload(self, upload, etags=None):
+        """Record a file uploaded through presign_upload's URLs.
+
+        For multipart, etags maps part numbers to the ETags S3 returned
+        (or is taken from upload['etags']). For a single PUT the object is
+        checked with a HEAD, so a record never points at a missing key.
+        Uploads whose token doesn't match, or whose version is already
+        recorded, are refused.
+        """
+        s3_key = upload.get('s3_key')
+        try:
+            if not hmac.compare_digest(str(upload.get('token', '')), self._upload_token(upload)):
+                raise PermissionError("Upload was not issued by presign_upload or has been altered")
+            if s3_key != object_key(upload['owner'], upload['filename'], upload['version']):
+                raise PermissionError(f"{s3_key} is not the reserved version's key")
+            if self.records.version_row(upload['owner'], upload['filename'], upload['version']) is not None:
+                raise PermissionError(f"{s3_key} has already been recorded")
+            shard = self.shards.locate(upload.get('location'))
+            backend = self._backend(shard)
+            if 'upload_id' in upload:
+                backend.presigner(self.presign_expiry).complete(
+                    s3_key, upload['upload_id'], etags or upload['etags'])
+            elif backend.head(s3_key) is None:
+                raise ObjectNotFound(f"No such object: {s3_key}")
+            owner = upload['owner']
+            self._update_csv(owner, s3_key, upload['allowed_roles'], upload['filename'],
+                             upload['version'], shard.name)
+            self.data_store[owner] = s3_key  # Maintain compatibility
+            if self.cache is not None:
+                self.cache.invalidate(backend.bucket, s3_key)
+            self.audit_log.record('upload', actor=owner, owner=owner, key=s3_key)
+            print(f"✅ Upload of {s3_key} completed")
+            return True
+        except Exception as e:
+            self.metrics.incr('errors')
+            print(f"Upload failed: {e}")
+            return False
+
+    def presign_download(self, s3_key, expires_in=None, filename=None):
+        """Presigned GET URL dict for an S3 key on whichever shard holds it; no access check"""
+        presigner = self._backend(self._locate(s3_key)).presigner(self.presign_expiry)
+        return presigner.get(s3_key, expires_in, filename)
+
     def download_from_s3(self, s3_key):
         """Download a file from S3"""
         try:
-            response = self.s3.get_object(Bucket=self.s3_bucket_name, Key=s3_key)
+            with self.metrics.timer('download_from_s3'):
+                data = self._read_object(s3_key)
+            print(f"✅ File '{s3_key}' downloaded from S3.")
+            return data
+        except Exception as e:
+            self.metrics.incr('errors')
+            print(f"❌ Failed to download file from S3: {e}")
+            return None
+
+    def stream_from_s3(self, s3_key, chunk_size=1 * MB):
+        """Iterate over an S3 object's bytes in chunks"""
+        return self._iter_object(s3_key, chunk_size)
+
+    def download_to(self, s3_key, dest):
+        """Download an S3 object to a path or writable buffer with bounded memory"""
+        try:
+            written = self._write_object(s3_key, dest)
             print(f"✅ File '{s3_key}' downloaded from S3.")
-            return response['Body'].read()
+            return written
         except Exception as e:
+            self.metrics.incr('errors')
             print(f"❌ Failed to download file from S3: {e}")
             return None
 
-    def _get_s3_key(self, owner):
-        """Retrieve the S3 key for the specified owner from the CSV file."""
+    def _get_s3_key(self, owner, filename=None, version=None):
+        """Retrieve the S3 key for the specified owner from the access records."""
         try:
-            with open(self.csv_file, 'r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if row['admin'].lower() == owner.lower():
-                        return row['s3_key']  # Return the S3 key if the owner matches
+            # The newest upload, or the requested file's latest (or given) version
+            for row in self._file_rows(owner, filename, version):
+                return row['s3_key']
             print(f"❌ No S3 key found for owner: {owner}")
             return None
         except Exception as e:
             print(f"❌ Failed to retrieve S3 key: {e}")
             return None
 
-    def generate_user_key(self, name, attributes):
-        """Maintain original method signature"""
+    def list_files(self, owner, prefix=''):
+        """Sorted filenames the owner has uploaded, optionally under a prefix"""
+        return self.records.list_files(owner, prefix)
+
+    def file_versions(self, owner, filename):
+        """Every recorded version of an owner's file, oldest first"""
+        return self.records.versions(owner, filename)
+
+    def rebalance(self, shards, delete=True):
+        """Switch to a new shard membership, moving only objects whose placement changes.
+
+        Recorded objects and blobs whose ring placement differs under the
+        new membership are copied to their new shard from a bounded pool;
+        the catalog then records every row's new location, and only then
+        are the old copies deleted (unless delete is False). With
+        consistent hashing, adding or removing one of N shards moves about
+        1/N of the objects. Returns a report of what moved.
+        """
+        start = time.perf_counter()
+        # Shards that stay keep their backends
+        new = ShardSet([self.shards.get(shard.name) or shard for shard in self._shard_set(shards)])
+        old = self.shards
+        moves = {}  # s3_key -> (source shard, target shard)
+        relocations = []
+        locations = {}  # s3_key -> where its most recent row says it is
+        for rows in self.records.rows_by_owner().values():
+            for row in rows:
+                target = new.place(row['s3_key'])
+                if row.get('location') != target.name:
+                    relocations.append((row['admin'], row['filename'], row['version'], target.name))
+                locations[row['s3_key']] = row.get('location')
+        for s3_key, location in locations.items():
+            source, target = old.locate(location), new.place(s3_key)
+            if source.name != target.name:
+                moves[s3_key] = (source, target)
+        for shard in old:
+            # Blobs and delta chunks have no rows; they sit where the ring put them
+            for s3_key in self._backend(shard).list(BLOB_PREFIX):
+                target = new.place(s3_key)
+                if target.name != shard.name:
+                    moves.setdefault(s3_key, (shard, target))
+
+        with ThreadPoolExecutor(max_workers=self.multipart_workers) as pool:
+            sizes = dict(zip(moves, pool.map(lambda item: self._copy_object(item[0], *item[1]),
+                                             moves.items())))
+        missing = [s3_key for s3_key, size in sizes.items() if size is None]
+        for s3_key in missing:
+            del moves[s3_key]  # Recorded but never stored, e.g. the sample row
+        moved_bytes = sum(size for size in sizes.values() if size is not None)
+        self.records.relocate_many(relocations)
+        self.shards = new
+        for s3_key, (source, target) in moves.items():
+            if s3_key.startswith(BLOB_PREFIX):
+                self.blobs.add(self._backend(target).bucket, s3_key)
+            if self.cache is not None:
+                self.cache.invalidate(self._backend(source).bucket, s3_key)
+            if delete:
+                if s3_key.startswith(BLOB_PREFIX):
+                    # Forgotten first, so no dedup hit can point at the deleted copy
+                    self.blobs.remove(self._backend(source).bucket, s3_key)
+                self._backend(source).delete(s3_key)
+        report = {
+            'shards': list(new.shards),
+            'moved_objects': len(moves),
+            'moved_bytes': moved_bytes,
+            'missing_objects': len(missing),
+            'relocated_rows': len(relocations),
+            'seconds': time.perf_counter() - start
+        }
+        print(f"✅ Rebalanced onto {len(new)} shards: moved {len(moves)} objects "
+              f"({moved_bytes} bytes) in {report['seconds']:.2f}s")
+        return report
+
+    def _copy_object(self, s3_key, source, target):
+        """Copy an object between shards through a temp file, keeping its metadata.
+
+        Returns its size, or None if the source does not have it.
+        """
+        try:
+            body, head = self._backend(source).stream(s3_key)
+        except ObjectNotFound:
+            return None
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            for chunk in iter_body(body):
+                tmp.write(chunk)
+        try:
+            self._put_object(target, s3_key, tmp.name, head['metadata'])
+            return head['size']
+        finally:
+            os.remove(tmp.name)
+
+    def generate_user_key(self, name, attributes, owner=None):
+        """Issue a user key carrying a traceable fingerprint"""
+        user_id = name.lower()
+        fingerprint, nonce, issued_at = self.key_index.issue(user_id, attributes, owner)
         return {
-            'user_id': name.lower(),
+            'user_id': user_id,
             'attributes': attributes,
-            'requested_owner': None
+            'requested_owner': owner,
+            'fingerprint': fingerprint,
+            'nonce': nonce,
+            'issued_at': issued_at
         }
 
     def check_access_policy(self, user_key, policy):
         """Maintain original ABE-like interface"""
-        required_roles = policy.split(',')
-        user_roles = user_key['attributes'].split(',')
-        return any(role in user_roles for role in required_roles)
+        return self.policies.check(policy, user_key['attributes'])
 
-    def get_audit_log(self):
-        return self.audit_log
+    def get_audit_log(self, limit=None):
+        """Recent audit entries as text, oldest first (at most audit_capacity)"""
+        events = list(self.audit_log)
+        if limit is not None:
+            events = events[-limit:]
+        return [format_event(event) for event in events]
 
-    def revoke_user(self, user_id):
-        """Full revocation implementation"""
-        for owner in self.keys:
-            if user_id in self.keys[owner].get('revoked_users', []):
-                self.keys[owner]['revoked_users'].append(user_id)
-                self.audit_log.append(f"User {user_id} revoked by {owner}")
+    def query_audit(self, offset=0, limit=100, **filters):
+        """A page of structured audit events; see AuditLog.query for filters"""
+        return self.audit_log.query(offset=offset, limit=limit, **filters)
+
+    def revoke_user(self, user_id, owner=None):
+        """Revoke a user for one owner's data, or everywhere if owner is None"""
+        epoch = self.revocations.revoke(user_id, owner)
+        self.audit_log.record('revoke', actor=user_id, owner=owner)
+        return epoch
+
+    def restore_user(self, user_id, owner=None):
+        epoch = self.revocations.restore(user_id, owner)
+        self.audit_log.record('restore', actor=user_id, owner=owner)
+        return epoch
+
+    def get_metrics(self):
+        """Snapshot of latency histograms (seconds) and counters"""
+        snapshot = self.metrics.snapshot()
+        if self.cache is not None:
+            snapshot['cache'] = self.cache.stats()
+        if hasattr(self.cipher, 'get_metrics'):
+            snapshot['cipher'] = self.cipher.get_metrics()
+        return snapshot
 
     def trace_user(self, leaked_key):
-        """Full tracing implementation"""
-        for owner in self.keys:
-            if leaked_key in self.keys[owner].get('revoked_users', []):
-                return owner
-        return None
+        """Trace a leaked key (dict or fingerprint) to its user, owner and issue time"""
+        if isinstance(leaked_key, dict):
+            leaked_key = leaked_key.get('fingerprint')
+        return self.key_index.lookup(leaked_key) if leaked_key else None
+
+    def trace_users(self, leaked_keys):
+        """Trace many leaked keys (fingerprints, key dicts or dump lines) in one pass"""
+        return self.key_index.trace_many(leaked_keys)
 
 class DataOwner:
     def __init__(self, name, cloud_system):
@@ -157,8 +949,15 @@ class DataOwner:
         allowed_roles = policy.split(',')
         return self.cloud.upload_file(self.name, file_path, allowed_roles)
 
+    def upload_many(self, file_paths, policy, concurrency=8):
+        allowed_roles = policy.split(',')
+        return self.cloud.upload_many(self.name, file_paths, allowed_roles, concurrency)
+
     def revoke_access(self, user_id):
-        self.cloud.revoke_user(user_id)
+        self.cloud.revoke_user(user_id, owner=self.name)
+
+    def list_files(self, prefix=''):
+        return self.cloud.list_files(self.name, prefix)
 
 class CloudUser:
     def __init__(self, name, attributes, cloud_system):
@@ -167,23 +966,57 @@ class CloudUser:
         self.attributes = attributes
         self.user_key = self.cloud.generate_user_key(name, attributes)
 
-    def request_access(self, owner):
-        """Maintain original dual-path access checking"""
+    def _resolve_key(self, owner, filename=None, version=None):
+        with self.cloud.metrics.timer('policy'):
+            return self._lookup_key(owner, filename, version)
+
+    def _lookup_key(self, owner, filename=None, version=None):
+        if self.cloud.revocations.is_revoked(self.name, owner):
+            self.cloud.audit_log.record('access', actor=self.name, role=self.attributes,
+                                        owner=owner, outcome='revoked')
+            print(f"❌ Access revoked for {self.name}")
+            return None
+
+        # Bound before either method, so a leaked key traces to the owner it was used on
+        if self.user_key['requested_owner'] != owner:
+            self.user_key['requested_owner'] = owner
+            self.cloud.key_index.bind_owner(self.user_key['fingerprint'], owner)
+
         # Method 1: Direct check
-        s3_key = self.cloud._get_s3_key(owner)
+        s3_key = self.cloud._get_s3_key(owner, filename, version)
         if s3_key:
-            return self.cloud.download_from_s3(s3_key)
-        
+            return s3_key
+
         # Method 2: Policy-based check (maintains original interface)
-        self.user_key['requested_owner'] = owner
-        with open(self.cloud.csv_file, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row['admin'].lower() == owner.lower():
-                    if self.cloud.check_access_policy(self.user_key, row['allowed_roles']):
-                        return self.cloud.download_from_s3(row['s3_key'])
+        for row in self.cloud._file_rows(owner, filename, version):
+            if self.cloud.check_access_policy(self.user_key, row['allowed_roles']):
+                return row['s3_key']
         return None
 
+    def request_access(self, owner, filename=None, version=None):
+        """Maintain original dual-path access checking"""
+        with self.cloud.metrics.timer('request_access'):
+            s3_key = self._resolve_key(owner, filename, version)
+            if s3_key:
+                return self.cloud.download_from_s3(s3_key)
+            return None
+
+    def request_access_to(self, owner, dest, filename=None, version=None):
+        """Like request_access, but stream the file to a path or writable buffer"""
+        with self.cloud.metrics.timer('request_access'):
+            s3_key = self._resolve_key(owner, filename, version)
+            if s3_key:
+                return self.cloud.download_to(s3_key, dest)
+            return None
+
+    def request_url(self, owner, filename=None, version=None, expires_in=None):
+        """Like request_access, but return a presigned GET URL dict instead of the bytes"""
+        with self.cloud.metrics.timer('request_access'):
+            s3_key = self._resolve_key(owner, filename, version)
+            if s3_key:
+                return self.cloud.presign_download(s3_key, expires_in, filename)
+            return None
+
     def get_credentials(self):
         return self.user_key
 
@@ -197,6 +1030,9 @@ class Authority:
     def detect_leak(self, leaked_key):
         return self.cloud.trace_user(leaked_key)
 
+    def detect_leaks(self, leaked_keys):
+        return self.cloud.trace_users(leaked_keys)
+
     def audit_access(self):
         return self.cloud.get_audit_log()
 
@@ -204,5 +1040,19 @@ class Auditor:
     def __init__(self, cloud_system):
         self.cloud = cloud_system
     
-    def audit_access(self):
-        return [f"Log: {log}" for log in self.cloud.get_audit_log()]
\ No newline at end of file
+    def audit_access(self, limit=100):
+        """The most recent audit entries (bounded, rather than the whole history)"""
+        return [f"Log: {log}" for log in self.cloud.get_audit_log(limit)]
+
+    def iter_audit(self, **filters):
+        """Stream every persisted audit event matching the filters"""
+        return self.cloud.audit_log.iter_file(**filters)
+
+    def detect_leak(self, leaked_key):
+        """Trace a leaked key back to its holder"""
+        return self.cloud.trace_user(leaked_key)
+
+    def detect_leaks(self, dump_path):
+        """Trace every key in a dump file (one fingerprint or JSON key per line)"""
+        with open(dump_path, 'r') as f:
+            return self.cloud.trace_users(f)
\ No newline at end of file
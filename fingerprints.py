@@ -0,0 +1,125 @@
+import atexit
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from journal import Journal
+
+
+def key_fingerprint(user_id, attributes, nonce):
+    """Stable identifier for one issued user key"""
+    material = '\x1f'.join([user_id, attributes, nonce]).encode('utf-8')
+    return hashlib.sha256(material).hexdigest()
+
+
+class KeyIndex(Journal):
+    """Persistent fingerprint -> (user, owners, issued_at) index of issued keys.
+
+    Issued keys are buffered and written flush_every at a time (and at
+    exit, or before an owner binding), so issuing a key costs no disk I/O;
+    a crash loses at most the unflushed issues. Each first use of a key on
+    an owner's data appends one line, and bindings accumulate in 'owners'
+    rather than replacing each other. The index is replayed into a dict on
+    first use, so tracing a leaked key is a single dict lookup however many
+    keys have been issued.
+    """
+
+    def __init__(self, path='key_index.jsonl', flush_every=256):
+        self.flush_every = flush_every
+        self._pending = []
+        self._exit_hook = False
+        super().__init__(path)
+
+    def _reset(self):
+        self._entries = {}
+
+    def _apply(self, entry):
+        fingerprint = entry['fingerprint']
+        owner = entry.get('owner')
+        if 'user_id' in entry:
+            self._entries[fingerprint] = {
+                'fingerprint': fingerprint,
+                'user_id': entry['user_id'],
+                'owner': owner,
+                'owners': [owner] if owner else [],
+                'issued_at': entry['issued_at']
+            }
+        elif fingerprint in self._entries:
+            traced = self._entries[fingerprint]
+            traced['owner'] = owner
+            if owner not in traced['owners']:
+                traced['owners'].append(owner)
+
+    def issue(self, user_id, attributes, owner=None):
+        """Record a new key and return its (fingerprint, nonce, issued_at)"""
+        self._ensure_loaded()
+        nonce = os.urandom(16).hex()
+        issued_at = datetime.now().isoformat()
+        fingerprint = key_fingerprint(user_id, attributes, nonce)
+        entry = {'fingerprint': fingerprint, 'user_id': user_id,
+                 'owner': owner, 'issued_at': issued_at}
+        with self._lock:
+            self._apply(entry)
+            if self.path is None:
+                return fingerprint, nonce, issued_at
+            self._pending.append(entry)
+            if not self._exit_hook:
+                self._exit_hook = True
+                atexit.register(self.flush)
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+        return fingerprint, nonce, issued_at
+
+    def flush(self):
+        """Write any buffered issues to the journal"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._write(pending)
+
+    def bind_owner(self, fingerprint, owner):
+        """Record that a key was used on an owner's data; earlier owners are kept"""
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None or owner in entry['owners']:
+                return
+            # The binding line must follow its key's issue line
+            self.flush()
+            self._append({'fingerprint': fingerprint, 'owner': owner})
+
+    def lookup(self, fingerprint):
+        self._ensure_loaded()
+        entry = self._entries.get(fingerprint)
+        return _copy(entry)
+
+    def trace_many(self, leaked):
+        """Trace many leaked keys in one pass.
+
+        Items may be fingerprints, key dicts, or JSON lines from a dump.
+        Returns {fingerprint: entry or None}.
+        """
+        self._ensure_loaded()
+        traced = {}
+        for item in leaked:
+            fingerprint = _fingerprint_of(item)
+            if fingerprint:
+                entry = self._entries.get(fingerprint)
+                traced[fingerprint] = _copy(entry)
+        return traced
+
+
+def _copy(entry):
+    return dict(entry, owners=list(entry['owners'])) if entry else None
+
+
+def _fingerprint_of(item):
+    if isinstance(item, dict):
+        return item.get('fingerprint')
+    item = item.strip()
+    if item.startswith('{'):
+        try:
+            return json.loads(item).get('fingerprint')
+        except ValueError:
+            return None
+    return item or None
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+
+
+class Journal:
+    """In-memory state kept durable as an append-only JSONL file.
+
+    Subclasses implement _reset() to empty their state and _apply(entry) to
+    fold one entry into it. The file is replayed through _apply on first
+    use, and each change is applied and appended as one line under the
+    same lock, so an index of a million entries costs one line per change
+    rather than a rewrite. _refresh() picks up lines other processes have
+    appended since (one stat when there are none); if the file is replaced
+    or truncated, the state is rebuilt from scratch. A path of None keeps
+    the state in memory only.
+    """
+
+    def __init__(self, path):
+        # Absolute, so a later chdir (or an exit-time flush) writes the same file
+        self.path = os.path.abspath(path) if path is not None else None
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._offset = 0  # End of the last complete line replayed
+        self._stamp = None  # (dev, inode, size, mtime) when last replayed
+        self._reset()
+
+    def _reset(self):
+        raise NotImplementedError
+
+    def _apply(self, entry):
+        raise NotImplementedError
+
+    def _after_load(self):
+        """Called under the lock whenever the state has been rebuilt from the file"""
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._refresh()
+
+    def _stat(self):
+        if self.path is None:
+            return None
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _refresh(self):
+        """Replay lines appended since the last replay, by this process or another"""
+        stamp = self._stat()
+        if self._loaded and stamp == self._stamp:
+            return
+        with self._lock:
+            if self._loaded and stamp == self._stamp:
+                return
+            rebuild = not self._loaded
+            if self._loaded and (stamp is None or self._stamp is None or stamp[:2] != self._stamp[:2]
+                                 or stamp[2] < self._offset):
+                # Replaced (say, compacted by another process), removed or truncated
+                self._reset()
+                self._offset = 0
+                rebuild = True
+            if stamp is not None:
+                self._replay_from(self._offset)
+            self._stamp = stamp
+            if rebuild:
+                self._after_load()
+            self._loaded = True
+
+    def _replay_from(self, offset):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # Leave a trailing partial line (a writer mid-append) for the next refresh
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line torn by a crash; _append ends it before writing its own
+                print(f"❌ Skipping a corrupt line in {self.path}")
+                continue
+            self._apply(entry)
+        self._offset = offset + end
+
+    def _append(self, entry):
+        with self._lock:
+            self._apply(entry)
+            self._write([entry])
+
+    def _write(self, entries):
+        """Append already-applied entries to the file in one write"""
+        if self.path is None or not entries:
+            return
+        data = ''.join(json.dumps(entry) + '\n' for entry in entries).encode('utf-8')
+        with self._lock:
+            with open(self.path, 'a+b') as f:
+                end = f.seek(0, os.SEEK_END)
+                if end:
+                    f.seek(end - 1)
+                    if f.read(1) != b'\n':
+                        # Don't merge into a crash's torn line, or both would be skipped
+                        data = b'\n' + data
+                f.write(data)
+                f.flush()
+                st = os.fstat(f.fileno())
+            if self._stamp is not None and end == self._offset and (st.st_dev, st.st_ino) == self._stamp[:2]:
+                # Nothing unread came before these lines, so don't replay them again
+                self._offset = end + len(data)
+                self._stamp = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _rewrite(self, entries):
+        """Atomically replace the file with entries (state is left as it is)"""
+        if self.path is None:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + '\n')
+            os.replace(tmp_path, self.path)
+            self._stamp = self._stat()
+            self._offset = self._stamp[2]
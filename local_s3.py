@@ -0,0 +1,255 @@
+import hashlib
+import hmac
+import io
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit
+
+from botocore.exceptions import ClientError
+
+
+def _error(code, operation, status=None, message=''):
+    return ClientError({
+        'Error': {'Code': code, 'Message': message or code},
+        'ResponseMetadata': {'HTTPStatusCode': status or (int(code) if code.isdigit() else 400)}
+    }, operation)
+
+
+def _read_body(body):
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return bytes(body)
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    return body.read()
+
+
+class LocalS3:
+    """In-process stand-in for the subset of the boto3 S3 client this repo uses.
+
+    Objects live in memory behind one lock, ETags are MD5s as on S3, and
+    errors are raised as botocore ClientErrors with S3's codes, so the
+    upload, ranged download and cache revalidation paths run unchanged.
+    latency (seconds) is slept on every request to model a network round
+    trip; with the default of 0 benchmarks measure only this repo's code.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        # A distinct endpoint per instance keeps cpab's per-process bucket check honest
+        self.meta = SimpleNamespace(endpoint_url=f"local://{uuid.uuid4().hex}",
+                                    region_name='ap-south-1')
+        self.buckets = {}
+        self.requests = 0
+        self._uploads = {}
+        self._lock = threading.Lock()
+        self._secret = os.urandom(32)  # Signs this instance's presigned URLs
+
+    def _round_trip(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _bucket(self, bucket, operation):
+        objects = self.buckets.get(bucket)
+        if objects is None:
+            raise _error('NoSuchBucket', operation, 404)
+        return objects
+
+    def _object(self, bucket, key, operation):
+        obj = self._bucket(bucket, operation).get(key)
+        if obj is None:
+            raise _error('NoSuchKey' if operation == 'GetObject' else '404', operation, 404)
+        return obj
+
+    def head_bucket(self, Bucket):
+        self._round_trip()
+        if Bucket not in self.buckets:
+            raise _error('404', 'HeadBucket', 404)
+        return {}
+
+    def create_bucket(self, Bucket, **kwargs):
+        self._round_trip()
+        with self._lock:
+            if Bucket in self.buckets:
+                raise _error('BucketAlreadyOwnedByYou', 'CreateBucket', 409)
+            self.buckets[Bucket] = {}
+        return {'Location': f"/{Bucket}"}
+
+    def _store(self, bucket, key, data, etag, kwargs):
+        obj = {
+            'data': data,
+            'etag': etag,
+            'last_modified': datetime.now(timezone.utc),
+            'metadata': dict(kwargs.get('Metadata') or {}),
+            'content_type': kwargs.get('ContentType', 'binary/octet-stream')
+        }
+        with self._lock:
+            self._bucket(bucket, 'PutObject')[key] = obj
+        return obj
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        self._round_trip()
+        data = _read_body(Body)
+        obj = self._store(Bucket, Key, data, f'"{hashlib.md5(data).hexdigest()}"', kwargs)
+        return {'ETag': obj['etag']}
+
+    def _head(self, obj, size):
+        return {
+            'ContentLength': size,
+            'ETag': obj['etag'],
+            'LastModified': obj['last_modified'],
+            'Metadata': dict(obj['metadata']),
+            'ContentType': obj['content_type']
+        }
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._round_trip()
+        obj = self._object(Bucket, Key, 'HeadObject')
+        return self._head(obj, len(obj['data']))
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None, IfNoneMatch=None, **kwargs):
+        self._round_trip()
+        obj = self._object(Bucket, Key, 'GetObject')
+        if IfMatch is not None and IfMatch != obj['etag']:
+            raise _error('PreconditionFailed', 'GetObject', 412)
+        if IfNoneMatch is not None and IfNoneMatch == obj['etag']:
+            raise _error('304', 'GetObject', 304)
+        data = obj['data']
+        response = {}
+        if Range is not None:
+            start, _, end = Range[len('bytes='):].partition('-')
+            start, end = int(start), min(int(end) if end else len(data) - 1, len(data) - 1)
+            if start >= len(data):
+                raise _error('InvalidRange', 'GetObject', 416)
+            response['ContentRange'] = f"bytes {start}-{end}/{len(data)}"
+            data = data[start:end + 1]
+        response.update(self._head(obj, len(data)))
+        response['Body'] = io.BytesIO(data)
+        return response
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._round_trip()
+        with self._lock:
+            self._bucket(Bucket, 'DeleteObject').pop(Key, None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', MaxKeys=1000, ContinuationToken=None, **kwargs):
+        self._round_trip()
+        with self._lock:
+            keys = sorted(k for k in self._bucket(Bucket, 'ListObjectsV2') if k.startswith(Prefix))
+        if ContinuationToken is not None:
+            keys = [k for k in keys if k > ContinuationToken]
+        page = keys[:MaxKeys]
+        objects = self.buckets[Bucket]
+        response = {
+            'KeyCount': len(page),
+            'IsTruncated': len(keys) > MaxKeys,
+            'Contents': [{'Key': k, 'Size': len(objects[k]['data']), 'ETag': objects[k]['etag']}
+                         for k in page if k in objects]
+        }
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._round_trip()
+        self._bucket(Bucket, 'CreateMultipartUpload')
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = {'bucket': Bucket, 'key': Key, 'parts': {}, 'args': kwargs}
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def _upload(self, upload_id, operation):
+        upload = self._uploads.get(upload_id)
+        if upload is None:
+            raise _error('NoSuchUpload', operation, 404)
+        return upload
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        self._round_trip()
+        data = _read_body(Body)
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self._lock:
+            self._upload(UploadId, 'UploadPart')['parts'][PartNumber] = (etag, data)
+        return {'ETag': etag}
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker=0, MaxParts=1000, **kwargs):
+        self._round_trip()
+        with self._lock:
+            parts = sorted(self._upload(UploadId, 'ListParts')['parts'].items())
+        parts = [(n, p) for n, p in parts if n > PartNumberMarker]
+        page = parts[:MaxParts]
+        response = {
+            'Parts': [{'PartNumber': n, 'ETag': etag, 'Size': len(data)} for n, (etag, data) in page],
+            'IsTruncated': len(parts) > MaxParts
+        }
+        if response['IsTruncated']:
+            response['NextPartNumberMarker'] = page[-1][0]
+        return response
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._round_trip()
+        with self._lock:
+            upload = self._upload(UploadId, 'CompleteMultipartUpload')
+        chunks = []
+        digests = b''
+        for part in MultipartUpload['Parts']:
+            stored = upload['parts'].get(part['PartNumber'])
+            if stored is None or stored[0] != part['ETag']:
+                raise _error('InvalidPart', 'CompleteMultipartUpload', 400)
+            chunks.append(stored[1])
+            digests += bytes.fromhex(stored[0].strip('"'))
+        etag = f'"{hashlib.md5(digests).hexdigest()}-{len(chunks)}"'
+        self._store(Bucket, Key, b''.join(chunks), etag, upload['args'])
+        with self._lock:
+            del self._uploads[UploadId]
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._round_trip()
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
+
+    def _signature(self, bucket, key, query):
+        message = '\n'.join([bucket, key] + [
+            f"{name}={value}" for name, value in sorted(query.items()) if name != 'X-Amz-Signature'
+        ])
+        return hmac.new(self._secret, message.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, HttpMethod=None):
+        # Local, like the real client's: signing makes no request
+        params = dict(Params or {})
+        bucket = params.pop('Bucket')
+        key = params.pop('Key')
+        query = {'X-Amz-Date': str(int(time.time())), 'X-Amz-Expires': str(ExpiresIn), 'op': ClientMethod}
+        query.update((name, str(value)) for name, value in params.items())
+        query['X-Amz-Signature'] = self._signature(bucket, key, query)
+        return f"{self.meta.endpoint_url}/{bucket}/{quote(key)}?{urlencode(sorted(query.items()))}"
+
+    def open_url(self, url, data=None):
+        """Make the request a presigned URL allows, as an HTTP client would.
+
+        Returns the body for a GET and the ETag for a PUT or part upload.
+        """
+        parsed = urlsplit(url)
+        bucket, _, key = unquote(parsed.path).lstrip('/').partition('/')
+        query = dict(parse_qsl(parsed.query))
+        if not hmac.compare_digest(query.get('X-Amz-Signature', ''), self._signature(bucket, key, query)):
+            raise _error('SignatureDoesNotMatch', 'PresignedRequest', 403)
+        if time.time() > int(query['X-Amz-Date']) + int(query['X-Amz-Expires']):
+            raise _error('AccessDenied', 'PresignedRequest', 403, 'Request has expired')
+        operation = query['op']
+        if operation == 'get_object':
+            return self.get_object(Bucket=bucket, Key=key)['Body'].read()
+        if operation == 'put_object':
+            return self.put_object(Bucket=bucket, Key=key, Body=data)['ETag']
+        if operation == 'upload_part':
+            return self.upload_part(Bucket=bucket, Key=key, UploadId=query['UploadId'],
+                                    PartNumber=int(query['PartNumber']), Body=data)['ETag']
+        raise _error('NotImplemented', 'PresignedRequest', 501)
@@ -0,0 +1,213 @@
+import atexit
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Log-linear buckets over microseconds: values below 2**(SUB_BITS + 1) get
+# their own bucket, larger ones 2**SUB_BITS buckets per power of two, so
+# any recorded value is within ~6% of its bucket's bounds.
+SUB_BITS = 4
+_LINEAR_LIMIT = 1 << (SUB_BITS + 1)
+QUANTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999))
+
+
+def _bucket(micros):
+    if micros < _LINEAR_LIMIT:
+        return micros
+    shift = micros.bit_length() - (SUB_BITS + 1)
+    return (shift << SUB_BITS) + (micros >> shift)
+
+
+def _bucket_bounds(index):
+    """Lowest and highest microsecond value that land in a bucket"""
+    if index < _LINEAR_LIMIT:
+        return index, index
+    shift = (index >> SUB_BITS) - 1
+    mantissa = index - (shift << SUB_BITS)
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """HDR-style latency histogram with fixed relative precision.
+
+    record() is one integer bucket computation and a dict increment, so
+    it is cheap enough to leave on in production; memory grows with the
+    number of distinct buckets hit, not the number of samples.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        index = _bucket(int(seconds * 1e6))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Approximate value (seconds) at quantile q, e.g. 0.99"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = _bucket_bounds(index)
+                value = (low + high) / 2 / 1e6
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def snapshot(self):
+        summary = {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None
+        }
+        for key, q in QUANTILES:
+            summary[key] = self.quantile(q)
+        return summary
+
+
+class Metrics:
+    """Latency histograms and counters for one system, with exporter hooks.
+
+    Timers are named by phase ("policy", "s3.get", "transfer", "crypto")
+    or by operation ("access_file"); counters hold byte and event counts.
+    Exporters are callables taking a snapshot dict, e.g. a
+    PrometheusTextfile; export() pushes one snapshot to each, and
+    export_every() does so periodically from a daemon thread.
+    """
+
+    def __init__(self, exporters=None):
+        self.started = time.time()
+        self.exporters = list(exporters or [])
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._exporting = None
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(seconds)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed_iter(self, name, chunks, byte_counter=None):
+        """Wrap an iterator, timing each next() under name and counting bytes"""
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                self.observe(name, time.perf_counter() - start)
+            if byte_counter is not None:
+                self.incr(byte_counter, len(chunk))
+            yield chunk
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'uptime_seconds': time.time() - self.started,
+                'counters': dict(self._counters),
+                'latency': {name: h.snapshot() for name, h in self._histograms.items()}
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    def export(self):
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            try:
+                exporter(snapshot)
+            except Exception as e:
+                print(f"❌ Metrics export failed: {e}")
+        return snapshot
+
+    def export_every(self, interval=15.0):
+        """Call export() every interval seconds from a daemon thread, and at exit"""
+        if self._exporting is not None:
+            return
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.export()
+
+        self._exporting = threading.Thread(target=run, name='metrics-exporter', daemon=True)
+        self._exporting.start()
+        atexit.register(lambda: (stop.set(), self.export()))
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def prometheus_text(snapshot, prefix='cpab'):
+    """Render a snapshot in the Prometheus text exposition format"""
+    lines = [
+        f"# TYPE {prefix}_latency_seconds summary"
+    ]
+    for name, summary in sorted(snapshot['latency'].items()):
+        for key, q in QUANTILES:
+            value = summary[key]
+            if value is not None:
+                lines.append(f'{prefix}_latency_seconds{{op="{name}",quantile="{q}"}} {value:.9g}')
+        lines.append(f'{prefix}_latency_seconds_sum{{op="{name}"}} {summary["sum"]:.9g}')
+        lines.append(f'{prefix}_latency_seconds_count{{op="{name}"}} {summary["count"]}')
+    for name, value in sorted(snapshot['counters'].items()):
+        metric = f"{prefix}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    lines.append(f"# TYPE {prefix}_uptime_seconds gauge")
+    lines.append(f"{prefix}_uptime_seconds {snapshot['uptime_seconds']:.3f}")
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusTextfile:
+    """Exporter writing prometheus_text() atomically, for node_exporter's textfile collector"""
+
+    def __init__(self, path, prefix='cpab'):
+        self.path = path
+        self.prefix = prefix
+
+    def __call__(self, snapshot):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(prometheus_text(snapshot, self.prefix))
+        os.replace(tmp_path, self.path)
@@ -3,8 +3,54 @@ from Crypto.Random import get_random_bytes
 import base64
 import os
 import hashlib
+import struct
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from tkinter import messagebox
 
+# The codecs are shared with the cloud system at the repository root: import
+# this module as ok.encryption from there, or put the root on PYTHONPATH
+from compression import SAMPLE_SIZE, choose_codec, compressing_reader, iter_decompress
+
+# Chunked file format: header, then frames of
+#   flags (1) | plaintext length (4) | ciphertext | GCM tag (16)
+# Each frame's nonce is the header's 8-byte prefix plus the frame counter,
+# so frames cannot be reordered, and the authenticated FINAL flag on the
+# last frame catches truncation. Memory use is one chunk regardless of size.
+MAGIC = b'SCS2'
+FORMAT_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+FLAG_FINAL = 0x01
+HEADER = struct.Struct('>4sBBI8s')  # magic, version, codec, chunk size, nonce prefix
+FRAME = struct.Struct('>BI')
+TAG_SIZE = 16
+
+# Plaintext may be compressed before it is chunked; the header's codec byte
+# (authenticated with every frame) says how. 0 is uncompressed, as in files
+# written before compression existed.
+CODECS = {0: None, 1: 'zlib', 2: 'zstd'}
+CODEC_IDS = {name: codec_id for codec_id, name in CODECS.items()}
+
+
+def _read_exact(src, size):
+    """Read exactly size bytes unless the stream ends first"""
+    data = src.read(size)
+    if len(data) == size or not data:
+        return data
+    parts = [data]
+    remaining = size - len(data)
+    while remaining:
+        data = src.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b''.join(parts)
+
+
 class SecureCloudStorage:
     def __init__(self, encryptionkey):
         self.encryptionkey=encryptionkey
@@ -12,6 +58,32 @@ class SecureCloudStorage:
             self.key = hashlib.sha256(encryptionkey.encode('utf-8')).digest()
         else:
             self.key = get_random_bytes(32)
+        self._init_metrics()
+
+    def _init_metrics(self):
+        # Own counters, plus an optional sink with observe(name, seconds)
+        # and incr(name, amount), e.g. the cloud system's metrics.Metrics
+        self.metrics = None
+        self._stats = {op: {'calls': 0, 'bytes': 0, 'seconds': 0.0} for op in ('encrypt', 'decrypt')}
+        self._stats_lock = threading.Lock()
+
+    def _account(self, op, nbytes, seconds):
+        with self._stats_lock:
+            stats = self._stats[op]
+            stats['calls'] += 1
+            stats['bytes'] += nbytes
+            stats['seconds'] += seconds
+        if self.metrics is not None:
+            self.metrics.observe(f"crypto.{op}", seconds)
+            self.metrics.incr(f"bytes_{op}ed", nbytes)
+
+    def get_metrics(self):
+        """Calls, plaintext bytes, seconds and MB/s for stream encrypt and decrypt"""
+        with self._stats_lock:
+            snapshot = {op: dict(stats) for op, stats in self._stats.items()}
+        for stats in snapshot.values():
+            stats['mb_per_s'] = stats['bytes'] / (1024 * 1024) / stats['seconds'] if stats['seconds'] else 0.0
+        return snapshot
     
     def encrypt(self, plaintext):
         if isinstance(plaintext, bytes):
@@ -34,12 +106,123 @@ class SecureCloudStorage:
             messagebox.showerror("Decryption Error", "Invalid key or tampered data")
             raise
 
-    def encrypt_file(self, file_path):
-        with open(file_path, 'rb') as f:
-            data = f.read()
-        encrypted = self.encrypt(data)
-        with open(file_path, 'w') as f:
-            f.write(encrypted)
+    @classmethod
+    def _from_key(cls, key):
+        storage = cls.__new__(cls)
+        storage.encryptionkey = None
+        storage.key = key
+        storage._init_metrics()
+        return storage
+
+    def _frame_cipher(self, header, counter):
+        return AES.new(self.key, AES.MODE_GCM, nonce=header[-8:] + struct.pack('>I', counter))
+
+    def _seal(self, header, counter, flags, chunk):
+        frame = FRAME.pack(flags, len(chunk))
+        cipher = self._frame_cipher(header, counter)
+        cipher.update(header + frame)
+        ciphertext, tag = cipher.encrypt_and_digest(chunk)
+        return frame + ciphertext + tag
+
+    def _open(self, header, counter, frame, body):
+        flags, length = FRAME.unpack(frame)
+        cipher = self._frame_cipher(header, counter)
+        cipher.update(header + frame)
+        return cipher.decrypt_and_verify(body[:length], body[length:])
+
+    def encrypt_stream(self, src, dst, chunk_size=CHUNK_SIZE, codec=None):
+        """Encrypt a binary stream into the chunked format; returns bytes written.
+
+        With codec ('zstd' or 'zlib') the stream is compressed first.
+        """
+        start = time.perf_counter()
+        if codec is not None:
+            src = compressing_reader(src, codec, chunk_size=chunk_size)
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, CODEC_IDS[codec], chunk_size, get_random_bytes(8))
+        dst.write(header)
+        written = len(header)
+        plaintext = 0
+        counter = 0
+        chunk = _read_exact(src, chunk_size)
+        while True:
+            # Read one chunk ahead so the last frame can be flagged
+            next_chunk = _read_exact(src, chunk_size) if len(chunk) == chunk_size else b''
+            flags = 0 if next_chunk else FLAG_FINAL
+            sealed = self._seal(header, counter, flags, chunk)
+            dst.write(sealed)
+            written += len(sealed)
+            plaintext += len(chunk)
+            if flags & FLAG_FINAL:
+                self._account('encrypt', plaintext, time.perf_counter() - start)
+                return written
+            chunk = next_chunk
+            counter += 1
+
+    def iter_decrypt(self, src):
+        """Yield verified plaintext chunks from a chunked-format stream"""
+        header = _read_exact(src, HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError("Truncated header")
+        magic, version, codec_id, _, _ = HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a chunked SecureCloudStorage stream")
+        if codec_id not in CODECS:
+            raise ValueError(f"Unknown codec id {codec_id}")
+        chunks = self._iter_frames(src, header)
+        if CODECS[codec_id] is None:
+            return chunks
+        return iter_decompress(chunks, CODECS[codec_id])
+
+    def _iter_frames(self, src, header):
+        _, _, _, chunk_size, _ = HEADER.unpack(header)
+        counter = 0
+        plaintext = 0
+        seconds = 0.0  # Time spent decrypting, not waiting on src or the consumer
+        while True:
+            frame = _read_exact(src, FRAME.size)
+            if len(frame) != FRAME.size:
+                raise ValueError("Truncated stream: final chunk missing")
+            flags, length = FRAME.unpack(frame)
+            if length > chunk_size:
+                raise ValueError("Corrupt chunk length")
+            body = _read_exact(src, length + TAG_SIZE)
+            if len(body) != length + TAG_SIZE:
+                raise ValueError("Truncated chunk")
+            start = time.perf_counter()
+            chunk = self._open(header, counter, frame, body)
+            seconds += time.perf_counter() - start
+            plaintext += len(chunk)
+            yield chunk
+            if flags & FLAG_FINAL:
+                if src.read(1):
+                    raise ValueError("Unexpected data after final chunk")
+                self._account('decrypt', plaintext, seconds)
+                return
+            counter += 1
+
+    def decrypt_stream(self, src, dst):
+        """Decrypt a chunked-format stream into dst; returns plaintext bytes written"""
+        written = 0
+        for chunk in self.iter_decrypt(src):
+            dst.write(chunk)
+            written += len(chunk)
+        return written
+
+    def encrypt_file(self, file_path, compress=True):
+        """Encrypt a file in place using the binary chunked format.
+
+        With compress, data that samples as compressible is compressed
+        first; decrypt_file undoes it from the header.
+        """
+        directory = os.path.dirname(os.path.abspath(file_path))
+        with open(file_path, 'rb') as src, \
+                tempfile.NamedTemporaryFile(dir=directory, delete=False) as dst:
+            codec = None
+            if compress:
+                codec = choose_codec(src.read(SAMPLE_SIZE), os.path.getsize(file_path))
+                src.seek(0)
+            self.encrypt_stream(src, dst, codec=codec)
+        os.replace(dst.name, file_path)
         print(f"✅ File encrypted: {file_path}")
 
     def decrypt_file(self, file_path, user_role, allowed_roles, owner):
@@ -54,12 +237,23 @@ class SecureCloudStorage:
             return False
             
         try:
-            with open(file_path, 'r') as f:
-                encrypted_data = f.read()
-            decrypted = self.decrypt(encrypted_data)
             decrypted_path = f"decrypted_{os.path.basename(file_path)}"
-            with open(decrypted_path, 'wb') as f:
-                f.write(decrypted.encode('utf-8'))
+            with open(file_path, 'rb') as f:
+                chunked = f.read(len(MAGIC)) == MAGIC
+            if chunked:
+                try:
+                    with open(file_path, 'rb') as src, open(decrypted_path, 'wb') as dst:
+                        self.decrypt_stream(src, dst)
+                except Exception:
+                    os.remove(decrypted_path)  # Don't leave a partial plaintext behind
+                    raise
+            else:
+                # Files written before the chunked format: base64 text
+                with open(file_path, 'r') as f:
+                    encrypted_data = f.read()
+                decrypted = self.decrypt(encrypted_data)
+                with open(decrypted_path, 'wb') as f:
+                    f.write(decrypted.encode('utf-8'))
             print(f"✅ File decrypted: {decrypted_path}")
             return True
         except Exception as e:
@@ -68,4 +262,151 @@ class SecureCloudStorage:
 
     def _notify_owner(self, owner, user_role):
         print(f"📢 Notification sent to {owner}: Unauthorized access attempt by role {user_role}")
-        # In a real system, this would send an email/notification
\ No newline at end of file
+        # In a real system, this would send an email/notification
+
+# Bulk encryption on a process pool. Each worker receives the derived key
+# once through the pool initializer instead of re-deriving it per file.
+_worker_storage = None
+
+
+def _init_worker(key):
+    global _worker_storage
+    _worker_storage = SecureCloudStorage._from_key(key)
+
+
+def _encrypt_path(src_path, dst_path):
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        _worker_storage.encrypt_stream(src, dst)
+    return os.path.getsize(src_path)
+
+
+def _decrypt_path(src_path, dst_path):
+    try:
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            return _worker_storage.decrypt_stream(src, dst)
+    except Exception:
+        _remove_partial(dst_path)
+        raise
+
+
+def _remove_partial(path):
+    """Don't leave a partial plaintext behind"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _frame_layout(chunk_size):
+    return FRAME.size + chunk_size + TAG_SIZE
+
+
+def _seal_chunk(src_path, header, index, chunk_size, final):
+    with open(src_path, 'rb') as f:
+        f.seek(index * chunk_size)
+        chunk = f.read(chunk_size)
+    return _worker_storage._seal(header, index, FLAG_FINAL if final else 0, chunk)
+
+
+def _open_chunk(src_path, header, index, chunk_size, final):
+    with open(src_path, 'rb') as f:
+        f.seek(HEADER.size + index * _frame_layout(chunk_size))
+        frame = _read_exact(f, FRAME.size)
+        flags, length = FRAME.unpack(frame)
+        if bool(flags & FLAG_FINAL) != final or length > chunk_size or (not final and length != chunk_size):
+            raise ValueError(f"Corrupt or reordered chunk {index}")
+        body = _read_exact(f, length + TAG_SIZE)
+    return _worker_storage._open(header, index, frame, body)
+
+
+def _report(action, sizes, start):
+    seconds = time.perf_counter() - start
+    total = sum(sizes)
+    mb_per_s = total / (1024 * 1024) / seconds if seconds else 0.0
+    print(f"✅ {action} {len(sizes)} item(s), {total} bytes in {seconds:.2f}s ({mb_per_s:.1f} MB/s)")
+    return {'items': len(sizes), 'bytes': total, 'seconds': seconds, 'mb_per_s': mb_per_s}
+
+
+class BulkCrypto:
+    """Encrypt or decrypt many files, or the chunks of one large file, in parallel.
+
+    Files use the chunked format, so a large file's chunks are independent
+    and can be sealed on different cores. Results come back in input order.
+    """
+
+    def __init__(self, storage, workers=None):
+        self.storage = storage
+        self.workers = workers or os.cpu_count() or 1
+
+    def _pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.storage.key,)
+        )
+
+    def _run_files(self, action, func, paths, out_dir):
+        targets = [os.path.join(out_dir, os.path.basename(path)) for path in paths]
+        clashes = sorted(name for name, n in Counter(map(os.path.basename, paths)).items() if n > 1)
+        if clashes:
+            raise ValueError(f"Inputs would overwrite each other in {out_dir}: {', '.join(clashes)}")
+        os.makedirs(out_dir, exist_ok=True)
+        start = time.perf_counter()
+        with self._pool() as pool:
+            sizes = list(pool.map(func, paths, targets))
+        report = _report(action, sizes, start)
+        report['outputs'] = targets
+        return report
+
+    def encrypt_files(self, paths, out_dir):
+        """Encrypt each path into out_dir under the same basename"""
+        return self._run_files("Encrypted", _encrypt_path, paths, out_dir)
+
+    def decrypt_files(self, paths, out_dir):
+        """Decrypt each chunked-format path into out_dir under the same basename"""
+        return self._run_files("Decrypted", _decrypt_path, paths, out_dir)
+
+    def _run_chunks(self, func, src_path, dst, header, count, chunk_size):
+        """Run func over chunk indices, writing results in order with a bounded window"""
+        window = []
+        with self._pool() as pool:
+            for index in range(count):
+                window.append(pool.submit(func, src_path, header, index, chunk_size, index == count - 1))
+                if len(window) >= self.workers * 2:
+                    dst.write(window.pop(0).result())
+            for future in window:
+                dst.write(future.result())
+
+    def encrypt_file(self, src_path, dst_path, chunk_size=CHUNK_SIZE):
+        """Encrypt one large file with its chunks sealed across the pool"""
+        start = time.perf_counter()
+        size = os.path.getsize(src_path)
+        count = max(1, -(-size // chunk_size))
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, chunk_size, get_random_bytes(8))
+        with open(dst_path, 'wb') as dst:
+            dst.write(header)
+            self._run_chunks(_seal_chunk, src_path, dst, header, count, chunk_size)
+        return _report("Encrypted", [size], start)
+
+    def decrypt_file(self, src_path, dst_path):
+        """Decrypt one large chunked-format file with chunks opened across the pool"""
+        start = time.perf_counter()
+        with open(src_path, 'rb') as f:
+            header = _read_exact(f, HEADER.size)
+        magic, version, codec_id, chunk_size, _ = HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a chunked SecureCloudStorage file")
+        try:
+            if codec_id:
+                # Decompression is sequential, so compressed files decrypt in one pass
+                with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+                    self.storage.decrypt_stream(src, dst)
+            else:
+                body_size = os.path.getsize(src_path) - HEADER.size
+                count = max(1, -(-body_size // _frame_layout(chunk_size)))
+                with open(dst_path, 'wb') as dst:
+                    self._run_chunks(_open_chunk, src_path, dst, header, count, chunk_size)
+        except Exception:
+            _remove_partial(dst_path)
+            raise
+        return _report("Decrypted", [os.path.getsize(dst_path)], start)
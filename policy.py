@@ -0,0 +1,159 @@
+import re
+import threading
+
+_TOKEN = re.compile(r'\s*(\(|\)|,|[^\s(),]+)')
+_MAX_CACHED_ATTRIBUTES = 65536
+
+
+def _never(mask):
+    return False
+
+
+class PolicyEngine:
+    """Compile access policies into bitmask checks over interned role IDs.
+
+    Policies keep the legacy comma syntax ("BCS,BCY" means either role) and
+    also accept CP-ABE style gates:
+
+        BCS AND BCD
+        (BCS OR BCY) AND DOCTOR
+        2 of (BCS, BCY, BCD)
+
+    Each distinct policy string is compiled once into a small evaluator and
+    each distinct attribute string into a bitmask, so a check is a couple of
+    dict lookups and a few integer operations.
+    """
+
+    def __init__(self):
+        self.role_ids = {}
+        self._policies = {}
+        self._attributes = {}
+        self._lock = threading.Lock()
+
+    def role_bit(self, role):
+        role_id = self.role_ids.get(role)
+        if role_id is None:
+            with self._lock:
+                role_id = self.role_ids.get(role)
+                if role_id is None:
+                    role_id = self.role_ids[role] = len(self.role_ids)
+                    # Cached attribute masks ignored this role; recompute them
+                    self._attributes.clear()
+        return 1 << role_id
+
+    def attribute_mask(self, attributes):
+        """Bitmask for a comma-separated attribute string (or a single role)"""
+        mask = self._attributes.get(attributes)
+        if mask is None:
+            # Under the lock, so a role interned meanwhile can't leave a stale mask cached
+            with self._lock:
+                mask = 0
+                for role in attributes.split(','):
+                    role_id = self.role_ids.get(role.strip())
+                    # Roles no policy mentions can never satisfy one
+                    if role_id is not None:
+                        mask |= 1 << role_id
+                if len(self._attributes) >= _MAX_CACHED_ATTRIBUTES:
+                    self._attributes.clear()
+                self._attributes[attributes] = mask
+        return mask
+
+    def compile(self, policy):
+        """Return a callable taking an attribute mask; raises ValueError if malformed"""
+        evaluator = self._policies.get(policy)
+        if evaluator is None:
+            evaluator = self._policies[policy] = self._compile(policy)
+        return evaluator
+
+    def check(self, policy, attributes):
+        return self.compile(policy)(self.attribute_mask(attributes))
+
+    def _compile(self, policy):
+        tokens = _TOKEN.findall(policy)
+        if not tokens:
+            return _never
+        parser = _Parser(tokens, self)
+        node = parser.parse_or(comma_is_or=True)
+        if parser.pos != len(tokens):
+            raise ValueError(f"Unexpected '{tokens[parser.pos]}' in policy: {policy}")
+        return _build(node)
+
+
+class _Parser:
+    def __init__(self, tokens, engine):
+        self.tokens = tokens
+        self.pos = 0
+        self.engine = engine
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _take(self, expected=None):
+        token = self._peek()
+        if token is None or (expected and token.upper() != expected):
+            raise ValueError(f"Expected {expected or 'a role'} in policy")
+        self.pos += 1
+        return token
+
+    def parse_or(self, comma_is_or):
+        children = [self.parse_and()]
+        while True:
+            token = self._peek()
+            if token is None or not (token.upper() == 'OR' or (comma_is_or and token == ',')):
+                break
+            self.pos += 1
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else (1, children)
+
+    def parse_and(self):
+        children = [self.parse_atom()]
+        while self._peek() is not None and self._peek().upper() == 'AND':
+            self.pos += 1
+            children.append(self.parse_atom())
+        return children[0] if len(children) == 1 else (len(children), children)
+
+    def parse_atom(self):
+        token = self._take()
+        if token == '(':
+            node = self.parse_or(comma_is_or=True)
+            self._take(')')
+            return node
+        if token.isdigit() and self._peek() is not None and self._peek().upper() == 'OF':
+            self.pos += 1
+            self._take('(')
+            children = [self.parse_or(comma_is_or=False)]
+            while self._peek() == ',':
+                self.pos += 1
+                children.append(self.parse_or(comma_is_or=False))
+            self._take(')')
+            k = int(token)
+            if not 1 <= k <= len(children):
+                raise ValueError(f"Threshold {k} of {len(children)} can never be met")
+            return (k, children)
+        if token in ('(', ')', ',') or token.upper() in ('AND', 'OR'):
+            raise ValueError(f"Unexpected '{token}' in policy")
+        return self.engine.role_bit(token)
+
+
+def _build(node):
+    """Turn a parse tree of role bits and (k, children) gates into a closure"""
+    if isinstance(node, int):
+        bit = node
+        return lambda mask: mask & bit != 0
+    k, children = node
+    if all(isinstance(child, int) for child in children):
+        # Flat gate over plain roles: one AND plus a comparison or popcount
+        gate = 0
+        for bit in children:
+            gate |= bit
+        if k == 1:
+            return lambda mask: mask & gate != 0
+        if k == len(children):
+            return lambda mask: mask & gate == gate
+        return lambda mask: (mask & gate).bit_count() >= k
+    evaluators = [_build(child) for child in children]
+    if k == 1:
+        return lambda mask: any(e(mask) for e in evaluators)
+    if k == len(evaluators):
+        return lambda mask: all(e(mask) for e in evaluators)
+    return lambda mask: sum(1 for e in evaluators if e(mask)) >= k
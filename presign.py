@@ -0,0 +1,97 @@
+import time
+
+from transfer import MAX_PARTS, MIN_PART_SIZE
+
+DEFAULT_EXPIRY = 300  # Seconds a URL stays valid
+SSE_HEADERS = {'x-amz-server-side-encryption': 'AES256'}  # Signed into PUT URLs
+
+
+class Presigner:
+    """Short-lived presigned URLs, so clients move object bytes to and from S3 directly.
+
+    Signing is local SigV4 over the request and its expiry, so a GET or
+    PUT URL costs no S3 request and constant work regardless of object
+    size. Only starting (and completing) a multipart upload talks to S3.
+    """
+
+    def __init__(self, s3, bucket, expires_in=DEFAULT_EXPIRY):
+        self.s3 = s3
+        self.bucket = bucket
+        self.expires_in = expires_in
+
+    def _sign(self, client_method, params, expires_in):
+        return self.s3.generate_presigned_url(
+            client_method,
+            Params={'Bucket': self.bucket, **params},
+            ExpiresIn=expires_in
+        )
+
+    def get(self, s3_key, expires_in=None, filename=None):
+        """URL for a GET of s3_key; filename sets the download's Content-Disposition"""
+        expires_in = expires_in or self.expires_in
+        params = {'Key': s3_key}
+        if filename:
+            params['ResponseContentDisposition'] = f'attachment; filename="{filename}"'
+        return {
+            'method': 'GET',
+            'url': self._sign('get_object', params, expires_in),
+            's3_key': s3_key,
+            'expires_at': time.time() + expires_in
+        }
+
+    def put(self, s3_key, expires_in=None):
+        """URL for a single PUT; the client must send the returned headers with it"""
+        expires_in = expires_in or self.expires_in
+        return {
+            'method': 'PUT',
+            'url': self._sign('put_object', {'Key': s3_key, 'ServerSideEncryption': 'AES256'}, expires_in),
+            's3_key': s3_key,
+            'headers': dict(SSE_HEADERS),
+            'expires_at': time.time() + expires_in
+        }
+
+    def multipart(self, s3_key, size, part_size, expires_in=None):
+        """Start a multipart upload and return one PUT URL per part.
+
+        The client uploads each part's byte range to its URL, in any order
+        and in parallel, then hands the parts' ETags to complete().
+        """
+        expires_in = expires_in or self.expires_in
+        part_size = max(part_size, MIN_PART_SIZE, -(-size // MAX_PARTS))
+        response = self.s3.create_multipart_upload(
+            Bucket=self.bucket, Key=s3_key, ServerSideEncryption='AES256'
+        )
+        upload_id = response['UploadId']
+        parts = []
+        for n, offset in enumerate(range(0, max(size, 1), part_size), start=1):
+            parts.append({
+                'part': n,
+                'offset': offset,
+                'length': min(part_size, size - offset),
+                'url': self._sign('upload_part',
+                                  {'Key': s3_key, 'UploadId': upload_id, 'PartNumber': n},
+                                  expires_in)
+            })
+        return {
+            'method': 'PUT',
+            's3_key': s3_key,
+            'upload_id': upload_id,
+            'part_size': part_size,
+            'parts': parts,
+            'expires_at': time.time() + expires_in
+        }
+
+    def complete(self, s3_key, upload_id, etags):
+        """Finish a multipart upload from {part number: ETag}"""
+        return self.s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': [
+                {'PartNumber': int(n), 'ETag': etag}
+                for n, etag in sorted(etags.items(), key=lambda item: int(item[0]))
+            ]}
+        )
+
+    def abort(self, s3_key, upload_id):
+        self.s3.abort_multipart_upload(Bucket=self.bucket, Key=s3_key, UploadId=upload_id)
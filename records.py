@@ -0,0 +1,542 @@
+import bisect
+import csv
+import io
+import os
+import sqlite3
+import sys
+import threading
+
+FIELDS = ['admin', 's3_key', 'allowed_roles', 'upload_time', 'filename', 'version', 'location']
+_COLUMNS = ', '.join(FIELDS)
+_SCHEMA_VERSION = 1  # SQLite user_version once versions are unique and reserved in the database
+
+
+def object_key(owner, filename, version):
+    """S3 key for one version of a file; version 1 keeps the original owner/filename key"""
+    if version == 1:
+        return f"{owner}/{filename}"
+    return f"{owner}/v{version}/{filename}"
+
+
+def _prefix_end(prefix):
+    # Every string starting with prefix sorts below this
+    return prefix + '\U0010ffff'
+
+
+def initialize_csv(csv_file):
+    """Create the access records CSV with its header and sample row"""
+    if not os.path.exists(csv_file):
+        with open(csv_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            # Sample data as in your original
+            writer.writerow(['bob', 'Bob/test.txt', 'BCS,BCY,BCD', '2025-04-01T16:49:22.656298',
+                             'test.txt', 1, ''])
+
+
+class RecordStore:
+    """Storage backend for access records.
+
+    Rows are dicts keyed by FIELDS. Owners are stored lowercased. Each row
+    is one version of one of the owner's files; rows written before
+    versioning get filename from the key's basename and versions in the
+    order they were recorded. location names the shard holding the object;
+    it is empty for rows written before sharding, whose objects are on
+    the first shard.
+    """
+
+    def append(self, owner, s3_key, allowed_roles, upload_time, filename=None, version=None,
+               location=None):
+        self.append_many([(owner, s3_key, allowed_roles, upload_time, filename, version, location)])
+
+    def append_many(self, rows):
+        """Commit (owner, s3_key, allowed_roles, upload_time[, filename, version, location]) tuples in one write.
+
+        A missing filename defaults to the key's basename and a missing
+        version to the next one for that file.
+        """
+        raise NotImplementedError
+
+    def next_versions(self, owner, filenames):
+        """next_version for each filename in turn, as one reservation where the store allows"""
+        return [self.next_version(owner, filename) for filename in filenames]
+
+    def _complete(self, row):
+        owner, s3_key, allowed_roles, upload_time = row[:4]
+        filename, version, location = (tuple(row[4:7]) + (None, None, None))[:3]
+        filename = filename or os.path.basename(s3_key)
+        if version is None:
+            version = self.next_version(owner, filename)
+        return owner.lower(), s3_key, allowed_roles, upload_time, filename, int(version), location or ''
+
+    def relocate_many(self, moves):
+        """Record new locations for file versions, from (owner, filename, version, location) tuples"""
+        raise NotImplementedError
+
+    def next_version(self, owner, filename):
+        """Reserve and return the next version number for an owner's file.
+
+        An upload that fails leaves a gap rather than letting a concurrent
+        upload reuse its number.
+        """
+        raise NotImplementedError
+
+    def latest_row(self, owner, filename):
+        """The newest version of a file, or None"""
+        raise NotImplementedError
+
+    def version_row(self, owner, filename, version):
+        """One specific version of a file, or None"""
+        raise NotImplementedError
+
+    def versions(self, owner, filename):
+        """Every version of a file, oldest first"""
+        raise NotImplementedError
+
+    def current_rows(self, owner):
+        """The newest version of each of an owner's files, most recently uploaded first"""
+        raise NotImplementedError
+
+    def list_files(self, owner, prefix=''):
+        """Sorted filenames of an owner's files that start with prefix"""
+        raise NotImplementedError
+
+    def current_rows_by_owner(self):
+        """current_rows for every owner"""
+        return {owner: list(self.current_rows(owner)) for owner in self.rows_by_owner()}
+
+    def rows_for_owner(self, owner):
+        """All rows for an owner, oldest first"""
+        raise NotImplementedError
+
+    def row_for_key(self, s3_key):
+        """The most recent row recorded for an S3 key"""
+        raise NotImplementedError
+
+    def rows_by_owner(self):
+        """Every row grouped by lowercased owner, oldest first within each owner"""
+        raise NotImplementedError
+
+    def version(self):
+        """A value that changes whenever rows are added"""
+        raise NotImplementedError
+
+
+class RecordCatalog(RecordStore):
+    """In-memory index over the access records CSV.
+
+    Rows are parsed once and indexed by lowercased owner, by s3_key, and
+    by (owner, filename) -> {version: row}, with each owner's latest
+    versions in upload order and its filenames in a sorted list, so
+    latest-version lookups are a dict hit and prefix listings a bisect.
+    Files written before versioning or sharding (four or six columns) are
+    read as-is and new rows append every column. A row repeating an
+    existing version (a relocation) replaces it in place. When the file
+    grows because another process appended to it, only the new bytes are
+    parsed; if it is truncated or replaced, the index is rebuilt from
+    scratch.
+    """
+
+    def __init__(self, csv_file):
+        self.csv_file = csv_file
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.fields = list(FIELDS)
+        self._by_owner = {}
+        self._by_key = {}
+        self._versions = {}  # (owner, filename) -> {version: row}
+        self._current = {}  # owner -> {filename: latest row}, oldest upload first
+        self._names = {}  # owner -> sorted filenames
+        self._positions = {}  # (owner, filename, version) -> index in _by_owner[owner]
+        self._reserved = {}  # (owner, filename) -> highest version handed out
+        self._offset = 0  # End of the last complete line parsed
+        self._ident = None
+        self._size = None
+        self._mtime = None
+
+    def refresh(self):
+        """Pick up rows written since the last refresh (one stat if unchanged)"""
+        try:
+            st = os.stat(self.csv_file)
+        except FileNotFoundError:
+            with self._lock:
+                self._reset()
+            return
+        with self._lock:
+            ident = (st.st_dev, st.st_ino)
+            if st.st_size == self._size and st.st_mtime_ns == self._mtime and ident == self._ident:
+                return
+            if (ident != self._ident or st.st_size < self._offset
+                    or (st.st_size == self._size and st.st_mtime_ns != self._mtime)):
+                self._reset()
+                self._ident = ident
+            self._load_from(self._offset)
+            self._size = st.st_size
+            self._mtime = st.st_mtime_ns
+
+    def _load_from(self, offset):
+        with open(self.csv_file, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # Leave a trailing partial row (a writer mid-append) for the next refresh
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return
+        reader = csv.reader(io.StringIO(data[:end].decode('utf-8'), newline=''))
+        if offset == 0:
+            header = next(reader, None)
+            if header:
+                self.fields = header
+        for values in reader:
+            if values:
+                # Wider rows appended to a file with an older header
+                fields = FIELDS if len(values) > len(self.fields) else self.fields
+                self._index(dict(zip(fields, values)))
+        self._offset = offset + end
+
+    def _index(self, row):
+        owner = row['admin'].lower()
+        if not row.get('filename'):
+            row['filename'] = os.path.basename(row['s3_key'])
+        filename = row['filename']
+        versions = self._versions.get((owner, filename))
+        if versions is None:
+            versions = self._versions[(owner, filename)] = {}
+            bisect.insort(self._names.setdefault(owner, []), filename)
+        if row.get('version'):
+            row['version'] = int(row['version'])
+        else:
+            row['version'] = max(versions, default=0) + 1
+        row.setdefault('location', '')
+        previous = versions.get(row['version'])
+        versions[row['version']] = row
+        current = self._current.setdefault(owner, {})
+        latest = current.get(filename)
+        rows = self._by_owner.setdefault(owner, [])
+        if previous is not None:
+            # A relocated version keeps its place in upload order
+            if latest is previous:
+                current[filename] = row
+            rows[self._positions[(owner, filename, row['version'])]] = row
+        else:
+            if latest is None or row['version'] >= latest['version']:
+                current.pop(filename, None)  # Re-insert so upload order stays newest last
+                current[filename] = row
+            self._positions[(owner, filename, row['version'])] = len(rows)
+            rows.append(row)
+        self._by_key[row['s3_key']] = row
+
+    def append_many(self, rows):
+        """Append rows to the CSV and index them without rescanning the file"""
+        with self._lock:
+            self.refresh()
+            rows = [self._complete(row) for row in rows]
+            with open(self.csv_file, 'a', newline='') as f:
+                csv.writer(f).writerows(rows)
+            self.refresh()
+
+    def relocate_many(self, moves):
+        """Append a copy of each moved version's row carrying its new location"""
+        with self._lock:
+            self.refresh()
+            rows = []
+            for owner, filename, version, location in moves:
+                row = self._versions.get((owner.lower(), filename), {}).get(int(version))
+                if row is not None:
+                    rows.append([row[field] for field in FIELDS[:-1]] + [location])
+            with open(self.csv_file, 'a', newline='') as f:
+                csv.writer(f).writerows(rows)
+            self.refresh()
+
+    def next_version(self, owner, filename):
+        with self._lock:
+            self.refresh()
+            key = (owner.lower(), filename)
+            version = max(max(self._versions.get(key, ()), default=0), self._reserved.get(key, 0)) + 1
+            self._reserved[key] = version
+            return version
+
+    def latest_row(self, owner, filename, refresh=True):
+        if refresh:
+            self.refresh()
+        return self._current.get(owner.lower(), {}).get(filename)
+
+    def version_row(self, owner, filename, version, refresh=True):
+        if refresh:
+            self.refresh()
+        return self._versions.get((owner.lower(), filename), {}).get(int(version))
+
+    def versions(self, owner, filename):
+        self.refresh()
+        versions = self._versions.get((owner.lower(), filename), {})
+        return [versions[v] for v in sorted(versions)]
+
+    def current_rows(self, owner, refresh=True):
+        if refresh:
+            self.refresh()
+        # A copy, so appends from other threads can't disturb the caller's iteration
+        return reversed(list(self._current.get(owner.lower(), {}).values()))
+
+    def list_files(self, owner, prefix=''):
+        self.refresh()
+        names = self._names.get(owner.lower(), [])
+        return names[bisect.bisect_left(names, prefix):bisect.bisect_left(names, _prefix_end(prefix))]
+
+    def rows_for_owner(self, owner, refresh=True):
+        if refresh:
+            self.refresh()
+        return self._by_owner.get(owner.lower(), [])
+
+    def row_for_key(self, s3_key, refresh=True):
+        if refresh:
+            self.refresh()
+        return self._by_key.get(s3_key)
+
+    def rows_by_owner(self):
+        self.refresh()
+        return self._by_owner
+
+    def version(self):
+        self.refresh()
+        return (self._ident, self._offset)
+
+
+class SQLiteRecordStore(RecordStore):
+    """Access records in a SQLite database running in WAL mode.
+
+    Readers never block the writer, so many worker processes can upload and
+    check access against one file. Each thread gets its own connection.
+    """
+
+    def __init__(self, db_path='access_records.db', timeout=30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS access_records (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    admin TEXT NOT NULL,
+                    s3_key TEXT NOT NULL,
+                    allowed_roles TEXT NOT NULL,
+                    upload_time TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_records_admin ON access_records (admin);
+                CREATE INDEX IF NOT EXISTS idx_records_s3_key ON access_records (s3_key);
+                CREATE INDEX IF NOT EXISTS idx_records_upload_time ON access_records (upload_time);
+            """)
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(access_records)')}
+            if 'filename' not in columns:
+                conn.execute('ALTER TABLE access_records ADD COLUMN filename TEXT')
+                conn.execute('ALTER TABLE access_records ADD COLUMN version INTEGER')
+                self._backfill_versions(conn)
+            if 'location' not in columns:
+                conn.execute("ALTER TABLE access_records ADD COLUMN location TEXT NOT NULL DEFAULT ''")
+            if conn.execute('PRAGMA user_version').fetchone()[0] < _SCHEMA_VERSION:
+                # Once per database: stores from before the constraint could record a
+                # version twice, so keep the newest row of each before enforcing it
+                conn.execute('DROP INDEX IF EXISTS idx_records_file_version')
+                conn.execute('DELETE FROM access_records WHERE id NOT IN '
+                             '(SELECT MAX(id) FROM access_records GROUP BY admin, filename, version)')
+                conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_records_file_version_unique '
+                             'ON access_records (admin, filename, version)')
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS version_reservations (
+                        admin TEXT NOT NULL,
+                        filename TEXT NOT NULL,
+                        version INTEGER NOT NULL,
+                        PRIMARY KEY (admin, filename)
+                    )
+                """)
+                conn.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+
+    @staticmethod
+    def _backfill_versions(conn):
+        """Give pre-versioning rows a filename and versions in insertion order"""
+        latest = {}
+        updates = []
+        for row in conn.execute('SELECT id, admin, s3_key FROM access_records ORDER BY id'):
+            filename = os.path.basename(row['s3_key'])
+            version = latest[(row['admin'], filename)] = latest.get((row['admin'], filename), 0) + 1
+            updates.append((filename, version, row['id']))
+        conn.executemany('UPDATE access_records SET filename = ?, version = ? WHERE id = ?', updates)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+            self._local.conn = conn
+        return conn
+
+    def append_many(self, rows):
+        rows = [self._complete(row) for row in rows]
+        if not rows:
+            return
+        conn = self._conn()
+        # Take the write lock up front so concurrent writers queue instead of
+        # failing to upgrade a read transaction
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO access_records '
+                '(admin, s3_key, allowed_roles, upload_time, filename, version, location) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def relocate_many(self, moves):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'UPDATE access_records SET location = ? WHERE admin = ? AND filename = ? AND version = ?',
+                [(location, owner.lower(), filename, int(version)) for owner, filename, version, location in moves]
+            )
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def rows_for_owner(self, owner):
+        cursor = self._conn().execute(
+            f'SELECT {_COLUMNS} FROM access_records WHERE admin = ? ORDER BY id',
+            (owner.lower(),)
+        )
+        return [dict(row) for row in cursor]
+
+    def row_for_key(self, s3_key):
+        row = self._conn().execute(
+            f'SELECT {_COLUMNS} FROM access_records WHERE s3_key = ? ORDER BY id DESC LIMIT 1',
+            (s3_key,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def rows_by_owner(self):
+        grouped = {}
+        cursor = self._conn().execute(f'SELECT {_COLUMNS} FROM access_records ORDER BY id')
+        for row in cursor:
+            grouped.setdefault(row['admin'], []).append(dict(row))
+        return grouped
+
+    def next_version(self, owner, filename):
+        return self.next_versions(owner, [filename])[0]
+
+    def next_versions(self, owner, filenames):
+        """Reserve versions in the database, so every process sharing it gets distinct ones.
+
+        The whole batch is one write transaction.
+        """
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            versions = []
+            for filename in filenames:
+                key = (owner.lower(), filename)
+                stored = conn.execute(
+                    'SELECT MAX(version) FROM access_records WHERE admin = ? AND filename = ?', key
+                ).fetchone()[0] or 0
+                reserved = conn.execute(
+                    'SELECT version FROM version_reservations WHERE admin = ? AND filename = ?', key
+                ).fetchone()
+                version = max(stored, reserved[0] if reserved else 0) + 1
+                conn.execute(
+                    'INSERT INTO version_reservations (admin, filename, version) VALUES (?, ?, ?) '
+                    'ON CONFLICT (admin, filename) DO UPDATE SET version = excluded.version',
+                    key + (version,)
+                )
+                versions.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        return versions
+
+    def latest_row(self, owner, filename):
+        row = self._conn().execute(
+            f'SELECT {_COLUMNS} FROM access_records WHERE admin = ? AND filename = ? '
+            'ORDER BY version DESC, id DESC LIMIT 1',
+            (owner.lower(), filename)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def version_row(self, owner, filename, version):
+        row = self._conn().execute(
+            f'SELECT {_COLUMNS} FROM access_records WHERE admin = ? AND filename = ? AND version = ? '
+            'ORDER BY id DESC LIMIT 1',
+            (owner.lower(), filename, int(version))
+        ).fetchone()
+        return dict(row) if row else None
+
+    def versions(self, owner, filename):
+        cursor = self._conn().execute(
+            f'SELECT {_COLUMNS} FROM access_records WHERE admin = ? AND filename = ? '
+            'ORDER BY version, id',
+            (owner.lower(), filename)
+        )
+        return [dict(row) for row in cursor]
+
+    def current_rows(self, owner):
+        # The newest row of each file, whose version is its file's highest
+        cursor = self._conn().execute(
+            f'SELECT {_COLUMNS} FROM access_records r WHERE admin = ? AND id = ('
+            '    SELECT id FROM access_records WHERE admin = r.admin AND filename = r.filename'
+            '    ORDER BY version DESC, id DESC LIMIT 1'
+            ') ORDER BY id DESC',
+            (owner.lower(),)
+        )
+        return [dict(row) for row in cursor]
+
+    def list_files(self, owner, prefix=''):
+        cursor = self._conn().execute(
+            'SELECT DISTINCT filename FROM access_records '
+            'WHERE admin = ? AND filename >= ? AND filename < ? ORDER BY filename',
+            (owner.lower(), prefix, _prefix_end(prefix))
+        )
+        return [row[0] for row in cursor]
+
+    def version(self):
+        return tuple(self._conn().execute('SELECT MAX(id), COUNT(*) FROM access_records').fetchone())
+
+    def count(self):
+        return self._conn().execute('SELECT COUNT(*) FROM access_records').fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def migrate_csv_to_sqlite(csv_file, db_path, batch_size=10000):
+    """One-shot copy of an access records CSV into a SQLite store"""
+    store = SQLiteRecordStore(db_path)
+    if store.count():
+        print(f"❌ {db_path} already holds access records; not migrating")
+        return 0
+    # Read through the catalog so relocated copies of a version collapse into one row
+    # and rows from before versioning get the versions the CSV store gave them
+    rows = [row for owner_rows in RecordCatalog(csv_file).rows_by_owner().values() for row in owner_rows]
+    migrated = 0
+    for start in range(0, len(rows), batch_size):
+        batch = [tuple(row[field] for field in FIELDS) for row in rows[start:start + batch_size]]
+        store.append_many(batch)
+        migrated += len(batch)
+    print(f"✅ Migrated {migrated} records from {csv_file} to {db_path}")
+    return migrated
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python records.py <access_records.csv> <access_records.db>")
+        sys.exit(1)
+    migrate_csv_to_sqlite(sys.argv[1], sys.argv[2])
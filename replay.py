@@ -0,0 +1,224 @@
+"""Replay a JSONL workload against IntegratedCloudSystem.
+
+    python replay.py workload.jsonl --rate 200 --concurrency 16
+
+One operation per line:
+
+    {"op": "upload", "owner": "bob", "path": "test.txt", "roles": ["BCS"]}
+    {"op": "access", "user": "alice", "role": "BCS", "owner": "bob"}
+    {"op": "revoke", "user": "alice", "owner": "bob"}
+    {"op": "restore", "user": "alice"}
+
+Arrivals are open-loop: with --rate, operation i is due at i / rate
+seconds (or at Poisson-spaced times with --poisson); without it, lines
+carrying an "at" offset in seconds are replayed on that schedule, scaled
+by --speed. Latency is measured from when an operation was due, not when
+a worker picked it up, so a saturated system shows up as tail latency
+rather than as a quietly lower offered load. Lines without an "op" are
+skipped. The report is JSON: throughput, latency percentiles per op, and
+grant/deny/error counts.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cpab import IntegratedCloudSystem
+from local_s3 import LocalS3
+from metrics import Histogram
+
+OPS = ('upload', 'access', 'revoke', 'restore')
+
+
+def load_workload(path):
+    """Parse operations from a JSONL file; returns (ops, skipped line count)"""
+    ops = []
+    skipped = 0
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if not isinstance(record, dict) or record.get('op') not in OPS:
+                skipped += 1
+                continue
+            ops.append(record)
+    return ops, skipped
+
+
+def schedule(ops, rate=None, poisson=False, speed=1.0, seed=None):
+    """Due time (seconds from start) for each operation"""
+    if rate:
+        if not poisson:
+            return [i / rate for i in range(len(ops))]
+        rng = random.Random(seed)
+        times = []
+        t = 0.0
+        for _ in ops:
+            times.append(t)
+            t += rng.expovariate(rate)
+        return times
+    if all('at' in op for op in ops):
+        first = min((float(op['at']) for op in ops), default=0.0)
+        return [(float(op['at']) - first) / speed for op in ops]
+    return [0.0] * len(ops)  # Closed loop: everything is due now
+
+
+class Replayer:
+    """Run operations against a cloud system and tally their outcomes"""
+
+    def __init__(self, cloud, base_dir='.'):
+        self.cloud = cloud
+        self.base_dir = base_dir
+        self.latency = {}
+        self.outcomes = {}
+        self._lock = threading.Lock()
+
+    def _record(self, op, outcome, seconds):
+        with self._lock:
+            histogram = self.latency.get(op)
+            if histogram is None:
+                histogram = self.latency[op] = Histogram()
+            histogram.record(seconds)
+            counts = self.outcomes.setdefault(op, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+    def execute(self, op):
+        """Run one operation and return its outcome label"""
+        kind = op['op']
+        try:
+            if kind == 'upload':
+                path = op['path']
+                if not os.path.isabs(path):
+                    path = os.path.join(self.base_dir, path)
+                roles = op.get('roles', op.get('allowed_roles', []))
+                if isinstance(roles, str):
+                    roles = roles.split(',')
+                return 'ok' if self.cloud.upload_file(op['owner'], path, roles) else 'error'
+            if kind == 'access':
+                data = self.cloud.access_file(op['user'], op['role'], op['owner'])
+                return 'granted' if data is not None else 'denied'
+            if kind == 'revoke':
+                self.cloud.revoke_user(op['user'], op.get('owner'))
+                return 'ok'
+            self.cloud.restore_user(op['user'], op.get('owner'))
+            return 'ok'
+        except Exception as e:
+            print(f"❌ {kind} failed: {e}", file=sys.stderr)
+            return 'error'
+
+    def run(self, ops, due, concurrency=8):
+        """Submit each operation at its due time.
+
+        Returns (wall-clock seconds, max dispatch lag). The lag is how far
+        the dispatcher itself fell behind the schedule and should stay
+        near zero; if it doesn't, the offered rate was not really offered.
+        """
+        max_lag = 0.0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            def run_one(op, due_at):
+                outcome = self.execute(op)
+                self._record(op['op'], outcome, time.perf_counter() - due_at)
+
+            for op, offset in zip(ops, due):
+                due_at = start + offset
+                delay = due_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+                pool.submit(run_one, op, due_at)
+        return time.perf_counter() - start, max_lag
+
+    def report(self, seconds, max_lag, offered_rate=None):
+        ops = sum(h.count for h in self.latency.values())
+        return {
+            'ops': ops,
+            'seconds': round(seconds, 3),
+            'throughput_ops_per_s': round(ops / seconds, 2) if seconds else None,
+            'offered_rate': offered_rate,
+            'max_dispatch_lag_ms': round(max_lag * 1000, 3),
+            'by_op': {
+                op: {
+                    'outcomes': dict(self.outcomes.get(op, {})),
+                    'latency_ms': {
+                        key: round(value * 1000, 3) if value is not None else None
+                        for key, value in histogram.snapshot().items()
+                        if key not in ('count', 'sum')
+                    },
+                    'count': histogram.count
+                }
+                for op, histogram in sorted(self.latency.items())
+            }
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('workload', nargs='?', default='requests.jsonl')
+    parser.add_argument('--rate', type=float, default=None, help='arrivals per second (open loop)')
+    parser.add_argument('--poisson', action='store_true', help='exponential inter-arrival times')
+    parser.add_argument('--speed', type=float, default=1.0, help='time scale for "at" offsets')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoint-url', default=None,
+                        help='replay against this S3 endpoint instead of the local stand-in')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='simulated seconds per S3 request (local stand-in only)')
+    parser.add_argument('--bucket', default='cpab-replay')
+    parser.add_argument('--workdir', default=None,
+                        help='keep the catalog, audit and revocation files here (default: a temp dir)')
+    parser.add_argument('--out', default=None, help='write JSON here instead of stdout')
+    parser.add_argument('--verbose', action='store_true', help="keep the system's per-request output")
+    args = parser.parse_args(argv)
+
+    ops, skipped = load_workload(args.workload)
+    due = schedule(ops, args.rate, args.poisson, args.speed, args.seed)
+    base_dir = os.path.dirname(os.path.abspath(args.workload))
+
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or stack.enter_context(tempfile.TemporaryDirectory(prefix='cpab-replay-'))
+        cloud = IntegratedCloudSystem(
+            args.bucket,
+            csv_file=os.path.join(workdir, 'access_records.csv'),
+            endpoint_url=args.endpoint_url,
+            audit_path=os.path.join(workdir, 'audit_log.jsonl'),
+            revocation_path=os.path.join(workdir, 'revocations.jsonl'),
+            key_index_path=os.path.join(workdir, 'key_index.jsonl')
+        )
+        if args.endpoint_url is None:
+            cloud.s3 = LocalS3(latency=args.latency)
+        replayer = Replayer(cloud, base_dir)
+        if not args.verbose:
+            devnull = stack.enter_context(open(os.devnull, 'w'))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        seconds, max_lag = replayer.run(ops, due, args.concurrency)
+        cloud.audit_log.close()
+
+    report = replayer.report(seconds, max_lag, args.rate)
+    report['workload'] = args.workload
+    report['skipped_lines'] = skipped
+    report['concurrency'] = args.concurrency
+    report['system'] = cloud.get_metrics()['counters']
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
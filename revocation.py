@@ -0,0 +1,139 @@
+import hashlib
+import math
+
+from journal import Journal
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter; a miss proves the item was never added"""
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationRegistry(Journal):
+    """Revoked users, globally and per owner, with constant-cost checks.
+
+    Revocations live in hash sets, so is_revoked costs the same with ten or
+    a million entries. Changes are appended to a JSONL journal (one line
+    per change, not a rewrite of the whole registry) and replayed on load;
+    every check first picks up lines other processes have appended, so a
+    revocation made by one worker holds on all of them.
+    epoch increases on every change, so caches holding authorization
+    results can compare it to know when to drop them.
+
+    With bloom_capacity set, a Bloom filter over every revoked ID sits in
+    front of the sets and answers the common "not revoked" case first.
+    """
+
+    def __init__(self, path='revocations.jsonl', bloom_capacity=None):
+        self.bloom_capacity = bloom_capacity
+        self.epoch = 0
+        super().__init__(path)
+
+    def _reset(self):
+        self.global_revoked = set()
+        self.by_owner = {}
+        self._bloom = None
+
+    def _after_load(self):
+        self._rebuild_bloom()
+
+    def _rebuild_bloom(self):
+        if self.bloom_capacity is None:
+            return
+        self._bloom = BloomFilter(self.bloom_capacity)
+        for user_id in self.global_revoked:
+            self._bloom.add(user_id)
+        for users in self.by_owner.values():
+            for user_id in users:
+                self._bloom.add(user_id)
+
+    def _apply(self, entry):
+        op, user_id, owner = entry['op'], entry['user'], entry.get('owner')
+        target = self.global_revoked if owner is None else self.by_owner.setdefault(owner, set())
+        if op == 'revoke':
+            target.add(user_id)
+            if self._bloom is not None:
+                self._bloom.add(user_id)
+        else:
+            target.discard(user_id)
+        self.epoch += 1
+
+    def _change(self, op, user_id, owner):
+        self._refresh()
+        user_id = user_id.lower()
+        owner = owner.lower() if owner is not None else None
+        with self._lock:
+            self._append({'op': op, 'user': user_id, 'owner': owner})
+            if op == 'restore' and self._bloom is not None:
+                self._rebuild_bloom()  # Bloom filters can't forget a single item
+        return self.epoch
+
+    def revoke(self, user_id, owner=None):
+        """Revoke a user for one owner's data, or everywhere if owner is None"""
+        return self._change('revoke', user_id, owner)
+
+    def restore(self, user_id, owner=None):
+        return self._change('restore', user_id, owner)
+
+    def is_revoked(self, user_id, owner=None):
+        self._refresh()
+        user_id = user_id.lower()
+        if self._bloom is not None and user_id not in self._bloom:
+            return False
+        if user_id in self.global_revoked:
+            return True
+        if owner is None:
+            return False
+        owner_revoked = self.by_owner.get(owner.lower())
+        return owner_revoked is not None and user_id in owner_revoked
+
+    def revoked_many(self, users, owners):
+        """is_revoked over parallel sequences of users and owners, as a NumPy bool array"""
+        # NumPy is only needed for bulk checks
+        import numpy as np
+        self._refresh()
+        with self._lock:
+            global_revoked = list(self.global_revoked)
+            owner_pairs = [f"{user_id}\x1f{owner}" for owner, owner_users in self.by_owner.items()
+                           for user_id in owner_users]
+        if not global_revoked and not owner_pairs:
+            return np.zeros(len(users), dtype=bool)
+        users = np.char.lower(np.asarray(users, dtype=str))
+        revoked = np.isin(users, global_revoked)
+        if owner_pairs:
+            pairs = np.char.add(np.char.add(users, '\x1f'), np.char.lower(np.asarray(owners, dtype=str)))
+            revoked |= np.isin(pairs, owner_pairs)
+        return revoked
+
+    def revoked_users(self, owner=None):
+        self._refresh()
+        if owner is None:
+            return set(self.global_revoked)
+        return set(self.by_owner.get(owner.lower(), ()))
+
+    def compact(self):
+        """Rewrite the journal as one line per currently revoked user"""
+        self._refresh()
+        with self._lock:
+            self._rewrite(
+                [{'op': 'revoke', 'user': user_id, 'owner': None} for user_id in sorted(self.global_revoked)]
+                + [{'op': 'revoke', 'user': user_id, 'owner': owner}
+                   for owner, users in sorted(self.by_owner.items()) for user_id in sorted(users)]
+            )
@@ -0,0 +1,97 @@
+import bisect
+import hashlib
+
+VNODES = 128  # Ring points per unit of weight; more points spread keys more evenly
+
+
+def _point(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class Shard:
+    """One place objects are put: a bucket on an S3 endpoint (or a stand-in
+    client), or any backends.StorageBackend, such as a local directory.
+
+    name is what the catalog records as an object's location, so it must
+    stay the same for as long as the shard holds data. It defaults to the
+    bucket name.
+    """
+
+    def __init__(self, bucket, name=None, s3=None, endpoint_url=None, weight=1, backend=None):
+        self.bucket = bucket
+        self.name = name or bucket
+        self.s3 = s3  # Created from endpoint_url on first use when None
+        self.endpoint_url = endpoint_url
+        self.weight = weight
+        self.backend = backend  # An S3Backend over the bucket is built on first use when None
+        self.ready = False  # Whether the bucket (or directory) has been checked
+
+    def __repr__(self):
+        return f"Shard({self.bucket!r}, name={self.name!r})"
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to node names.
+
+    Each node owns vnodes * weight pseudo-random points and a key goes to
+    the node owning the first point at or after the key's hash. Adding or
+    removing a node only remaps the keys on the arcs it gains or loses,
+    about 1/N of them, instead of nearly all as with hash-mod-N.
+    """
+
+    def __init__(self, weights, vnodes=VNODES):
+        points = sorted(
+            (_point(f"{name}#{i}"), name)
+            for name, weight in weights.items()
+            for i in range(max(1, int(vnodes * weight)))
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [name for _, name in points]
+
+    def node_for(self, key):
+        index = bisect.bisect_left(self._hashes, _point(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+class ShardSet:
+    """The shards objects are spread over, and the ring placing them.
+
+    Object keys start with their owner, so placing by key spreads a hot
+    owner's files across shards. The first shard also holds objects
+    recorded before sharding, whose catalog rows have no location.
+    """
+
+    def __init__(self, shards, vnodes=VNODES):
+        if not shards:
+            raise ValueError("At least one shard is required")
+        self.shards = {}
+        for shard in shards:
+            if shard.name in self.shards:
+                raise ValueError(f"Duplicate shard name: {shard.name}")
+            self.shards[shard.name] = shard
+        self.primary = shards[0]
+        self.ring = HashRing({shard.name: shard.weight for shard in shards}, vnodes)
+
+    def __len__(self):
+        return len(self.shards)
+
+    def __iter__(self):
+        return iter(self.shards.values())
+
+    def get(self, name):
+        return self.shards.get(name)
+
+    def place(self, s3_key):
+        """The shard a key belongs on under this membership"""
+        if len(self.shards) == 1:
+            return self.primary
+        return self.shards[self.ring.node_for(s3_key)]
+
+    def locate(self, location):
+        """The shard a catalog location names; empty means the first shard"""
+        if not location:
+            return self.primary
+        shard = self.shards.get(location)
+        if shard is None:
+            raise ValueError(f"Object is on shard {location!r}, which is not configured")
+        return shard
@@ -23,12 +23,10 @@ def test_full_system_with_s3():
         user_role = input("Your Role: ").strip()
         
         user = CloudUser(user_name, user_role, cloud)
-        data = user.request_access(admin_name)
-        
-        if data:
-            filename = f"downloaded_{admin_name}_file.txt"
-            with open(filename, 'wb') as f:  # 'wb' for binary write mode
-                f.write(data)
+        filename = f"downloaded_{admin_name}_file.txt"
+        written = user.request_access_to(admin_name, filename)  # Streams to disk
+
+        if written is not None:
             print(f"✅ Access granted! File saved as: {filename}")
         else:
             print("❌ Access denied")
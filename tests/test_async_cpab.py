@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from async_cpab import AsyncIntegratedCloudSystem
+from backends import LocalFSBackend
+from blobs import LAYOUT_KEY, MANIFEST_LAYOUT, blob_key, encode_manifest
+from local_s3 import LocalS3
+from shards import Shard
+
+
+class AsyncLocalS3:
+    """aiobotocore-shaped coroutines over a LocalS3"""
+
+    def __init__(self, s3):
+        self.s3 = s3
+
+    def __getattr__(self, name):
+        method = getattr(self.s3, name)
+
+        async def call(**kwargs):
+            response = method(**kwargs)
+            if 'Body' in response:
+                response['Body'] = AsyncBody(response['Body'])
+            return response
+        return call
+
+
+class AsyncBody:
+    def __init__(self, body):
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.body.close()
+
+    async def read(self):
+        return self.body.read()
+
+
+class XorCipher:
+    def encrypt_stream(self, src, dst):
+        dst.write(bytes(b ^ 0x5a for b in src.read()))
+
+    def iter_decrypt(self, src):
+        yield bytes(b ^ 0x5a for b in src.read())
+
+
+def test_reads_follow_each_rows_shard_and_the_cipher(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    s3 = LocalS3()
+    cloud = AsyncIntegratedCloudSystem('b0', shards=['b0', 'b1', 'b2'], cipher=XorCipher(),
+                                       audit_path=str(tmp_path / 'audit.jsonl'))
+    cloud._clients[None] = AsyncLocalS3(s3)
+    bodies = {}
+    for i in range(12):
+        path = tmp_path / f"f{i}.txt"
+        path.write_bytes(bodies.setdefault(path.name, f"file {i}".encode()))
+
+    async def run():
+        for name in bodies:
+            assert await cloud.upload_file('alice', str(tmp_path / name), ['BCS'])
+        return [await cloud.access_file('bob', 'BCS', 'alice', filename=name) for name in bodies]
+
+    assert asyncio.run(run()) == list(bodies.values())
+    stored = {bucket: objects for bucket, objects in s3.buckets.items() if objects}
+    assert len(stored) > 1
+    assert b'file 0' not in [obj['data'] for objects in stored.values() for obj in objects.values()]
+
+
+def test_shards_it_cannot_reach_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        AsyncIntegratedCloudSystem('b0', shards=[Shard('b0', backend=LocalFSBackend(str(tmp_path / 'o')))])
+
+
+def test_manifest_chunks_are_fetched_a_bounded_number_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    s3 = LocalS3()
+    s3.create_bucket(Bucket='b0')
+    chunks = [f"chunk {i}".encode() for i in range(20)]
+    digests = [hashlib.sha256(chunk).hexdigest() for chunk in chunks]
+    for digest, chunk in zip(digests, chunks):
+        s3.put_object(Bucket='b0', Key=blob_key(digest), Body=chunk)
+    manifest = encode_manifest((digest, len(chunk)) for digest, chunk in zip(digests, chunks))
+    s3.put_object(Bucket='b0', Key='alice/v1/f.txt', Body=manifest,
+                  Metadata={LAYOUT_KEY: MANIFEST_LAYOUT})
+    cloud = AsyncIntegratedCloudSystem('b0', multipart_workers=3,
+                                       audit_path=str(tmp_path / 'audit.jsonl'))
+    client = AsyncLocalS3(s3)
+    in_flight = [0, 0]
+
+    async def get_object(**kwargs):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return await AsyncLocalS3(s3).get_object(**kwargs)
+
+    client.get_object = get_object
+    cloud._clients[None] = client
+    assert asyncio.run(cloud._read_object('alice/v1/f.txt')) == b''.join(chunks)
+    assert in_flight[1] == 3
+
+    s3.put_object(Bucket='b0', Key='alice/v2/f.txt',
+                  Body=manifest.replace(b'"size":', b'"size":1'),
+                  Metadata={LAYOUT_KEY: MANIFEST_LAYOUT})
+    with pytest.raises(ValueError):
+        asyncio.run(cloud._read_object('alice/v2/f.txt'))
@@ -0,0 +1,47 @@
+import threading
+import time
+
+import numpy as np
+
+from authz import RoleMatrix
+from policy import PolicyEngine
+
+
+def test_concurrent_batches_get_their_own_columns(monkeypatch):
+    policies = PolicyEngine()
+    rows = {'alice': [{'s3_key': 'alice/ab', 'allowed_roles': 'A AND B'},
+                      {'s3_key': 'alice/cd', 'allowed_roles': 'C AND D'}]}
+    matrix = RoleMatrix(rows, policies)
+    both_missed = threading.Barrier(2)
+
+    class Columns(dict):
+        def get(self, key, default=None):
+            value = super().get(key, default)
+            if value is None and threading.current_thread().name.startswith('batch'):
+                # Both batches miss before either adds its column
+                both_missed.wait(timeout=5)
+                threading.current_thread().name = 'done'
+            return value
+
+    matrix.columns = Columns(matrix.columns)
+    hstack = np.hstack
+
+    def slow_hstack(arrays):
+        grown = hstack(arrays)
+        time.sleep(0.05)  # Widen the window between growing the matrix and publishing it
+        return grown
+
+    monkeypatch.setattr(np, 'hstack', slow_hstack)
+    results = {}
+
+    def resolve(role):
+        results[role] = matrix.resolve([role], ['alice'])[1].tolist()
+
+    threads = [threading.Thread(target=resolve, args=(role,), name=f'batch-{role}')
+               for role in ('A,B', 'C,D')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {'A,B': ['alice/ab'], 'C,D': ['alice/cd']}
+    assert matrix.resolve(['A,B', 'C,D', 'A'], ['alice'] * 3)[1].tolist() == ['alice/ab', 'alice/cd', None]
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from backends import LocalFSBackend, S3Backend
+from local_s3 import LocalS3
+from transfer import MIN_PART_SIZE, RangedDownloader
+
+
+def test_failed_multipart_upload_is_aborted(tmp_path, monkeypatch):
+    s3 = LocalS3()
+    backend = S3Backend(s3, 'bucket', part_size=MIN_PART_SIZE, threshold=MIN_PART_SIZE)
+    backend.ensure()
+    backend.uploader.max_retries = 1
+    path = tmp_path / 'big.bin'
+    path.write_bytes(os.urandom(MIN_PART_SIZE + 1))
+
+    def fail(**kwargs):
+        raise ConnectionError('network down')
+
+    monkeypatch.setattr(s3, 'upload_part', fail)
+    with pytest.raises(ConnectionError):
+        backend.put_file('o/v2/big.bin', str(path))
+    assert s3._uploads == {}
+
+
+def test_multipart_upload_round_trip(tmp_path):
+    s3 = LocalS3()
+    backend = S3Backend(s3, 'bucket', part_size=MIN_PART_SIZE, threshold=MIN_PART_SIZE)
+    backend.ensure()
+    data = os.urandom(2 * MIN_PART_SIZE + 3)
+    path = tmp_path / 'big.bin'
+    path.write_bytes(data)
+    report = backend.put_file('o/big.bin', str(path), {'codec': 'zlib'})
+    assert [part['part'] for part in report['parts']] == [1, 2, 3]
+    assert bytes(backend.get('o/big.bin')[0]) == data
+    assert backend.head('o/big.bin')['metadata'] == {'codec': 'zlib'}
+
+
+def test_local_keys_can_nest_under_other_keys(tmp_path):
+    backend = LocalFSBackend(str(tmp_path / 'objects'))
+    backend.ensure()
+    keys = ['o/v2', 'o/v2/a.txt', 'o/100%', 'o/100%/b%25.txt']
+    for key in keys:
+        backend.put(key, key.encode())
+    for key in keys:
+        assert bytes(backend.get(key)[0]) == key.encode()
+    assert list(backend.list('o/')) == sorted(keys)
+    backend.delete('o/v2')
+    assert backend.head('o/v2') is None
+    assert list(backend.list('o/v2')) == ['o/v2/a.txt']
+
+
+def test_ranged_download_appends_at_the_current_position(tmp_path):
+    s3 = LocalS3()
+    s3.create_bucket(Bucket='bucket')
+    data = os.urandom(10 * 1024 + 7)
+    s3.put_object(Bucket='bucket', Key='o/big.bin', Body=data)
+    downloader = RangedDownloader(s3, 'bucket', part_size=1024, threshold=1024, max_workers=4)
+    path = tmp_path / 'out.bin'
+    with open(path, 'wb') as f:
+        f.write(b'header')
+        assert downloader.download('o/big.bin', f) == len(data)
+        f.write(b'trailer')
+    assert path.read_bytes() == b'header' + data + b'trailer'
@@ -0,0 +1,39 @@
+import json
+
+import bench
+import replay
+from transfer import MB
+
+
+def test_bench_reports_every_scenario_and_delta_savings(tmp_path):
+    out = tmp_path / 'bench.json'
+    bench.main(['--sizes', '4096', '--rows', '10', '--concurrency', '1,2', '--ops', '3',
+                '--delta', '--delta-sizes', str(16 * MB), '--out', str(out)])
+    report = json.loads(out.read_text())
+    ops = {result['op'] for result in report['results']}
+    assert {'upload_file', 'access_file', 'download_from_s3', 'request_access'} <= ops
+    assert all(result['ops'] == 3 for result in report['results'])
+    assert [result['edit'] for result in report['delta']] == list(bench.DELTA_EDITS)
+    for result in report['delta']:
+        assert result['delta_bytes'] < result['full_bytes'] / 2, result
+
+
+def test_replay_tallies_outcomes_per_op(tmp_path):
+    (tmp_path / 'test.txt').write_text('hello')
+    workload = tmp_path / 'workload.jsonl'
+    workload.write_text('\n'.join(json.dumps(op) for op in [
+        {'op': 'upload', 'owner': 'bob', 'path': 'test.txt', 'roles': ['BCS']},
+        {'op': 'access', 'user': 'alice', 'role': 'BCS', 'owner': 'bob'},
+        {'op': 'revoke', 'user': 'alice', 'owner': 'bob'},
+        {'op': 'access', 'user': 'alice', 'role': 'BCS', 'owner': 'bob'},
+        {'note': 'not an operation'}
+    ]) + '\n')
+    (tmp_path / 'work').mkdir()
+    out = tmp_path / 'replay.json'
+    # One worker, so the operations run in the order listed
+    replay.main([str(workload), '--concurrency', '1', '--workdir', str(tmp_path / 'work'),
+                 '--out', str(out)])
+    report = json.loads(out.read_text())
+    assert report['skipped_lines'] == 1
+    assert report['by_op']['access']['outcomes'] == {'granted': 1, 'denied': 1}
+    assert report['by_op']['upload']['outcomes'] == {'ok': 1}
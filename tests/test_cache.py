@@ -0,0 +1,43 @@
+import threading
+
+from cache import DiskTier, ObjectCache
+
+
+class Backend:
+    bucket = 'bucket'
+
+    def __init__(self):
+        self.version = 0
+
+    def get(self, key, if_none_match=None):
+        self.version += 1
+        return f"{key} v{self.version}".encode(), {'etag': str(self.version), 'metadata': {}}
+
+
+def test_disk_writes_do_not_hold_the_cache_lock(tmp_path):
+    cache = ObjectCache(disk_dir=str(tmp_path / 'cache'), ttl=0)
+    write = cache.disk.write
+    other_thread_got_in = []
+
+    def slow_write(*args):
+        reader = threading.Thread(target=lambda: other_thread_got_in.append(cache.stats()))
+        reader.start()
+        reader.join(timeout=5)
+        return write(*args)
+
+    cache.disk.write = slow_write
+    assert cache.get(Backend(), 'a.txt') == b'a.txt v1'
+    assert other_thread_got_in
+
+
+def test_a_replaced_entry_leaves_one_copy_that_survives_a_restart(tmp_path):
+    directory = str(tmp_path / 'cache')
+    cache = ObjectCache(disk_dir=directory, ttl=0)
+    backend = Backend()
+    cache.get(backend, 'a.txt')
+    held = cache.disk.get('bucket/a.txt')[1]
+    assert cache.get(backend, 'a.txt') == b'a.txt v2'
+    assert bytes(held) == b'a.txt v1'  # The old mapping is unaffected by the replacement
+    assert len(list((tmp_path / 'cache').iterdir())) == 2
+    reopened = DiskTier(1024, directory)
+    assert bytes(reopened.get('bucket/a.txt')[1]) == b'a.txt v2'
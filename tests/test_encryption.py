@@ -0,0 +1,57 @@
+import io
+import os
+
+import pytest
+
+import compression
+
+pytest.importorskip('tkinter')
+from ok import encryption  # noqa: E402
+
+
+@pytest.mark.parametrize('codec', [None, 'zlib', 'zstd'])
+def test_stream_round_trip(codec):
+    if codec is not None and codec not in compression.available_codecs():
+        pytest.skip(f"{codec} is not installed")
+    storage = encryption.SecureCloudStorage('key')
+    data = b'hello world ' * 200000
+    sealed = io.BytesIO()
+    storage.encrypt_stream(io.BytesIO(data), sealed, codec=codec)
+    assert b''.join(storage.iter_decrypt(io.BytesIO(sealed.getvalue()))) == data
+
+
+def test_ciphertext_is_not_recompressed(tmp_path):
+    storage = encryption.SecureCloudStorage('key')
+    path = tmp_path / 'a.txt'
+    path.write_bytes(b'a' * 100000)
+    storage.encrypt_file(str(path))
+    sample = path.read_bytes()
+    assert encryption.choose_codec is compression.choose_codec
+    assert encryption.choose_codec(sample[:compression.SAMPLE_SIZE], len(sample)) is None
+
+
+def test_bulk_decrypt_removes_partial_output(tmp_path):
+    storage = encryption.SecureCloudStorage('key')
+    bulk = encryption.BulkCrypto(storage, workers=2)
+    src = tmp_path / 'big.bin'
+    src.write_bytes(os.urandom(3 * encryption.CHUNK_SIZE))
+    sealed = tmp_path / 'big.enc'
+    bulk.encrypt_file(str(src), str(sealed))
+    data = bytearray(sealed.read_bytes())
+    data[-20] ^= 1  # Corrupt the last chunk, after earlier ones were written
+    sealed.write_bytes(bytes(data))
+    out = tmp_path / 'big.out'
+    with pytest.raises(ValueError):
+        bulk.decrypt_file(str(sealed), str(out))
+    assert not out.exists()
+
+
+def test_bulk_files_with_the_same_basename_are_rejected(tmp_path):
+    bulk = encryption.BulkCrypto(encryption.SecureCloudStorage('key'), workers=1)
+    for directory in ('a', 'b'):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / 'x.txt').write_bytes(b'secret')
+    with pytest.raises(ValueError, match='x.txt'):
+        bulk.encrypt_files([str(tmp_path / 'a' / 'x.txt'), str(tmp_path / 'b' / 'x.txt')],
+                           str(tmp_path / 'out'))
+    assert not (tmp_path / 'out').exists()
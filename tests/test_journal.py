@@ -0,0 +1,65 @@
+from audit import AuditLog
+from blobs import BlobIndex
+from fingerprints import KeyIndex
+from revocation import RevocationRegistry
+
+
+class NoHeads:
+    bucket = 'bucket'
+
+    def head(self, key):
+        raise AssertionError("The index should answer without a HEAD")
+
+
+def test_indexes_replay_their_journal_and_skip_a_torn_line(tmp_path):
+    blobs = BlobIndex(str(tmp_path / 'blobs.jsonl'))
+    blobs.add('bucket', 'blobs/sha256/ab', 3)
+    blobs.add('bucket', 'blobs/sha256/ab', 3)
+    keys = KeyIndex(str(tmp_path / 'keys.jsonl'))
+    fingerprint, _, _ = keys.issue('bob', 'BCS')
+    keys.bind_owner(fingerprint, 'alice')
+    for name in ('blobs.jsonl', 'keys.jsonl'):
+        with open(tmp_path / name, 'a') as f:
+            f.write('{"bucket": "buck')
+    assert len((tmp_path / 'blobs.jsonl').read_text().splitlines()) == 2
+
+    assert BlobIndex(str(tmp_path / 'blobs.jsonl')).exists(NoHeads(), 'blobs/sha256/ab')
+    assert KeyIndex(str(tmp_path / 'keys.jsonl')).lookup(fingerprint)['owner'] == 'alice'
+
+
+def test_compact_keeps_only_current_revocations(tmp_path):
+    path = tmp_path / 'revocations.jsonl'
+    registry = RevocationRegistry(str(path))
+    for user in ('bob', 'carol', 'dave'):
+        registry.revoke(user, owner='alice')
+    registry.restore('carol', owner='alice')
+    registry.compact()
+    assert len(path.read_text().splitlines()) == 2
+    assert RevocationRegistry(str(path)).revoked_users('alice') == {'bob', 'dave'}
+
+
+def test_an_append_after_a_torn_line_survives_a_reload(tmp_path):
+    path = tmp_path / 'revocations.jsonl'
+    RevocationRegistry(str(path)).revoke('bob')
+    with open(path, 'a') as f:
+        f.write('{"op": "revoke", "us')  # A crash mid-append
+    registry = RevocationRegistry(str(path))
+    registry.revoke('mallory')
+    assert registry.is_revoked('mallory')
+    reloaded = RevocationRegistry(str(path))
+    assert reloaded.is_revoked('mallory')
+    assert reloaded.is_revoked('bob')
+
+
+def test_logs_keep_writing_where_they_were_opened_after_a_chdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audit = AuditLog('audit.jsonl')
+    keys = KeyIndex('keys.jsonl', flush_every=1)
+    (tmp_path / 'elsewhere').mkdir()
+    monkeypatch.chdir(tmp_path / 'elsewhere')
+    audit.record('note', message='hi')
+    audit.flush()
+    audit.close()
+    keys.issue('bob', 'BCS')
+    assert (tmp_path / 'audit.jsonl').exists() and (tmp_path / 'keys.jsonl').exists()
+    assert not list((tmp_path / 'elsewhere').iterdir())
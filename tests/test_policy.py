@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from cpab import IntegratedCloudSystem
+from policy import PolicyEngine
+
+
+def test_comma_policy_means_any_role():
+    policies = PolicyEngine()
+    assert policies.check('BCS,BCY', 'BCY')
+    assert not policies.check('BCS,BCY', 'BCD')
+
+
+def test_gates():
+    policies = PolicyEngine()
+    assert policies.check('BCS AND BCD', 'BCD,BCS')
+    assert not policies.check('BCS AND BCD', 'BCS')
+    assert policies.check('(BCS OR BCY) AND DOCTOR', 'BCY,DOCTOR')
+    assert policies.check('2 of (BCS, BCY, BCD)', 'BCS,BCD')
+    assert not policies.check('2 of (BCS, BCY, BCD)', 'BCS')
+
+
+def test_malformed_policy_is_rejected():
+    with pytest.raises(ValueError):
+        PolicyEngine().compile('BCS AND')
+
+
+def test_mask_taken_before_its_role_is_interned_is_recomputed():
+    policies = PolicyEngine()
+    assert policies.attribute_mask('BCS') == 0  # No policy mentions BCS yet
+    assert policies.check('BCS', 'BCS')
+
+
+def test_first_access_in_a_fresh_process(tmp_path, monkeypatch):
+    # A new system over an existing catalog has interned no roles yet
+    monkeypatch.chdir(tmp_path)
+    with open('access_records.csv', 'w') as f:
+        f.write('admin,s3_key,allowed_roles,upload_time\n'
+                'alice,alice/a.txt,BCS,2024-01-01T00:00:00\n')
+    cloud = IntegratedCloudSystem('bucket', csv_file='access_records.csv',
+                                  audit_path=str(tmp_path / 'audit.jsonl'))
+    assert cloud._authorized_key('bob', 'BCS', 'alice') == 'alice/a.txt'
+    assert cloud._authorized_key('bob', 'BCD', 'alice') is None
+
+
+def test_mask_cached_while_a_role_is_interned_is_not_stale(monkeypatch):
+    policies = PolicyEngine()
+    looked_up = threading.Event()
+    interned = threading.Event()
+
+    class SlowIds(dict):
+        def get(self, key, default=None):
+            value = super().get(key, default)
+            if threading.current_thread().name == 'masker':
+                looked_up.set()
+                interned.wait(0.5)  # Blocks until role_bit has run, if it could run
+            return value
+
+    monkeypatch.setattr(policies, 'role_ids', SlowIds())
+    masker = threading.Thread(target=policies.attribute_mask, args=('X',), name='masker')
+    masker.start()
+    looked_up.wait()
+    interner = threading.Thread(target=lambda: (policies.role_bit('X'), interned.set()))
+    interner.start()
+    masker.join()
+    interner.join()
+    assert policies.check('X', 'X')
+    assert policies._attributes.get('X') in (None, policies.role_bit('X'))
@@ -0,0 +1,70 @@
+import pytest
+
+from cpab import IntegratedCloudSystem
+from local_s3 import LocalS3
+from shards import Shard
+from transfer import MIN_PART_SIZE
+
+
+@pytest.fixture
+def cloud(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    s3 = LocalS3()
+    cloud = IntegratedCloudSystem('bucket', shards=[Shard('bucket', s3=s3)],
+                                  audit_path=str(tmp_path / 'audit.jsonl'),
+                                  multipart_threshold=MIN_PART_SIZE, multipart_part_size=MIN_PART_SIZE)
+    yield cloud
+    cloud.audit_log.close()
+
+
+def put(cloud, upload, data):
+    return cloud.s3.open_url(upload['url'], data)
+
+
+def test_presigned_upload_is_recorded(cloud):
+    upload = cloud.presign_upload('alice', 'a.txt', ['BCS'])
+    put(cloud, upload, b'hello')
+    assert cloud.complete_upload(upload)
+    assert cloud.access_file('bob', 'BCS', 'alice', filename='a.txt') == b'hello'
+
+
+def test_multipart_presigned_upload_is_recorded(cloud):
+    data = b'x' * (MIN_PART_SIZE + 10)
+    upload = cloud.presign_upload('alice', 'big.bin', ['BCS'], size=len(data))
+    etags = {part['part']: cloud.s3.open_url(part['url'], data[part['offset']:part['offset'] + part['length']])
+             for part in upload['parts']}
+    assert cloud.complete_upload(upload, etags)
+    assert cloud.access_file('bob', 'BCS', 'alice', filename='big.bin') == data
+
+
+@pytest.mark.parametrize('field, value', [
+    ('owner', 'mallory'),
+    ('allowed_roles', ['EVIL']),
+    ('s3_key', 'carol/c.txt'),
+    ('version', 7),
+])
+def test_altered_uploads_are_refused(cloud, field, value):
+    upload = cloud.presign_upload('alice', 'a.txt', ['BCS'])
+    put(cloud, upload, b'hello')
+    assert not cloud.complete_upload(dict(upload, **{field: value}))
+    assert cloud.records.latest_row('alice', 'a.txt') is None
+    assert cloud.records.latest_row('mallory', 'a.txt') is None
+
+
+def test_unsigned_and_replayed_uploads_are_refused(cloud):
+    upload = cloud.presign_upload('alice', 'a.txt', ['BCS'])
+    put(cloud, upload, b'hello')
+    forged = {key: value for key, value in upload.items() if key != 'token'}
+    assert not cloud.complete_upload(forged)
+    assert cloud.complete_upload(upload)
+    assert not cloud.complete_upload(upload)
+    assert len(cloud.records.versions('alice', 'a.txt')) == 1
+
+
+def test_another_system_secret_is_refused(cloud, tmp_path):
+    other = IntegratedCloudSystem('bucket', shards=[Shard('bucket', s3=cloud.s3)],
+                                  audit_path=str(tmp_path / 'audit2.jsonl'))
+    upload = other.presign_upload('alice', 'a.txt', ['BCS'])
+    put(cloud, upload, b'hello')
+    assert not cloud.complete_upload(upload)
+    other.audit_log.close()
@@ -0,0 +1,36 @@
+from backends import LocalFSBackend
+from blobs import BLOB_PREFIX
+from cpab import IntegratedCloudSystem
+from shards import Shard
+
+
+def make_cloud(tmp_path, shards, name):
+    return IntegratedCloudSystem('a', shards=shards, dedup=True,
+                                 audit_path=str(tmp_path / f'audit-{name}.jsonl'),
+                                 blob_index_path=str(tmp_path / 'blobs.jsonl'),
+                                 csv_file=str(tmp_path / 'records.csv'))
+
+
+def test_blobs_moved_off_a_shard_are_forgotten(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    a = Shard('a', backend=LocalFSBackend(str(tmp_path / 'a')))
+    b = Shard('b', backend=LocalFSBackend(str(tmp_path / 'b')))
+    cloud = make_cloud(tmp_path, [a], 'one')
+    stale = make_cloud(tmp_path, [Shard('a', backend=LocalFSBackend(str(tmp_path / 'a')))], 'two')
+    bodies = {f"f{i}.txt": f"body {i}".encode() * 100 for i in range(16)}
+    for name, body in bodies.items():
+        (tmp_path / name).write_bytes(body)
+        assert cloud.upload_file('alice', str(tmp_path / name), ['BCS'])
+    stale.blobs.exists(stale.backend, 'warm the index')
+
+    report = cloud.rebalance([a, b])
+    moved = set(b.backend.list(BLOB_PREFIX))
+    assert report['moved_objects'] and moved
+    assert not moved & set(a.backend.list(BLOB_PREFIX))
+
+    # A system still on the old membership must not trust its index for moved blobs
+    for name, body in bodies.items():
+        assert stale.upload_file('bob', str(tmp_path / name), ['BCS'])
+        assert stale.access_file('carol', 'BCS', 'bob', filename=name) == body
+    for system in (cloud, stale):
+        system.audit_log.close()
@@ -0,0 +1,79 @@
+import csv
+import sqlite3
+
+import pytest
+
+from records import FIELDS, RecordCatalog, SQLiteRecordStore, initialize_csv, migrate_csv_to_sqlite
+
+
+def test_writers_sharing_a_database_reserve_distinct_versions(tmp_path):
+    db = str(tmp_path / 'records.db')
+    first, second = SQLiteRecordStore(db), SQLiteRecordStore(db)
+    assert first.next_version('o', 'f.bin') == 1
+    assert second.next_version('o', 'f.bin') == 2
+    first.append('o', 'o/f.bin', 'BCS', 't1', 'f.bin', 1)
+    assert second.next_version('O', 'f.bin') == 3
+
+
+def test_a_version_cannot_be_recorded_twice(tmp_path):
+    store = SQLiteRecordStore(str(tmp_path / 'records.db'))
+    store.append('o', 'o/f.bin', 'BCS', 't1', 'f.bin', 1)
+    with pytest.raises(sqlite3.IntegrityError):
+        store.append('o', 'o/v1/f.bin', 'BCS', 't2', 'f.bin', 1)
+    assert len(store.versions('o', 'f.bin')) == 1
+
+
+def test_migration_collapses_relocated_copies(tmp_path):
+    csv_file = tmp_path / 'records.csv'
+    with open(csv_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerow(['alice', 'alice/a.txt', 'BCS', 't1', 'a.txt', 1, 'b0'])
+        writer.writerow(['alice', 'alice/a.txt', 'BCS', 't1', 'a.txt', 1, 'b1'])
+        writer.writerow(['alice', 'alice/b.txt', 'BCS', 't2', '', '', ''])
+    db = str(tmp_path / 'records.db')
+    assert migrate_csv_to_sqlite(str(csv_file), db) == 2
+    store = SQLiteRecordStore(db)
+    assert store.version_row('alice', 'a.txt', 1)['location'] == 'b1'
+    assert store.latest_row('alice', 'b.txt')['version'] == 1
+
+
+def test_a_batch_reserves_in_one_transaction(tmp_path):
+    db = str(tmp_path / 'records.db')
+    store = SQLiteRecordStore(db)
+    store.append('o', 'o/a.bin', 'BCS', 't1', 'a.bin', 1)
+    statements = []
+    store._conn().set_trace_callback(statements.append)
+    assert store.next_versions('o', ['a.bin', 'b.bin', 'a.bin']) == [2, 1, 3]
+    assert sum(s.startswith('BEGIN') for s in statements) == 1
+    assert SQLiteRecordStore(db).next_version('o', 'b.bin') == 2
+
+
+def test_duplicate_cleanup_runs_once(tmp_path, monkeypatch):
+    db = str(tmp_path / 'records.db')
+    traced = []
+    connect = sqlite3.connect
+
+    def tracing_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(traced.append)
+        return conn
+
+    monkeypatch.setattr(sqlite3, 'connect', tracing_connect)
+    SQLiteRecordStore(db)
+    assert any(s.startswith('DELETE') for s in traced)
+    traced.clear()
+    SQLiteRecordStore(db)
+    assert not any(s.startswith(('DELETE', 'DROP')) for s in traced)
+
+
+def test_relocating_keeps_upload_order(tmp_path):
+    initialize_csv(str(tmp_path / 'records.csv'))
+    catalog = RecordCatalog(str(tmp_path / 'records.csv'))
+    for i, name in enumerate(['a', 'b', 'a', 'c']):
+        catalog.append('o', f"o/{name}{i}", 'BCS', f"t{i}", name)
+    catalog.relocate_many([('o', 'a', 1, 's1'), ('o', 'c', 1, 's2')])
+    rows = RecordCatalog(catalog.csv_file).rows_for_owner('o')
+    assert [(r['filename'], r['version'], r['location']) for r in rows] == [
+        ('a', 1, 's1'), ('b', 1, ''), ('a', 2, ''), ('c', 1, 's2')]
+    assert catalog.rows_for_owner('o') == rows
@@ -0,0 +1,60 @@
+import pytest
+
+from revocation import RevocationRegistry
+
+
+def test_revoked_many_matches_is_revoked():
+    registry = RevocationRegistry(path=None)
+    users = ['Bob', 'carol', 'dave', 'bob', 'erin']
+    owners = ['alice', 'alice', 'Alice', 'frank', 'frank']
+    assert not registry.revoked_many(users, owners).any()
+    registry.revoke('carol')
+    registry.revoke('bob', owner='Alice')
+    registry.revoke('erin', owner='alice')
+    expected = [registry.is_revoked(u, o) for u, o in zip(users, owners)]
+    assert registry.revoked_many(users, owners).tolist() == expected == [True, True, False, False, False]
+
+
+def test_revocations_survive_a_reload(tmp_path):
+    path = str(tmp_path / 'revocations.jsonl')
+    registry = RevocationRegistry(path)
+    registry.revoke('bob', owner='alice')
+    registry.revoke('carol')
+    registry.restore('carol')
+    reloaded = RevocationRegistry(path)
+    assert reloaded.is_revoked('bob', 'alice')
+    assert not reloaded.is_revoked('carol')
+
+
+def test_authorize_many_denies_revoked_pairs(tmp_path, monkeypatch):
+    from cpab import IntegratedCloudSystem
+    monkeypatch.chdir(tmp_path)
+    with open('access_records.csv', 'w') as f:
+        f.write('admin,s3_key,allowed_roles,upload_time\n'
+                'alice,alice/a.txt,BCS,2024-01-01T00:00:00\n')
+    cloud = IntegratedCloudSystem('bucket', csv_file='access_records.csv',
+                                  audit_path=str(tmp_path / 'audit.jsonl'))
+    granted, keys = cloud.authorize_many(['bob', 'carol'], ['BCS', 'BCS'], ['alice', 'alice'])
+    assert granted.tolist() == [True, True]
+    cloud.revocations.revoke('bob', owner='alice')
+    granted, keys = cloud.authorize_many(['bob', 'carol'], ['BCS', 'BCS'], ['alice', 'alice'])
+    assert granted.tolist() == [False, True]
+    assert keys.tolist() == [None, 'alice/a.txt']
+
+
+@pytest.mark.parametrize('bloom_capacity', [None, 1000])
+def test_revocations_by_another_process_apply_at_once(tmp_path, bloom_capacity):
+    path = str(tmp_path / 'revocations.jsonl')
+    worker = RevocationRegistry(path, bloom_capacity)
+    assert not worker.is_revoked('bob', 'alice')  # Loaded before the revocation
+    other = RevocationRegistry(path, bloom_capacity)
+    other.revoke('bob', owner='alice')
+    assert worker.is_revoked('bob', 'alice')
+    assert worker.revoked_many(['bob'], ['alice']).tolist() == [True]
+    other.revoke('carol')
+    other.restore('bob', owner='alice')
+    other.compact()  # Replaces the file
+    assert not worker.is_revoked('bob', 'alice')
+    assert worker.is_revoked('carol')
+    worker.revoke('dave')
+    assert other.revoked_users() == {'carol', 'dave'}
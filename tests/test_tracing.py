@@ -0,0 +1,39 @@
+from cpab import CloudUser, IntegratedCloudSystem
+from fingerprints import KeyIndex
+
+
+def test_trace_user_reports_the_owner_after_a_direct_lookup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('access_records.csv', 'w') as f:
+        f.write('admin,s3_key,allowed_roles,upload_time\n'
+                'alice,alice/a.txt,BCS,2024-01-01T00:00:00\n')
+    cloud = IntegratedCloudSystem('bucket', csv_file='access_records.csv',
+                                  audit_path=str(tmp_path / 'audit.jsonl'))
+    user = CloudUser('bob', 'BCS', cloud)
+    assert user._lookup_key('alice') == 'alice/a.txt'
+    traced = cloud.trace_user(user.user_key)
+    assert (traced['user_id'], traced['owner']) == ('bob', 'alice')
+
+
+def test_issued_keys_are_buffered_and_bindings_keep_history(tmp_path):
+    path = tmp_path / 'keys.jsonl'
+    keys = KeyIndex(str(path), flush_every=3)
+    first, _, _ = keys.issue('bob', 'BCS')
+    keys.issue('carol', 'BCS')
+    assert not path.exists()
+    keys.bind_owner(first, 'alice')  # Flushes the issues ahead of the binding
+    keys.bind_owner(first, 'dave')
+    keys.bind_owner(first, 'alice')
+    assert len(path.read_text().splitlines()) == 4
+    traced = KeyIndex(str(path)).lookup(first)
+    assert (traced['owner'], traced['owners']) == ('dave', ['alice', 'dave'])
+
+
+def test_a_revoked_lookup_is_audited(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cloud = IntegratedCloudSystem('bucket', csv_file='access_records.csv',
+                                  audit_path=str(tmp_path / 'audit.jsonl'))
+    user = CloudUser('bob', 'BCS', cloud)
+    cloud.revoke_user('bob', owner='alice')
+    assert user._lookup_key('alice') is None
+    assert cloud.audit_log.query(action='access', actor='bob', owner='alice', outcome='revoked')
@@ -0,0 +1,197 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import ClientError
+
+MB = 1024 * 1024
+MIN_PART_SIZE = 5 * MB  # S3 rejects smaller parts (except the last one)
+MAX_PARTS = 10000
+
+
+class MultipartUploader:
+    """Upload a large file to S3 in parts from a bounded thread pool.
+
+    Each worker holds at most one part in memory and failed parts are
+    retried on their own. An upload that still fails is aborted, so S3
+    doesn't keep its parts; one cut short by a killed process is left
+    for the bucket's AbortIncompleteMultipartUpload lifecycle rule.
+    """
+
+    def __init__(self, s3, bucket, part_size=16 * MB, max_workers=8, max_retries=3):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        self.s3 = s3
+        self.bucket = bucket
+        self.part_size = part_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+
+    def _upload_part(self, file_path, s3_key, upload_id, part_number, part_size):
+        offset = (part_number - 1) * part_size
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(part_size)
+        start = time.perf_counter()
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                response = self.s3.upload_part(
+                    Bucket=self.bucket,
+                    Key=s3_key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=data
+                )
+                return {
+                    'part': part_number,
+                    'etag': response['ETag'],
+                    'bytes': len(data),
+                    'seconds': time.perf_counter() - start,
+                    'attempts': attempt
+                }
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(0.2 * 2 ** (attempt - 1))
+
+    def upload(self, file_path, s3_key, extra_args=None):
+        """Upload file_path to s3_key; returns a timing report"""
+        start = time.perf_counter()
+        size = os.path.getsize(file_path)
+        part_size = max(self.part_size, -(-size // MAX_PARTS))
+        upload_id = self.s3.create_multipart_upload(
+            Bucket=self.bucket, Key=s3_key, **(extra_args or {})
+        )['UploadId']
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [
+                    pool.submit(self._upload_part, file_path, s3_key, upload_id, n, part_size)
+                    for n in range(1, max(1, -(-size // part_size)) + 1)
+                ]
+                timings = [future.result() for future in as_completed(futures)]
+            timings.sort(key=lambda t: t['part'])
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': [{'PartNumber': t['part'], 'ETag': t['etag']} for t in timings]}
+            )
+        except BaseException:
+            try:
+                self.s3.abort_multipart_upload(Bucket=self.bucket, Key=s3_key, UploadId=upload_id)
+            except ClientError:
+                pass  # Already gone; the original error matters more
+            raise
+        return {
+            's3_key': s3_key,
+            'bytes': size,
+            'parts': timings,
+            'seconds': time.perf_counter() - start
+        }
+
+
+def iter_object(s3, bucket, s3_key, chunk_size=1 * MB, **get_args):
+    """Yield an object's bytes in chunks without buffering the whole body"""
+    response = s3.get_object(Bucket=bucket, Key=s3_key, **get_args)
+    yield from iter_body(response['Body'], chunk_size)
+
+
+def iter_body(body, chunk_size=1 * MB):
+    """Yield a GET response body in chunks, closing it when done"""
+    try:
+        while True:
+            chunk = body.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        body.close()
+
+
+class RangedDownloader:
+    """Download an object straight into a file or writable buffer.
+
+    Objects above the threshold are split into byte ranges fetched
+    concurrently. Files are written in place at each range's offset;
+    other buffers get ranges in order from a window of at most
+    max_workers parts, so peak memory is bounded either way.
+    """
+
+    def __init__(self, s3, bucket, part_size=16 * MB, max_workers=8,
+                 threshold=64 * MB, chunk_size=1 * MB):
+        self.s3 = s3
+        self.bucket = bucket
+        self.part_size = part_size
+        self.max_workers = max_workers
+        self.threshold = threshold
+        self.chunk_size = chunk_size
+
+    def download(self, s3_key, dest, head=None):
+        """Write s3_key to dest (a path or writable object); returns bytes written.
+
+        Pass the object's HEAD response if the caller already has it.
+        """
+        if isinstance(dest, (str, os.PathLike)):
+            with open(dest, 'wb') as f:
+                return self.download(s3_key, f, head)
+
+        if head is None:
+            head = self.s3.head_object(Bucket=self.bucket, Key=s3_key)
+        size = head['ContentLength']
+        if size < self.threshold:
+            written = 0
+            for chunk in iter_object(self.s3, self.bucket, s3_key, self.chunk_size):
+                dest.write(chunk)
+                written += len(chunk)
+            return written
+
+        ranges = [(start, min(start + self.part_size, size) - 1)
+                  for start in range(0, size, self.part_size)]
+        fd = self._positional_fd(dest)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            if fd is not None:
+                # Ranges land relative to the current position, as sequential writes would
+                dest.flush()
+                base = dest.tell()
+                if os.fstat(fd).st_size < base + size:
+                    os.ftruncate(fd, base + size)
+                futures = [pool.submit(self._fetch_into, s3_key, head['ETag'], fd, base, r)
+                           for r in ranges]
+                for future in futures:
+                    future.result()
+                dest.seek(base + size)
+            else:
+                window = []
+                for r in ranges:
+                    window.append(pool.submit(self._fetch, s3_key, head['ETag'], r))
+                    if len(window) >= self.max_workers:
+                        dest.write(window.pop(0).result())
+                for future in window:
+                    dest.write(future.result())
+        return size
+
+    @staticmethod
+    def _positional_fd(dest):
+        if not hasattr(os, 'pwrite'):
+            return None
+        try:
+            if not dest.seekable():
+                return None
+            return dest.fileno()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    def _range_args(self, etag, byte_range):
+        # IfMatch pins every range to the same object version
+        return {'Range': f"bytes={byte_range[0]}-{byte_range[1]}", 'IfMatch': etag}
+
+    def _fetch(self, s3_key, etag, byte_range):
+        return b''.join(iter_object(self.s3, self.bucket, s3_key, self.chunk_size,
+                                    **self._range_args(etag, byte_range)))
+
+    def _fetch_into(self, s3_key, etag, fd, base, byte_range):
+        offset = base + byte_range[0]
+        for chunk in iter_object(self.s3, self.bucket, s3_key, self.chunk_size,
+                                 **self._range_args(etag, byte_range)):
+            os.pwrite(fd, chunk, offset)
+            offset += len(chunk)